@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""Writers for the extracted annotations: markdown plus machine-readable exports.
+
+Every writer takes one (annotation, summary) pair at a time, so a document is
+exported in a single pass with bounded memory, in streaming mode too. The
+JSONL, CSV and SQLite exports have one row per annotation with the same
+columns (EXPORT_COLUMNS) and are written to a temporary file that replaces
+the previous export only once it is complete, so a downstream reader never
+sees half a file.
+"""
+
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+import time
+from typing import Iterator, List, Optional
+
+from annotation_records import Annotation, FREETEXT_COMMENT, HIGHLIGHT, HIGHLIGHT_COMMENT, NOTE
+
+MARKDOWN_HEADER = "# Annotations\n\n"
+# Stands in for a summary that is still being generated (progressive output)
+PENDING_SUMMARY = "*(summary in progress)*"
+
+EXPORT_SUFFIXES = {'jsonl': '.jsonl', 'csv': '.csv', 'sqlite': '.sqlite3'}
+EXPORT_COLUMNS = ('document', 'page', 'type', 'color', 'x0', 'y0', 'x1', 'y1', 'text', 'comment', 'summary')
+
+# Rows per executemany() call in the SQLite export
+SQLITE_BATCH_SIZE = 1000
+
+SQLITE_SCHEMA = """
+CREATE TABLE annotations (
+    id       INTEGER PRIMARY KEY,
+    document TEXT NOT NULL,
+    page     INTEGER NOT NULL,
+    type     TEXT NOT NULL,
+    color    TEXT NOT NULL,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL,
+    text     TEXT NOT NULL,
+    comment  TEXT NOT NULL,
+    summary  TEXT
+);
+"""
+
+
+def format_annotation_markdown(annot: Annotation, summary: Optional[str] = None) -> str:
+    """Render one annotation; summary replaces the text of a summarized highlight"""
+    if summary is not None:
+        return f"- **Highlight on Page {annot.page} (Summarized)**\n{summary}\n\n"
+    if annot.type == HIGHLIGHT:
+        return f"> {annot.text} (p. {annot.page})\n\n"
+    if annot.type == HIGHLIGHT_COMMENT:
+        return f"- {annot.comment}\n\n> {annot.text} (p. {annot.page})\n\n"
+    if annot.type == NOTE:
+        return f"- **Note on Page {annot.page}**\n- {annot.comment}\n\n"
+    if annot.type == FREETEXT_COMMENT:
+        return f"- **Comment on Page {annot.page}**\n- {annot.comment}\n\n"
+    return ""
+
+
+def export_path(pdf_path: str, export_format: str) -> str:
+    """'paper.pdf' -> 'paper (annotations).jsonl' etc."""
+    return os.path.splitext(pdf_path)[0] + " (annotations)" + EXPORT_SUFFIXES[export_format]
+
+
+class AnnotationWriter:
+    """Base class: use as a context manager, call write() once per annotation in order"""
+
+    def __init__(self, path: str, document: str):
+        self.path = path
+        self.document = document
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def row(self, annot: Annotation, summary: Optional[str]) -> tuple:
+        x0, y0, x1, y1 = annot.rect
+        return (self.document, annot.page, annot.type, annot.color, x0, y0, x1, y1,
+                annot.text, annot.comment, summary)
+
+    def write(self, annot: Annotation, summary: Optional[str] = None):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def abort(self):
+        """Discard a partial export, keeping the previous one"""
+
+
+class MarkdownWriter(AnnotationWriter):
+    """Markdown written straight to the output file (used by streaming mode)"""
+
+    def __init__(self, path: str, document: str, front_matter: str = "", buffer_size: int = -1):
+        super().__init__(path, document)
+        self.file = open(path, "w", encoding="utf-8", buffering=buffer_size)
+        self.file.write(front_matter + MARKDOWN_HEADER)
+
+    def write(self, annot, summary=None):
+        self.file.write(format_annotation_markdown(annot, summary))
+        self.rows += 1
+
+    def close(self):
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+
+
+class ProgressiveMarkdownWriter(AnnotationWriter):
+    """Markdown that is on disk from the start and fills in while summaries arrive.
+
+    write() adds finished annotations and pending() adds a summarized
+    highlight whose summary is still being generated; update() replaces
+    that summary with the text received so far. flush() rewrites the file
+    atomically, so a viewer never sees half of it; the caller decides how
+    often (every interval seconds). Blocks are rendered once per change, so
+    a flush costs one join and one write.
+    """
+
+    def __init__(self, path: str, document: str, front_matter: str = "", interval: float = 0.25):
+        super().__init__(path, document)
+        self.front_matter = front_matter
+        self.interval = interval
+        self.blocks = [MARKDOWN_HEADER]
+        self.pending_annotations = {}  # block index -> annotation whose summary is still being generated
+        self.dirty = True
+        self.first_flush_at = None  # time.perf_counter() of the first write
+        self.flushes = 0
+
+    def write(self, annot, summary=None):
+        self.blocks.append(format_annotation_markdown(annot, summary))
+        self.rows += 1
+        self.dirty = True
+
+    def pending(self, annot: Annotation) -> int:
+        """Add a summarized highlight without its summary yet; returns the slot for update()"""
+        self.write(annot, PENDING_SUMMARY)
+        slot = len(self.blocks) - 1
+        self.pending_annotations[slot] = annot
+        return slot
+
+    def update(self, slot: int, summary: str, final: bool = False):
+        """Show summary (complete if final, else the part received so far) in the slot's place"""
+        annot = self.pending_annotations[slot]
+        if final:
+            del self.pending_annotations[slot]
+        elif summary:
+            summary = f"{summary} …\n{PENDING_SUMMARY}"
+        else:
+            summary = PENDING_SUMMARY
+        self.blocks[slot] = format_annotation_markdown(annot, summary)
+        self.dirty = True
+
+    def flush(self) -> bool:
+        """Rewrite the file if anything changed since the last write; True if written"""
+        if not self.dirty:
+            return False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.front_matter)
+            f.write("".join(self.blocks))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        if self.first_flush_at is None:
+            self.first_flush_at = time.perf_counter()
+        self.flushes += 1
+        return True
+
+    def close(self):
+        self.flush()
+
+    def abort(self):
+        """Keep what was written last; it shows which summaries were still pending"""
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path + ".tmp")
+
+
+class _AtomicFileWriter(AnnotationWriter):
+    """Writes to path + '.tmp' and moves it over path on close()"""
+
+    def __init__(self, path: str, document: str):
+        super().__init__(path, document)
+        self.tmp_path = path + ".tmp"
+
+    def close(self):
+        self._finish()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        try:
+            self._finish()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+    def _finish(self):
+        raise NotImplementedError
+
+
+class JsonlWriter(_AtomicFileWriter):
+    def __init__(self, path: str, document: str):
+        super().__init__(path, document)
+        self.file = open(self.tmp_path, "w", encoding="utf-8", newline="\n")
+
+    def write(self, annot, summary=None):
+        self.file.write(json.dumps(dict(zip(EXPORT_COLUMNS, self.row(annot, summary))), ensure_ascii=False))
+        self.file.write("\n")
+        self.rows += 1
+
+    def _finish(self):
+        self.file.close()
+
+
+class CsvWriter(_AtomicFileWriter):
+    def __init__(self, path: str, document: str):
+        super().__init__(path, document)
+        # utf-8-sig so spreadsheet applications detect the encoding
+        self.file = open(self.tmp_path, "w", encoding="utf-8-sig", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, annot, summary=None):
+        self.writer.writerow(self.row(annot, summary))
+        self.rows += 1
+
+    def _finish(self):
+        self.file.close()
+
+
+class SqliteWriter(_AtomicFileWriter):
+    """One 'annotations' table; rows are inserted in batches inside a single transaction"""
+
+    def __init__(self, path: str, document: str):
+        super().__init__(path, document)
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.conn = sqlite3.connect(self.tmp_path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=OFF")  # a fresh file that only replaces the export when complete
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.conn.execute("BEGIN")
+        self.batch: List[tuple] = []
+
+    def write(self, annot, summary=None):
+        self.batch.append(self.row(annot, summary))
+        self.rows += 1
+        if len(self.batch) >= SQLITE_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self.conn.executemany(
+                f"INSERT INTO annotations ({', '.join(EXPORT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(EXPORT_COLUMNS))})", self.batch)
+            self.batch = []
+
+    def _finish(self):
+        try:
+            self._flush()
+            self.conn.execute("COMMIT")
+            self.conn.execute("CREATE INDEX annotations_page ON annotations(page)")
+        finally:
+            self.conn.close()
+
+
+EXPORT_WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter, 'sqlite': SqliteWriter}
+
+
+def validate_export_formats(formats) -> List[str]:
+    """Normalize a list of export formats; raises ValueError for unknown ones"""
+    formats = [str(f).strip().lower() for f in formats or [] if str(f).strip()]
+    unknown = [f for f in formats if f not in EXPORT_WRITERS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(unknown)} "
+                         f"(available: {', '.join(EXPORT_WRITERS)})")
+    return list(dict.fromkeys(formats))
+
+
+def open_export_writers(pdf_path: str, formats) -> Iterator[AnnotationWriter]:
+    """One writer per export format, next to the PDF.
+
+    A generator, so each writer can be entered into an ExitStack before the
+    next one is opened.
+    """
+    document = os.path.basename(pdf_path)
+    for fmt in formats:
+        yield EXPORT_WRITERS[fmt](export_path(pdf_path, fmt), document)
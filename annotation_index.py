@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Full-text search index over the annotations of a whole PDF library.
+
+Every processed document's annotations are kept in one SQLite database,
+together with their summaries, the document path and its title, behind an
+FTS5 index. A reprocessed document replaces its previous entries in a
+single short transaction, so the index follows the library incrementally.
+search() answers queries from the index alone, without touching any PDF.
+
+Like the summary cache, the database uses WAL mode and a busy timeout so
+batch worker processes can update it at the same time.
+"""
+
+import itertools
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from annotation_export import AnnotationWriter
+from annotation_records import Annotation
+
+logger = logging.getLogger("pdfextractor.index")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id      INTEGER PRIMARY KEY,
+    path    TEXT NOT NULL UNIQUE,
+    title   TEXT NOT NULL,
+    sha256  TEXT,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS annotations (
+    id          INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL,
+    page        INTEGER NOT NULL,
+    type        TEXT NOT NULL,
+    color       TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    comment     TEXT NOT NULL,
+    summary     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS annotations_document ON annotations(document_id);
+
+-- The FTS5 index reads its column values from this view, so the document
+-- title is searchable without being stored once per annotation
+CREATE VIEW IF NOT EXISTS annotation_search AS
+    SELECT a.id, a.text, a.comment, a.summary, d.title
+    FROM annotations a JOIN documents d ON d.id = a.document_id;
+CREATE VIRTUAL TABLE IF NOT EXISTS annotations_fts USING fts5(
+    text, comment, summary, title,
+    content='annotation_search', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- A document's annotations are always deleted before its title changes, so
+-- the 'delete' entries match what was indexed
+CREATE TRIGGER IF NOT EXISTS annotations_fts_insert AFTER INSERT ON annotations BEGIN
+    INSERT INTO annotations_fts(rowid, text, comment, summary, title)
+    VALUES (new.id, new.text, new.comment, new.summary,
+            (SELECT title FROM documents WHERE id = new.document_id));
+END;
+CREATE TRIGGER IF NOT EXISTS annotations_fts_delete AFTER DELETE ON annotations BEGIN
+    INSERT INTO annotations_fts(annotations_fts, rowid, text, comment, summary, title)
+    VALUES ('delete', old.id, old.text, old.comment, old.summary,
+            (SELECT title FROM documents WHERE id = old.document_id));
+END;
+"""
+
+# bm25() weights for text, comment, summary and title: a word in the title
+# matches every annotation of the document, so it counts for less
+RANK_WEIGHTS = (1.0, 1.0, 0.5, 0.2)
+
+# Rows per executemany() call while staging a document
+STAGING_BATCH_SIZE = 1000
+
+
+@dataclass
+class SearchHit:
+    path: str
+    title: str
+    page: int
+    type: str
+    color: str
+    text: str
+    comment: str
+    summary: str
+    snippet: str
+    score: float
+
+
+def quote_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching all words, whatever characters they contain"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class AnnotationIndex:
+    """The library index at path; writer() updates one document, search() queries"""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._staging_ids = itertools.count()
+
+    def close(self):
+        self.conn.close()
+
+    def indexed_sha256(self, pdf_path: str) -> Optional[str]:
+        """Content hash the document had when it was last indexed (None if unknown)"""
+        row = self.conn.execute("SELECT sha256 FROM documents WHERE path = ?",
+                                (os.path.abspath(pdf_path),)).fetchone()
+        return row[0] if row else None
+
+    def writer(self, pdf_path: str, title: str, sha256: Optional[str] = None) -> "IndexWriter":
+        """Writer that replaces the document's entries once it is closed"""
+        return IndexWriter(self, os.path.abspath(pdf_path), title, sha256)
+
+    def remove_missing(self) -> int:
+        """Drop documents whose PDF no longer exists; returns how many were removed"""
+        missing = [(doc_id,) for doc_id, path in self.conn.execute("SELECT id, path FROM documents")
+                   if not os.path.exists(path)]
+        if missing:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("DELETE FROM annotations WHERE document_id = ?", missing)
+                self.conn.executemany("DELETE FROM documents WHERE id = ?", missing)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(missing)
+
+    def counts(self):
+        """(documents, annotations) in the index"""
+        return (self.conn.execute("SELECT count(*) FROM documents").fetchone()[0],
+                self.conn.execute("SELECT count(*) FROM annotations").fetchone()[0])
+
+    def search(self, query: str, limit: int = 20, color: Optional[str] = None,
+               annotation_type: Optional[str] = None) -> List[SearchHit]:
+        """Best-ranked annotations for query, in FTS5 query syntax or as plain words"""
+        params = {'limit': limit}
+        filters = ""
+        if color:
+            filters += " AND a.color = :color"
+            params['color'] = color.lower()
+        if annotation_type:
+            filters += " AND a.type = :type"
+            params['type'] = annotation_type
+        sql = f"""
+            SELECT d.path, d.title, a.page, a.type, a.color, a.text, a.comment, a.summary,
+                   snippet(annotations_fts, -1, '[', ']', '…', 16),
+                   bm25(annotations_fts, {', '.join(map(str, RANK_WEIGHTS))}) AS score
+            FROM annotations_fts
+            JOIN annotations a ON a.id = annotations_fts.rowid
+            JOIN documents d ON d.id = a.document_id
+            WHERE annotations_fts MATCH :query{filters}
+            ORDER BY score LIMIT :limit"""
+        try:
+            rows = self.conn.execute(sql, dict(params, query=query)).fetchall()
+        except sqlite3.OperationalError:
+            # Not valid FTS5 syntax (stray quotes, operators, punctuation): match the words
+            rows = self.conn.execute(sql, dict(params, query=quote_query(query))).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+
+class IndexWriter(AnnotationWriter):
+    """Stages one document's annotations in a temporary table and swaps them in on close().
+
+    Staging keeps memory bounded in streaming mode and holds no lock on the
+    index, so the write lock is only taken for the final swap.
+    """
+
+    def __init__(self, index: AnnotationIndex, pdf_path: str, title: str, sha256: Optional[str]):
+        super().__init__(index.path, pdf_path)
+        self.index = index
+        self.title = title
+        self.sha256 = sha256
+        self.staging = f"staging_{os.getpid()}_{next(index._staging_ids)}"
+        self.batch = []
+        index.conn.execute(f"CREATE TEMP TABLE {self.staging} "
+                           f"(page INTEGER, type TEXT, color TEXT, text TEXT, comment TEXT, summary TEXT)")
+
+    def write(self, annot: Annotation, summary: Optional[str] = None):
+        self.batch.append((annot.page, annot.type, annot.color, annot.text, annot.comment, summary or ""))
+        self.rows += 1
+        if len(self.batch) >= STAGING_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self.index.conn.executemany(f"INSERT INTO temp.{self.staging} VALUES (?, ?, ?, ?, ?, ?)", self.batch)
+            self.batch = []
+
+    def close(self):
+        self._flush()
+        conn = self.index.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id FROM documents WHERE path = ?", (self.document,)).fetchone()
+            if row:
+                doc_id = row[0]
+                conn.execute("DELETE FROM annotations WHERE document_id = ?", (doc_id,))
+                conn.execute("UPDATE documents SET title = ?, sha256 = ?, indexed = ? WHERE id = ?",
+                             (self.title, self.sha256, time.time(), doc_id))
+            else:
+                doc_id = conn.execute("INSERT INTO documents (path, title, sha256, indexed) VALUES (?, ?, ?, ?)",
+                                      (self.document, self.title, self.sha256, time.time())).lastrowid
+            conn.execute(f"INSERT INTO annotations (document_id, page, type, color, text, comment, summary) "
+                         f"SELECT ?, page, type, color, text, comment, summary FROM temp.{self.staging}",
+                         (doc_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute(f"DROP TABLE temp.{self.staging}")
+        logger.debug(f"Indexed {self.rows} annotations of {self.document}")
+
+    def abort(self):
+        self.index.conn.execute(f"DROP TABLE temp.{self.staging}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Compact records for extracted annotations.
+
+An Annotation keeps page, type, color, rectangle, highlighted text and
+comment as separate fields in __slots__. A record is smaller than the
+equivalent dict, and formatters and exporters read the highlighted text and
+the comment directly instead of splitting a combined string again.
+"""
+
+import struct
+import sys
+from typing import List, Tuple
+
+# Annotation types, as they appear in the markdown and in the exports
+HIGHLIGHT = "Highlight"
+HIGHLIGHT_COMMENT = "Highlight Comment"
+NOTE = "Note"
+FREETEXT_COMMENT = "FreeText Comment"
+HIGHLIGHT_TYPES = (HIGHLIGHT, HIGHLIGHT_COMMENT)
+
+# Rectangle coordinates are kept to this many decimals (1/100 pt), packed as
+# four float32 (16 bytes instead of a tuple of four float objects, ~150 bytes)
+RECT_DECIMALS = 2
+RECT_FORMAT = struct.Struct('<4f')
+
+
+class Annotation:
+    """One annotation.
+
+    For highlights, text is the highlighted text and comment the note
+    attached to the highlight ("" if there is none). For sticky notes and
+    FreeText annotations, text is "" and comment holds what was written.
+    """
+
+    __slots__ = ('page', 'type', 'color', '_rect', 'text', 'comment')
+
+    def __init__(self, page: int, type: str, color: str, rect: Tuple[float, float, float, float],
+                 text: str = "", comment: str = ""):
+        self.page = page
+        self.type = type
+        # A document uses a handful of colors; share one string per color
+        self.color = sys.intern(color)
+        self._rect = RECT_FORMAT.pack(*rect)
+        self.text = text
+        self.comment = comment
+
+    @property
+    def rect(self) -> Tuple[float, float, float, float]:
+        """(x0, y0, x1, y1) in PDF points"""
+        return tuple(round(value, RECT_DECIMALS) for value in RECT_FORMAT.unpack(self._rect))
+
+    def __repr__(self):
+        return (f"Annotation(page={self.page}, type={self.type!r}, color={self.color!r}, rect={self.rect}, "
+                f"text={self.text!r}, comment={self.comment!r})")
+
+    def __eq__(self, other):
+        if not isinstance(other, Annotation):
+            return NotImplemented
+        return self.to_state() == other.to_state()
+
+    # Unhashable, like the dicts these records replaced: equality compares
+    # the fields, and text is filled in after creation (cleaning, corpus
+    # mode), so a field hash would change while the record sits in a set
+    __hash__ = None
+
+    def __reduce__(self):
+        # Positional arguments pickle smaller than the default slot-state dict
+        return (Annotation, (self.page, self.type, self.color, self.rect, self.text, self.comment))
+
+    @property
+    def is_highlight(self) -> bool:
+        return self.type in HIGHLIGHT_TYPES
+
+    def to_state(self) -> List:
+        """JSON-compatible list form, used by the incremental state file"""
+        return [self.page, self.type, self.color, list(self.rect), self.text, self.comment]
+
+    @classmethod
+    def from_state(cls, values: List) -> "Annotation":
+        page, type_, color, rect, text, comment = values
+        return cls(page, type_, color, rect, text, comment)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Sidecar state for incremental re-extraction.
+
+For every processed PDF a small JSON file is kept next to it that records a
+fingerprint of the file and of each page's annotations, together with the
+annotations and summaries extracted last time. A re-run can then skip an
+unchanged document outright, or re-extract and re-summarize only the pages
+whose annotations changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from annotation_records import Annotation
+
+# Bump when the stored annotation format changes to force a full rebuild
+STATE_VERSION = 2
+
+HASH_CHUNK_SIZE = 1024 * 1024
+XREF_REF_PATTERN = re.compile(r'(\d+)\s+0\s+R')
+
+
+def state_path_for(pdf_path: str) -> str:
+    """Hidden sidecar file next to the PDF, e.g. '.paper.pdf.annotations-state.json'"""
+    directory, name = os.path.split(os.path.abspath(pdf_path))
+    return os.path.join(directory, f".{name}.annotations-state.json")
+
+
+def file_fingerprint(pdf_path: str, previous: Optional[Dict] = None,
+                     content_hash: Optional[Callable[[], str]] = None) -> Dict:
+    """Fingerprint the file by size, mtime and content hash.
+
+    The content hash is only recomputed when size or mtime differ from
+    ``previous``, so an untouched file costs a single stat call.
+    ``content_hash`` computes it from data already in hand instead of
+    reading the file.
+    """
+    stat = os.stat(pdf_path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        fingerprint['sha256'] = previous.get('sha256')
+        return fingerprint
+    if content_hash is not None:
+        fingerprint['sha256'] = content_hash()
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def page_annotation_xrefs(doc: fitz.Document, page_num: int) -> List[int]:
+    """Read a page's /Annots array at the xref level, without loading the page"""
+    kind, value = doc.xref_get_key(doc.page_xref(page_num), "Annots")
+    if kind == 'xref':
+        # Indirect array: resolve the referenced object
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    elif kind != 'array':
+        return []
+    return [int(ref) for ref in XREF_REF_PATTERN.findall(value)]
+
+
+def page_annotation_fingerprints(doc: fitz.Document) -> List[str]:
+    """Hash each page's annotation objects (xref, rect, colors, contents, quads).
+
+    Pages without annotations get an empty fingerprint.
+    """
+    fingerprints = []
+    for page_num in range(len(doc)):
+        xrefs = page_annotation_xrefs(doc, page_num)
+        if not xrefs:
+            fingerprints.append("")
+            continue
+        digest = hashlib.sha256()
+        for xref in xrefs:
+            digest.update(str(xref).encode('ascii'))
+            digest.update(doc.xref_object(xref, compressed=True).encode('utf-8', 'surrogatepass'))
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+def options_fingerprint(**options) -> str:
+    """Hash the settings that shape the output (start page, colors, extraction, cleaning, model, prompt)"""
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_state(state_path: str) -> Optional[Dict]:
+    """Load a sidecar state file; returns None if missing, unreadable or outdated"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != STATE_VERSION:
+        return None
+    try:
+        for page in state['pages'].values():
+            page['annotations'] = [Annotation.from_state(values) for values in page['annotations']]
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return state
+
+
+def save_state(state_path: str, state: Dict):
+    """Write the sidecar atomically so an interrupted run never leaves half a file"""
+    state['version'] = STATE_VERSION
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # Annotations are stored as compact lists (Annotation.to_state)
+        json.dump(state, f, ensure_ascii=False, default=Annotation.to_state)
+    os.replace(tmp_path, state_path)
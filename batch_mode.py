@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Batch and corpus mode: many PDFs in one run.
+
+run_batch() processes every PDF with process_document() in a pool of
+worker processes that draw from one shared API rate budget, and can
+resume from a journal. run_corpus() extracts every PDF in this process,
+cleans the highlight texts of all of them together in a process pool and
+summarizes them in one session. Both take PDF files, directories, globs,
+file lists and a manifest of start pages.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import yaml
+
+import extract_annotations as ea
+import metrics
+from annotation_records import Annotation
+
+logger = logging.getLogger("pdfextractor.batch")
+
+
+def collect_batch_inputs(paths, file_list=None):
+    """Expand directories (recursively), globs and file lists into unique PDF paths"""
+    candidates = list(paths)
+    if file_list:
+        with open(file_list, 'r', encoding='utf-8') as f:
+            candidates.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+    pdf_paths = []
+    seen = set()
+
+    def add(path):
+        path = os.path.abspath(path)
+        if path not in seen and path.lower().endswith('.pdf') and os.path.isfile(path):
+            seen.add(path)
+            pdf_paths.append(path)
+
+    for candidate in candidates:
+        candidate = os.path.expanduser(candidate)
+        if os.path.isdir(candidate):
+            for root, _dirs, files in os.walk(candidate):
+                for name in sorted(files):
+                    add(os.path.join(root, name))
+        elif glob.has_magic(candidate):
+            for match in sorted(glob.glob(candidate, recursive=True)):
+                add(match)
+        elif os.path.isfile(candidate):
+            add(candidate)
+        else:
+            logger.warning(f"Skipping batch input that does not exist: {candidate}")
+    return pdf_paths
+
+
+def load_manifest(manifest_path) -> Dict[str, int]:
+    """Read per-file start pages from a YAML manifest ({path: start_page}).
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = yaml.safe_load(f) or {}
+    if not isinstance(entries, dict):
+        raise ValueError(f"Manifest {manifest_path} must map PDF paths to start pages")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    start_pages = {}
+    for path, start_page in entries.items():
+        path = os.path.expanduser(str(path))
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        start_pages[os.path.abspath(path)] = int(start_page)
+    return start_pages
+
+
+def load_journal(journal_path) -> set:
+    """Return the PDFs a previous batch run already completed"""
+    completed = set()
+    if not journal_path or not os.path.exists(journal_path):
+        return completed
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if entry.get('status') == 'done':
+                completed.add(entry['path'])
+    return completed
+
+
+def _init_batch_worker(overrides):
+    """Process-pool initializer: load the config"""
+    ea.load_config(overrides)
+    ea.start_profiling(f"worker-{os.getpid()}")
+
+
+def _batch_worker(pdf_path, start_page, rate_state):
+    """Run one document inside a pool worker; never raises.
+
+    rate_state is the run's shared token bucket (manager proxies), which
+    every worker's requests draw from.
+    """
+    hits_before, misses_before = ea.summary_cache_counts()
+    metrics.registry.reset()  # only this document's metrics go back to the parent
+    started = time.perf_counter()
+    entry = {'path': pdf_path, 'start_page': start_page}
+    try:
+        result = asyncio.run(ea.process_document(pdf_path, start_page,
+                                                 resources=ea.SharedResources(rate_state=rate_state)))
+        entry.update(status='done', annotations=result['annotations'], summaries=result['summaries'],
+                     skipped=result['skipped'])
+    except Exception as e:
+        logger.error(f"Batch processing failed for {pdf_path}: {e}")
+        entry.update(status='failed', error=str(e), annotations=0, summaries=0)
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    hits, misses = ea.summary_cache_counts()
+    entry['cache_hits'] = hits - hits_before
+    entry['cache_misses'] = misses - misses_before
+    entry['metrics'] = metrics.registry.snapshot()
+    metrics.write_profiles()  # cumulative per worker; rewritten after every document
+    return entry
+
+
+def run_batch(paths, file_list=None, manifest=None, journal=None, workers=None, start_page=1,
+              overrides=None):
+    """Process many PDFs across a process pool sharing one API rate budget and cache"""
+    ea.load_config(overrides)
+    pdf_paths = collect_batch_inputs(paths, file_list)
+    start_pages = load_manifest(manifest) if manifest else {}
+    completed = load_journal(journal)
+
+    pending = [p for p in pdf_paths if p not in completed]
+    logger.info(f"Batch: {len(pdf_paths)} PDFs found, {len(pdf_paths) - len(pending)} already done, "
+                f"{len(pending)} to process")
+    if not pending:
+        return []
+
+    workers = workers or ea.config.get('processing', {}).get('batch_workers') or os.cpu_count() or 1
+    workers = max(1, min(workers, len(pending)))
+    api_config = ea.config.get('api', {})
+
+    results = []
+    started = time.perf_counter()
+    with multiprocessing.Manager() as manager:
+        # One token bucket for all workers, so the batch as a whole stays within
+        # api.rate_limit_per_minute no matter how many processes are running.
+        shared_state = (manager.Lock(), manager.dict(
+            tokens=float(api_config.get('rate_limit_burst', api_config.get('max_concurrency', 8))),
+            updated=time.monotonic()))
+        journal_file = open(journal, 'a', encoding='utf-8') if journal else None
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                     initargs=(overrides,)) as executor:
+                logger.info(f"Batch: processing with {workers} worker processes")
+                futures = [executor.submit(_batch_worker, path, start_pages.get(path, start_page), shared_state)
+                           for path in pending]
+                for done_count, future in enumerate(as_completed(futures), 1):
+                    entry = future.result()
+                    metrics.registry.merge(entry.pop('metrics', None))
+                    results.append(entry)
+                    if journal_file:
+                        journal_file.write(json.dumps(entry) + "\n")
+                        journal_file.flush()
+                    logger.info(f"Batch progress: {done_count}/{len(pending)} ({entry['status']}: {entry['path']})")
+        finally:
+            if journal_file:
+                journal_file.close()
+    elapsed = time.perf_counter() - started
+
+    succeeded = [r for r in results if r['status'] == 'done']
+    total_annotations = sum(r['annotations'] for r in succeeded)
+    cache_hits = sum(r['cache_hits'] for r in results)
+    cache_misses = sum(r['cache_misses'] for r in results)
+    skipped = sum(1 for r in succeeded if r.get('skipped'))
+    logger.info(f"Batch finished in {elapsed:.1f}s: {len(succeeded)} succeeded "
+                f"({skipped} unchanged), {len(results) - len(succeeded)} failed")
+    if elapsed > 0:
+        logger.info(f"Throughput: {len(succeeded) / elapsed:.2f} documents/sec, "
+                    f"{total_annotations / elapsed:.1f} annotations/sec")
+    logger.info(f"Summary cache across workers: {cache_hits} hits, {cache_misses} misses")
+    logger.info(ea.document_io_line())
+    ea.export_run_metrics()
+    return results
+
+
+def _clean_text_batch(texts) -> Tuple[List[str], float]:
+    """Pool task: clean one batch of raw highlight texts; returns them with the seconds it took"""
+    started = time.perf_counter()
+    cleaned = ea.get_text_cleaner().clean_many(texts)
+    return cleaned, time.perf_counter() - started
+
+
+class CorpusCleaner:
+    """Cleans highlight texts of many documents in a process pool, batch_size texts per task.
+
+    add() takes highlights whose text is still raw (process_single_page with
+    clean=False) and sends a batch as soon as batch_size distinct texts are
+    queued, so workers clean while later documents are being extracted. Every
+    distinct text is sent once, however many documents repeat it, and one
+    task carries many texts, so pickling and IPC cost little per text.
+    finish() writes the cleaned texts back into their annotations, which
+    stay in their documents in order.
+    """
+
+    def __init__(self, executor, batch_size: int):
+        self.executor = executor
+        self.batch_size = max(1, batch_size)
+        self.targets: Dict[str, List[Annotation]] = {}  # raw text -> annotations with that text
+        self.batch: List[str] = []
+        self.futures = []  # (raw texts, future) per submitted batch
+        self.texts = 0
+
+    def add(self, annot: Annotation):
+        self.texts += 1
+        targets = self.targets.get(annot.text)
+        if targets is not None:
+            targets.append(annot)
+            return
+        self.targets[annot.text] = [annot]
+        self.batch.append(annot.text)
+        if len(self.batch) >= self.batch_size:
+            self.submit()
+
+    def submit(self):
+        if self.batch:
+            self.futures.append((self.batch, self.executor.submit(_clean_text_batch, self.batch)))
+            self.batch = []
+
+    def finish(self) -> float:
+        """Wait for every batch and fill in the cleaned texts; returns the workers' summed seconds"""
+        self.submit()
+        busy_seconds = 0.0
+        for raw_texts, future in self.futures:
+            cleaned_texts, seconds = future.result()
+            busy_seconds += seconds
+            metrics.observe('corpus_clean_batch_seconds', seconds)
+            for raw_text, cleaned_text in zip(raw_texts, cleaned_texts):
+                for annot in self.targets[raw_text]:
+                    annot.text = cleaned_text
+        metrics.inc('texts_cleaned_total', self.texts)
+        metrics.inc('corpus_clean_batches_total', len(self.futures))
+        return busy_seconds
+
+
+def run_corpus(paths, file_list=None, manifest=None, workers=None, batch_size=None, start_page=1,
+               overrides=None):
+    """Process many PDFs as one corpus, for throughput on CPU-bound (scanned, OCR'd) collections.
+
+    The parent walks every document's annotations; the highlight texts of
+    all documents are cleaned by a process pool in batches of batch_size
+    (processing.corpus_batch_size) while extraction continues. The texts
+    are then summarized in one session, so batching, deduplication and the
+    cache work across documents, and every document gets its markdown and
+    exports. Like streaming mode, corpus runs process every document in full
+    and do not update the incremental state. Returns one entry per PDF.
+    """
+    ea.load_config(overrides)
+    pdf_paths = collect_batch_inputs(paths, file_list)
+    start_pages = load_manifest(manifest) if manifest else {}
+    if not pdf_paths:
+        logger.info("Corpus: no PDFs found")
+        return []
+    processing = ea.config.get('processing', {})
+    workers = workers or processing.get('batch_workers') or os.cpu_count() or 1
+    batch_size = batch_size or processing.get('corpus_batch_size', 1000)
+    export_formats = ea.config.get('output', {}).get('exports', [])
+
+    results = []
+    documents = []  # (pdf_path, title, annotations) of every extracted PDF, in input order
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=ea._init_page_worker,
+                             initargs=(ea.config,)) as executor:
+        cleaner = CorpusCleaner(executor, batch_size)
+        logger.info(f"Corpus: {len(pdf_paths)} PDFs, cleaning with {workers} worker processes "
+                    f"in batches of {batch_size} texts")
+        with metrics.stage('extract'):
+            for pdf_path in pdf_paths:
+                try:
+                    with ea.open_document(pdf_path) as document:
+                        title = ea.extract_pdf_title(document)
+                        annotations = list(ea.iter_annotations(document, start_pages.get(pdf_path, start_page),
+                                                               clean=False))
+                except Exception as e:
+                    logger.error(f"Corpus extraction failed for {pdf_path}: {e}")
+                    results.append({'path': pdf_path, 'status': 'failed', 'error': str(e)})
+                    continue
+                for annot in annotations:
+                    if annot.is_highlight:
+                        cleaner.add(annot)
+                documents.append((pdf_path, title, annotations))
+        extracted = time.perf_counter()
+        with metrics.stage('clean'):
+            busy_seconds = cleaner.finish()
+    cleaned = time.perf_counter()
+    logger.info(f"Corpus: {cleaner.texts} highlight texts ({len(cleaner.targets)} distinct) cleaned in "
+                f"{len(cleaner.futures)} batches, {busy_seconds:.2f}s of worker time; extraction "
+                f"{extracted - started:.2f}s, cleaning finished {cleaned - extracted:.2f}s after it")
+    if cleaned > started:
+        logger.info(f"Corpus throughput: {cleaner.texts / (cleaned - started):.0f} texts/sec "
+                    f"through extraction and cleaning")
+
+    texts = [annot.text for _, _, annotations in documents for annot in annotations if ea.needs_summary(annot)]
+    try:
+        with metrics.stage('summarize'):
+            summaries = asyncio.run(ea.summarize_annotations(texts))
+        summary_iter = iter(summaries)
+        for pdf_path, title, annotations in documents:
+            document_summaries = [next(summary_iter) for annot in annotations if ea.needs_summary(annot)]
+            output_file = os.path.splitext(pdf_path)[0] + " (annotations).md"
+            with metrics.stage('format'):
+                markdown = (ea.format_metadata(title)
+                            + ea.format_annotations_to_markdown(annotations, document_summaries))
+            with metrics.stage('write'), open(output_file, "w", encoding="utf-8") as f:
+                f.write(markdown)
+            if export_formats or ea.get_annotation_index() is not None:
+                with metrics.stage('export'):
+                    ea.export_annotations(annotations, document_summaries,
+                                          ea.document_writers(pdf_path, export_formats, title))
+            metrics.inc('documents_total', status="processed")
+            results.append({'path': pdf_path, 'status': 'done', 'output_file': output_file,
+                            'annotations': len(annotations), 'summaries': len(document_summaries)})
+    finally:
+        ea.close_summary_cache()
+        ea.close_annotation_index()
+    elapsed = time.perf_counter() - started
+
+    succeeded = [r for r in results if r['status'] == 'done']
+    logger.info(f"Corpus finished in {elapsed:.1f}s: {len(succeeded)} succeeded, "
+                f"{len(results) - len(succeeded)} failed")
+    if elapsed > 0:
+        logger.info(f"Throughput: {len(succeeded) / elapsed:.2f} documents/sec, "
+                    f"{sum(r['annotations'] for r in succeeded) / elapsed:.1f} annotations/sec")
+    logger.info(ea.document_io_line())
+    ea.export_run_metrics()
+    return results
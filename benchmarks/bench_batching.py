@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Compare one request per highlight with batched summarization requests.
+
+Summarizes the same set of short, highlight-like texts against the local
+mock server twice: with api.batching disabled and enabled. Reports the
+number of API requests and the wall time of each run. The rate limit
+defaults to the one in config.yaml, since that is where batching pays off.
+
+Usage: python benchmarks/bench_batching.py [--texts 40] [--max-tokens 2000] [--max-items 10]
+           [--latency 0.3] [--latency-per-summary 0.05] [--drop-batch-item-rate 0.0]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+import metrics
+from mock_openai_server import start_mock_server
+from synthetic_pdf import WORDS
+
+
+def make_highlights(count, seed):
+    """One- or two-sentence texts, like typical highlights"""
+    rnd = random.Random(seed)
+    texts = []
+    for i in range(count):
+        sentences = [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(12, 30))).capitalize() + "."
+                     for _ in range(rnd.randint(1, 2))]
+        texts.append(f"({i}) " + " ".join(sentences))
+    return texts
+
+
+def run(texts, batching, server):
+    ea.config['api']['batching'] = batching
+    metrics.registry.reset()
+    requests_before = server.counts['requests']
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        summaries = asyncio.run(ea.summarize_annotations(texts))
+        elapsed = time.perf_counter() - started
+        ea.close_summary_cache()  # in-memory cache: the next run starts cold
+    failed = sum(1 for summary in summaries if ea.is_summary_failure(summary))
+    return server.counts['requests'] - requests_before, elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=40)
+    parser.add_argument('--max-tokens', type=int, default=2000)
+    parser.add_argument('--max-items', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--latency-per-summary', type=float, default=0.05)
+    parser.add_argument('--drop-batch-item-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-per-minute', type=float, help='Default: api.rate_limit_per_minute')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, latency_per_summary=args.latency_per_summary,
+                               drop_batch_item_rate=args.drop_batch_item_rate, seed=args.seed)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    api_overrides = {'retry_delay': 0.1}
+    if args.rate_limit_per_minute:
+        api_overrides['rate_limit_per_minute'] = args.rate_limit_per_minute
+    with contextlib.redirect_stdout(io.StringIO()):
+        ea.load_config({'api': api_overrides, 'cache': {'enabled': False}, 'logging': {'level': 'WARNING'}})
+
+    texts = make_highlights(args.texts, args.seed)
+    print(f"{len(texts)} highlights, {ea.config['api'].get('rate_limit_per_minute', 50)} requests/minute, "
+          f"{args.latency}s latency + {args.latency_per_summary}s per summary")
+    print(f"{'mode':10} {'requests':>8} {'seconds':>8} {'failed':>6}")
+    single = run(texts, {'enabled': False}, server)
+    print(f"{'single':10} {single[0]:8d} {single[1]:8.2f} {single[2]:6d}")
+    batched = run(texts, {'enabled': True, 'max_tokens': args.max_tokens, 'max_items': args.max_items},
+                  server)
+    print(f"{'batched':10} {batched[0]:8d} {batched[1]:8.2f} {batched[2]:6d}")
+    print(f"Requests: -{(1 - batched[0] / single[0]) * 100:.0f}%, wall time: -{(1 - batched[1] / single[1]) * 100:.0f}% "
+          f"({metrics.registry.counter_value('api_batch_fallbacks_total'):.0f} single-request fallbacks)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
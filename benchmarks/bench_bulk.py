@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Bulk jobs vs. interactive summarization against a request quota.
+
+Builds a few synthetic PDFs and summarizes their highlights twice against
+the local mock server, which enforces a per-window request quota:
+
+  interactive   process_document() per PDF: one chat completion per
+                highlight, paced by the adaptive rate controller
+  bulk          --bulk prepare, submit, poll --wait and ingest: one upload
+                and one batch, answered after --batch-delay seconds
+
+Reports chat-completion requests against the quota, 429s, missing
+summaries and wall time, and checks that both runs write the same markdown.
+
+Usage: python benchmarks/bench_bulk.py [--documents 4] [--pages 10] [--quota-rpm 30]
+           [--quota-window 10] [--latency 0.3] [--batch-delay 2]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import bulk_jobs
+import extract_annotations as ea
+from mock_openai_server import start_mock_server
+from synthetic_pdf import build_annotated_pdf
+
+
+def read_outputs(directory):
+    outputs = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*(annotations).md'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            outputs[os.path.basename(path)] = f.read()
+        os.remove(path)
+    return outputs
+
+
+def run_interactive(pdf_paths, overrides):
+    ea.load_config(overrides)
+    for pdf_path in pdf_paths:
+        asyncio.run(ea.process_document(pdf_path, 1))
+    ea.close_summary_cache()
+
+
+def run_bulk(pdf_paths, job_dir, overrides):
+    bulk_jobs.bulk_prepare(job_dir, pdf_paths, overrides=overrides)
+    asyncio.run(bulk_jobs.bulk_submit(job_dir, overrides))
+    asyncio.run(bulk_jobs.bulk_poll(job_dir, wait=True, overrides=overrides))
+    asyncio.run(bulk_jobs.bulk_ingest(job_dir, overrides=overrides))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--highlights-per-page', type=int, default=3)
+    parser.add_argument('--quota-rpm', type=int, default=30, help='Requests per quota window')
+    parser.add_argument('--quota-window', type=float, default=10.0, help='Quota window in seconds')
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--batch-delay', type=float, default=2.0, help='Seconds until the mock batch completes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    overrides = {'api': {'batching': {'enabled': False}, 'max_retries': 6, 'retry_delay': 0.5},
+                 'cache': {'enabled': False},
+                 'processing': {'incremental': False, 'overlap_summaries': False},
+                 'bulk': {'poll_interval': 0.2},
+                 'logging': {'level': 'ERROR'}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_paths = []
+        for number in range(args.documents):
+            pdf_path = os.path.join(tmp, f"doc{number}.pdf")
+            build_annotated_pdf(pdf_path, pages=args.pages, highlights_per_page=args.highlights_per_page,
+                                seed=args.seed + number)
+            pdf_paths.append(pdf_path)
+
+        print(f"{args.documents} PDFs, quota {args.quota_rpm} requests per {args.quota_window:g}s, "
+              f"{args.latency}s latency, batch ready after {args.batch_delay:g}s")
+        print(f"{'mode':<12} {'requests':>9} {'429s':>6} {'missing':>8} {'seconds':>8}")
+        outputs = {}
+        for mode in ('interactive', 'bulk'):
+            server = start_mock_server(latency=args.latency, seed=args.seed, quota_rpm=args.quota_rpm,
+                                       quota_window=args.quota_window, batch_delay=args.batch_delay)
+            os.environ['OPENAI_BASE_URL'] = server.base_url
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                if mode == 'interactive':
+                    run_interactive(pdf_paths, overrides)
+                else:
+                    run_bulk(pdf_paths, os.path.join(tmp, 'job'), overrides)
+                elapsed = time.perf_counter() - started
+            server.shutdown()
+            outputs[mode] = read_outputs(tmp)
+            missing = sum(text.count("Summary not available") for text in outputs[mode].values())
+            counts = server.counts
+            print(f"{mode:<12} {counts['requests']:9d} {counts['quota_rejected']:6d} {missing:8d} {elapsed:8.2f}"
+                  + (f"  ({counts.get('batch_requests', 0)} requests in {counts.get('batches', 0)} batch)"
+                     if mode == 'bulk' else ""))
+        same = outputs['interactive'] == outputs['bulk']
+        print(f"\nmarkdown identical: {'yes' if same else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Corpus mode text cleaning: texts/sec by worker count and batch size.
+
+Builds a corpus of OCR-like highlight texts from the golden cleaning
+inputs (benchmarks/data/clean_text_golden.json, joined at random so no two
+texts are alike) and cleans it with the memo off, so repeated runs in the
+same workers do not get faster:
+
+  inline      TextCleaner.clean_many in this process (what extraction does
+              page by page)
+  W x B       CorpusCleaner with W worker processes and B texts per task,
+              as --corpus runs it
+
+Pools are started and warmed up before timing, so the numbers show
+cleaning and IPC only. Small batches pay pickling and a round trip per few
+texts; large ones leave workers idle at the end of the corpus. Every run is
+checked against the inline result.
+
+Usage: python benchmarks/bench_corpus.py [--texts 20000] [--workers 1,2,4]
+           [--batch-sizes 10,100,1000,5000] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import batch_mode
+import extract_annotations as ea
+from annotation_records import Annotation, HIGHLIGHT
+from text_cleaner import TextCleaner
+
+GOLDEN_PATH = os.path.join(BENCH_DIR, "data", "clean_text_golden.json")
+
+
+def build_corpus(count, seed):
+    """count distinct texts, each two to four golden inputs joined with a space"""
+    with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+        inputs = [case['input'] for case in json.load(f) if len(case['input']) > 20]
+    rnd = random.Random(seed)
+    texts = set()
+    while len(texts) < count:
+        texts.add(" ".join(rnd.sample(inputs, rnd.randint(2, 4))).strip().replace('\n', ' '))
+    return sorted(texts)
+
+
+def warm_up(executor, workers):
+    """Start every worker process (and import the cleaner there) before timing"""
+    list(executor.map(batch_mode._clean_text_batch, [["warm- up"]] * workers * 4))
+
+
+def run_pool(executor, texts, batch_size):
+    annotations = [Annotation(1, HIGHLIGHT, "#ffd400", (0, 0, 0, 0), text=text) for text in texts]
+    started = time.perf_counter()
+    cleaner = batch_mode.CorpusCleaner(executor, batch_size)
+    for annot in annotations:
+        cleaner.add(annot)
+    cleaner.finish()
+    return time.perf_counter() - started, [annot.text for annot in annotations]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=20000)
+    parser.add_argument('--workers', default=None,
+                        help='Comma-separated worker counts (default: 1, 2, 4, ... up to the CPU count)')
+    parser.add_argument('--batch-sizes', default='10,100,1000,5000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(value) for value in args.workers.split(',')]
+    else:
+        worker_counts = sorted({min(2 ** i, cpu_count) for i in range(cpu_count.bit_length() + 1)})
+    batch_sizes = [int(value) for value in args.batch_sizes.split(',')]
+
+    ea.config = {'processing': {'clean_memo_size': 0}}
+    texts = build_corpus(args.texts, args.seed)
+    print(f"{len(texts)} texts, {sum(map(len, texts)) / len(texts):.0f} chars on average, "
+          f"{cpu_count} CPUs, best of {args.repeat} runs")
+
+    TextCleaner().clean_many(texts[:1000])  # warm up, as the pools are
+    best_inline = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        expected = TextCleaner().clean_many(texts)
+        elapsed = time.perf_counter() - started
+        best_inline = elapsed if best_inline is None else min(best_inline, elapsed)
+    print(f"\n{'run':<14} {'texts/sec':>10} {'speedup':>8}")
+    print(f"{'inline':<14} {len(texts) / best_inline:10.0f} {1.0:7.2f}x")
+
+    best = None
+    for workers in worker_counts:
+        with ProcessPoolExecutor(max_workers=workers, initializer=ea._init_page_worker,
+                                 initargs=(ea.config,)) as executor:
+            warm_up(executor, workers)
+            for batch_size in batch_sizes:
+                elapsed = None
+                for _ in range(args.repeat):
+                    seconds, cleaned = run_pool(executor, texts, batch_size)
+                    if cleaned != expected:
+                        sys.exit(f"{workers} workers x {batch_size}: cleaned texts differ from the inline run")
+                    elapsed = seconds if elapsed is None else min(elapsed, seconds)
+                rate = len(texts) / elapsed
+                print(f"{f'{workers} x {batch_size}':<14} {rate:10.0f} {best_inline / elapsed:7.2f}x")
+                if best is None or rate > best[0]:
+                    best = (rate, workers, batch_size)
+    print(f"\nbest: {best[1]} workers, {best[2]} texts per batch ({best[0]:.0f} texts/sec); "
+          f"set processing.corpus_batch_size or --text-batch-size accordingly")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Count the API requests saved by in-flight coalescing and near-duplicate reuse.
+
+Builds a highlight list in which some texts repeat verbatim and some are
+re-highlighted variants of earlier ones (different whitespace, hyphenation,
+case, a few words more or less). The list is summarized against the local
+mock server with api.near_duplicates disabled and enabled. Identical
+texts share one in-flight request in both runs. Reports requests, wall time,
+texts that shared an in-flight request, texts that reused a near-duplicate's
+summary, and variants whose summary differs from their original's.
+
+Usage: python benchmarks/bench_dedup.py [--texts 200] [--duplicate-ratio 0.2]
+           [--variant-ratio 0.2] [--threshold 0.9] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+import metrics
+from mock_openai_server import start_mock_server
+from synthetic_pdf import WORDS
+
+
+def make_variant(text, rnd):
+    """Re-highlighted passage: same words with cleaning artefacts and ragged ends"""
+    words = text.split()
+    if rnd.random() < 0.5:
+        words = words[1:]
+    else:
+        words.append(rnd.choice(WORDS))
+    position = rnd.randrange(len(words))
+    if len(words[position]) > 5:
+        word = words[position]
+        words[position] = f"{word[:3]}- {word[3:]}"
+    return "  ".join(words) if rnd.random() < 0.5 else " ".join(words).lower()
+
+
+def make_highlights(count, duplicate_ratio, variant_ratio, seed):
+    """Returns (texts, origin) where origin[i] is the index of the text i was derived from"""
+    rnd = random.Random(seed)
+    texts, origin = [], []
+    for i in range(count):
+        roll = rnd.random()
+        if texts and roll < duplicate_ratio:
+            source = origin[rnd.randrange(len(texts))]
+            texts.append(texts[source])
+        elif texts and roll < duplicate_ratio + variant_ratio:
+            source = origin[rnd.randrange(len(texts))]
+            texts.append(make_variant(texts[source], rnd))
+        else:
+            source = i
+            texts.append(" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(20, 50))).capitalize() + ".")
+        origin.append(source)
+    return texts, origin
+
+
+def run(texts, near_duplicates, server):
+    ea.config['api']['near_duplicates'] = near_duplicates
+    metrics.registry.reset()
+    requests_before = server.counts['requests']
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        summaries = asyncio.run(ea.summarize_annotations(texts))
+        elapsed = time.perf_counter() - started
+        ea.close_summary_cache()  # in-memory cache: the next run starts cold
+    return summaries, server.counts['requests'] - requests_before, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=200)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2, help='Share of verbatim repeats')
+    parser.add_argument('--variant-ratio', type=float, default=0.2, help='Share of near-duplicate variants')
+    parser.add_argument('--threshold', type=float, default=0.9)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, seed=args.seed)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    with contextlib.redirect_stdout(io.StringIO()):
+        ea.load_config({'api': {'rate_limit_per_minute': 60000, 'max_concurrency': 16, 'retry_delay': 0.1},
+                        'cache': {'enabled': False}, 'logging': {'level': 'WARNING'}})
+
+    texts, origin = make_highlights(args.texts, args.duplicate_ratio, args.variant_ratio, args.seed)
+    unique = sum(1 for i, source in enumerate(origin) if source == i)
+    print(f"{len(texts)} highlights: {unique} originals, "
+          f"{sum(1 for i, s in enumerate(origin) if s != i and texts[i] == texts[s])} verbatim repeats, "
+          f"{sum(1 for i, s in enumerate(origin) if s != i and texts[i] != texts[s])} variants")
+    print(f"{'near-dups':10} {'requests':>8} {'seconds':>8} {'shared':>6} {'reused':>6} {'missed':>6}")
+    for enabled in (False, True):
+        summaries, requests, elapsed = run(texts, {'enabled': enabled, 'threshold': args.threshold}, server)
+        shared = metrics.registry.counter_value('api_calls_saved_total', reason="in_flight")
+        reused = metrics.registry.counter_value('api_calls_saved_total', reason="near_duplicate")
+        # Variants that got a summary of their own although their original had one
+        missed = sum(1 for i, source in enumerate(origin)
+                     if source != i and texts[i] != texts[source] and summaries[i] != summaries[source])
+        print(f"{'on' if enabled else 'off':10} {requests:8d} {elapsed:8.2f} {shared:6.0f} {reused:6.0f} {missed:6d}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
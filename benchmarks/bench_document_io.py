@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""PDF opens and input bytes per document: separate opens vs. one DocumentSession.
+
+Generates (or reuses) a synthetic annotated PDF and runs the steps
+process_document() needs from the file before any page is loaded (title,
+content hash, per-page annotation fingerprints, and the annotated-page
+scan extraction starts with) in two ways:
+
+  separate   every step opens the PDF by path, as before document sessions
+             (three opens plus a second read of the file for the hash)
+  session    one DocumentSession per input mode: file, mmap, memory, and
+             bytes (the PDF already in memory, as when read from stdin)
+
+Reports opens, bytes read by the extractor and the best wall time of
+--repeat runs. On a local disk the page cache hides most of the I/O; on a
+network mount every extra open and read is a round trip.
+
+Usage: python benchmarks/bench_document_io.py [--pages 2000] [--repeat 5] [--pdf FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fitz  # PyMuPDF
+
+import annotation_state
+import extract_annotations as ea
+import metrics
+from document_session import DocumentSession
+from synthetic_pdf import build_annotated_pdf
+
+
+def run_separate(pdf_path):
+    ea.config['processing']['document_input'] = 'file'
+    ea.extract_pdf_title(pdf_path)
+    fingerprint = annotation_state.file_fingerprint(pdf_path)
+    metrics.inc('document_input_bytes_total', fingerprint['size'])
+    with fitz.open(pdf_path) as doc:
+        metrics.inc('document_opens_total')
+        annotation_state.page_annotation_fingerprints(doc)
+    with fitz.open(pdf_path) as doc:  # extraction's own open
+        metrics.inc('document_opens_total')
+        return len(ea.scan_annotated_pages(doc))
+
+
+def run_session(pdf_path, input_mode, data=None):
+    if data is not None:
+        document = DocumentSession.from_stream(io.BytesIO(data), pdf_path)
+    else:
+        document = DocumentSession.from_path(pdf_path, input_mode)
+    with document:
+        ea.extract_pdf_title(document)
+        document.fingerprint()
+        annotation_state.page_annotation_fingerprints(document.doc)
+        return len(ea.scan_annotated_pages(document.doc))
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        metrics.registry.reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            count = func()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, int(metrics.registry.counter_value('document_opens_total')),
+            metrics.registry.counter_value('document_input_bytes_total'), count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pdf', help='Use an existing PDF instead of generating one')
+    args = parser.parse_args()
+
+    ea.config = {'processing': {'engine': 'thread'}, 'colors': {'summary_colors': []}}
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or os.path.join(tmp, 'synthetic.pdf')
+        if not args.pdf:
+            print(f"Generating {args.pages}-page PDF...")
+            build_annotated_pdf(pdf_path, pages=args.pages)
+        with open(pdf_path, 'rb') as f:
+            data = f.read()
+        print(f"{os.path.getsize(pdf_path) / 1e6:.1f} MB PDF, best of {args.repeat} runs")
+
+        runs = [('separate', lambda: run_separate(pdf_path))]
+        for input_mode in ('file', 'mmap', 'memory'):
+            runs.append((input_mode, lambda input_mode=input_mode: run_session(pdf_path, input_mode)))
+        runs.append(('bytes', lambda: run_session(pdf_path, 'bytes', data)))
+
+        print(f"{'input':10} {'opens':>5} {'MB read':>8} {'seconds':>8} {'pages':>6}")
+        for name, func in runs:
+            elapsed, opens, read_bytes, count = measure(func, args.repeat)
+            print(f"{name:10} {opens:5d} {read_bytes / 1e6:8.2f} {elapsed:8.3f} {count:6d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Library index: indexing throughput, query latency and re-indexing one document.
+
+Fills a fresh index with synthetic documents (no PDFs involved; the records
+are what extract_annotations would emit). Words are drawn from a vocabulary of
+pseudo-words with a Zipf distribution, like natural text, so common query
+words match many annotations and rare ones few. Reports:
+
+  index        annotations per second while adding every document
+  query        median and 95th percentile latency of ranked searches for
+               single words, two-word AND queries, phrases and prefixes
+  reindex      time to replace one document's entries, as when it is reprocessed
+
+Usage: python benchmarks/bench_index.py [--documents 3000] [--annotations 50] [--queries 200]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from annotation_index import AnnotationIndex
+from annotation_records import Annotation, HIGHLIGHT, HIGHLIGHT_COMMENT, NOTE
+
+COLORS = ["#ffd400", "#ff6666", "#5fb236", "#2ea8e5"]
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "sen", "vol", "dor", "pha", "qui", "bex", "tri", "gan", "zu"]
+
+
+class Vocabulary:
+    """Pseudo-words sampled with Zipf frequencies (the n-th most common word has weight 1/n)"""
+
+    def __init__(self, rnd, size):
+        words = set()
+        while len(words) < size:
+            words.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))))
+        self.words = sorted(words)
+        rnd.shuffle(self.words)
+        self.cumulative = list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+        self.rnd = rnd
+
+    def sample(self, count):
+        return self.rnd.choices(self.words, cum_weights=self.cumulative, k=count)
+
+    def text(self, low, high):
+        return " ".join(self.sample(self.rnd.randint(low, high)))
+
+
+def make_document(rnd, vocabulary, count):
+    """(annotations, summaries) for one document; about one highlight in ten has a summary"""
+    annotations, summaries = [], []
+    for i in range(count):
+        type_ = rnd.choice([HIGHLIGHT] * 8 + [HIGHLIGHT_COMMENT, NOTE])
+        text = vocabulary.text(10, 40) if type_ != NOTE else ""
+        comment = vocabulary.text(3, 10) if type_ != HIGHLIGHT else ""
+        annotations.append(Annotation(i // 5 + 1, type_, rnd.choice(COLORS), (50, 60, 500, 90), text, comment))
+        summaries.append(vocabulary.text(30, 30) if type_ == HIGHLIGHT and rnd.random() < 0.1 else None)
+    return annotations, summaries
+
+
+def add_document(index, path, title, document):
+    with index.writer(path, title, sha256=path) as writer:
+        for annot, summary in zip(*document):
+            writer.write(annot, summary)
+
+
+def make_queries(vocabulary, count):
+    """Single words, two-word AND queries, phrases and prefixes, in turn"""
+    queries = []
+    for i in range(count):
+        first, second = vocabulary.sample(2)
+        queries.append([first, f"{first} AND {second}", f'"{first} {second}"', first[:4] + "*"][i % 4])
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=3000)
+    parser.add_argument('--annotations', type=int, default=50, help='Annotations per document')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--vocabulary', type=int, default=30000, help='Distinct words')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    vocabulary = Vocabulary(rnd, args.vocabulary)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = AnnotationIndex(os.path.join(tmp, "library.sqlite3"))
+        started = time.perf_counter()
+        for i in range(args.documents):
+            add_document(index, f"/library/paper-{i}.pdf", f"Paper {i}", make_document(rnd, vocabulary, args.annotations))
+        elapsed = time.perf_counter() - started
+        documents, annotations = index.counts()
+        size = os.path.getsize(index.path) + os.path.getsize(index.path + "-wal")
+        print(f"index:   {annotations} annotations from {documents} documents in {elapsed:.1f}s "
+              f"({annotations / elapsed:,.0f}/s, {size / 1e6:.0f} MB)")
+
+        times = []
+        for query in make_queries(vocabulary, args.queries):
+            query_started = time.perf_counter()
+            index.search(query, limit=args.limit)
+            times.append(time.perf_counter() - query_started)
+        times.sort()
+        print(f"query:   median {statistics.median(times) * 1000:.2f} ms, "
+              f"p95 {times[int(len(times) * 0.95)] * 1000:.2f} ms, max {times[-1] * 1000:.2f} ms "
+              f"over {len(times)} queries (top {args.limit})")
+
+        document = make_document(rnd, vocabulary, args.annotations)
+        times = []
+        for _ in range(20):
+            reindex_started = time.perf_counter()
+            add_document(index, "/library/paper-0.pdf", "Paper 0", document)
+            times.append(time.perf_counter() - reindex_started)
+        print(f"reindex: {statistics.median(times) * 1000:.2f} ms per document "
+              f"({args.annotations} annotations, median of {len(times)})")
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Benchmark page extraction engines: thread pool vs. process pool, 1..N workers.
+
+Generates (or reuses) a synthetic annotated PDF and times extract_annotations
+for each engine and worker count.
+
+Usage: python benchmarks/bench_page_engines.py [--pages 1000] [--max-workers 8] [--chunk-size 100]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+from synthetic_pdf import build_annotated_pdf
+
+
+def time_engine(pdf_path, engine, workers, chunk_size):
+    ea.config['processing'].update(engine=engine, max_workers=workers, chunk_size=chunk_size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        annotations, _ = ea.extract_annotations(pdf_path, 1)
+        elapsed = time.perf_counter() - started
+    return elapsed, len(annotations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--pdf', help='Use an existing PDF instead of generating one')
+    args = parser.parse_args()
+
+    ea.config = {'processing': {}, 'colors': {'summary_colors': []}}
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or os.path.join(tmp, 'synthetic.pdf')
+        if not args.pdf:
+            print(f"Generating {args.pages}-page PDF...")
+            build_annotated_pdf(pdf_path, pages=args.pages)
+
+        worker_counts = sorted({1, 2, 4, 8, args.max_workers} & set(range(1, args.max_workers + 1)))
+        baseline = None
+        print(f"{'engine':8} {'workers':>7} {'seconds':>8} {'speedup':>8} {'annots':>7}")
+        for engine in ('thread', 'process'):
+            for workers in worker_counts:
+                elapsed, count = time_engine(pdf_path, engine, workers, args.chunk_size)
+                baseline = baseline or elapsed
+                print(f"{engine:8} {workers:7d} {elapsed:8.2f} {baseline / elapsed:7.1f}x {count:7d}")
+
+
+if __name__ == '__main__':
+    main()
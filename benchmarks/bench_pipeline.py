@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Per-stage timing of the whole pipeline on a synthetic PDF, emitted as JSON.
+
+Generates a PDF with benchmarks/synthetic_pdf.py, starts the local mock
+chat-completions server, and times each stage separately:
+
+  open         fitz.open of the document
+  page_scan    /Annots pre-scan, loading annotated pages and reading their annotations
+  quad_text    highlight text extraction from the quads ("clip" or "words")
+  cleaning     TextCleaner over all extracted highlight texts
+  extraction   extract_annotations end to end (process_single_page on every page)
+  api          summarize_annotations for the summary-colored highlights (mock server)
+  markdown     format_annotations_to_markdown
+
+Each stage runs --repeat times; the JSON records min, median and max
+seconds per stage plus the parameters and counts, so results of different
+commits can be compared. --compare OLD.json prints the change per stage.
+
+Usage: python benchmarks/bench_pipeline.py [--pages 200] [--columns 2] [--latency 0.05]
+           [--rate-429 0.02] [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fitz  # PyMuPDF
+
+import extract_annotations as ea
+from mock_openai_server import start_mock_server
+from synthetic_pdf import build_annotated_pdf
+from text_cleaner import TextCleaner
+
+STAGES = ('open', 'page_scan', 'quad_text', 'cleaning', 'extraction', 'api', 'markdown')
+
+
+def timed(timings, stage, func, *args):
+    """Run func(*args) with stdout silenced and record its duration under stage"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+    return result
+
+
+def scan_highlights(doc):
+    """Pre-scan, then load each annotated page and collect its highlight quads"""
+    pages = []
+    for page_num in ea.scan_annotated_pages(doc):
+        page = doc[page_num]
+        quads = [ea.highlight_quad_rects(annot) for annot in page.annots()
+                 if annot.type[0] == ea.AnnotationType.HIGHLIGHT.value]
+        if quads:
+            pages.append((page, quads))
+    return pages
+
+
+def extract_quad_texts(pages, mode):
+    texts = []
+    for page, quads in pages:
+        if mode == 'words':
+            texts.extend(ea.PageWords(page).highlight_texts(quads))
+        else:
+            texts.extend(ea.extract_highlight_texts_clip(page, quads))
+    return texts
+
+
+def run_once(pdf_path, mode, timings):
+    doc = timed(timings, 'open', fitz.open, pdf_path)
+    try:
+        pages = timed(timings, 'page_scan', scan_highlights, doc)
+        raw_texts = timed(timings, 'quad_text', extract_quad_texts, pages, mode)
+    finally:
+        doc.close()
+    timed(timings, 'cleaning', lambda texts: TextCleaner().clean_many(
+        text.strip().replace('\n', ' ') for text in texts), raw_texts)
+
+    annotations, _ = timed(timings, 'extraction', ea.extract_annotations, pdf_path, 1)
+    texts = [annot.text for annot in annotations if ea.needs_summary(annot)]
+    summaries = timed(timings, 'api', asyncio.run, ea.summarize_annotations(texts))
+    ea.close_summary_cache()  # in-memory cache: the next repeat must hit the API again
+    timed(timings, 'markdown', ea.format_annotations_to_markdown, annotations, summaries)
+    return {'pages': len(pages), 'highlights': len(raw_texts), 'annotations': len(annotations),
+            'summaries': len(summaries),
+            'failed_summaries': sum(1 for summary in summaries if ea.is_summary_failure(summary))}
+
+
+def summarize_timings(timings):
+    return {stage: {'min': min(values), 'median': statistics.median(values), 'max': max(values)}
+            for stage, values in ((stage, timings[stage]) for stage in STAGES if stage in timings)}
+
+
+def print_table(result, previous=None):
+    header = f"{'stage':<11} {'min s':>9} {'median s':>9}"
+    print(header + (f" {'prev median':>11} {'change':>8}" if previous else ""))
+    for stage, stats in result['stages'].items():
+        line = f"{stage:<11} {stats['min']:9.4f} {stats['median']:9.4f}"
+        old = (previous or {}).get('stages', {}).get(stage)
+        if old:
+            change = (stats['median'] - old['median']) / old['median'] * 100 if old['median'] else 0.0
+            line += f" {old['median']:11.4f} {change:+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', help='Use an existing PDF instead of generating one')
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--highlights-per-page', type=int, default=3)
+    parser.add_argument('--annotated-page-ratio', type=float, default=0.5)
+    parser.add_argument('--columns', type=int, default=2)
+    parser.add_argument('--notes-per-page', type=int, default=1)
+    parser.add_argument('--freetext-per-page', type=int, default=1)
+    parser.add_argument('--summary-ratio', type=float, default=0.3)
+    parser.add_argument('--text-extraction', choices=('clip', 'words'), default='clip')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mock API latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--rate-limit-per-minute', type=float, default=6000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON result to this file')
+    parser.add_argument('--compare', help='Previous JSON result to compare medians against')
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                               error_rate=args.error_rate, retry_after=0.1, seed=args.seed)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    with contextlib.redirect_stdout(io.StringIO()):
+        ea.load_config({
+            'api': {'max_concurrency': args.max_concurrency, 'rate_limit_per_minute': args.rate_limit_per_minute,
+                    'retry_delay': 0.1},
+            'cache': {'enabled': False},
+            'processing': {'engine': 'thread', 'text_extraction': args.text_extraction},
+        })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or os.path.join(tmp, 'synthetic.pdf')
+        if not args.pdf:
+            build_annotated_pdf(pdf_path, pages=args.pages, highlights_per_page=args.highlights_per_page,
+                                annotated_page_ratio=args.annotated_page_ratio, summary_ratio=args.summary_ratio,
+                                seed=args.seed, columns=args.columns, notes_per_page=args.notes_per_page,
+                                freetext_per_page=args.freetext_per_page)
+        timings = {}
+        counts = None
+        for _ in range(args.repeat):
+            counts = run_once(pdf_path, args.text_extraction, timings)
+
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'pymupdf': fitz.VersionBind,
+        'cpu_count': os.cpu_count(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'counts': counts,
+        'mock_server': dict(server.counts),
+        'stages': summarize_timings(timings),
+    }
+    server.shutdown()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print_table(result, previous)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
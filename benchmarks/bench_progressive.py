@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Time to first byte vs. time to complete: final write vs. progressive output.
+
+Builds a synthetic PDF and processes it twice against the local mock
+server, whose answers take --latency plus --latency-per-summary seconds
+of generation time:
+
+  final         the markdown is written once, after the last summary
+  progressive   processing.progressive: the markdown is written right after
+                extraction and summaries stream into it (the mock sends
+                one chunk per word)
+
+Reports time to first byte and time to complete as process_document()
+measures them. A thread polls the output file like an editor would and
+records when the first summary text shows up in it. Checks that both runs
+end with the same markdown.
+
+Usage: python benchmarks/bench_progressive.py [--pages 10] [--highlights-per-page 3]
+           [--latency 0.3] [--latency-per-summary 1.0] [--max-concurrency 8]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+from mock_openai_server import start_mock_server
+from synthetic_pdf import build_annotated_pdf
+
+
+class OutputWatcher(threading.Thread):
+    """Polls a file and records when a summary first shows up in it"""
+
+    def __init__(self, path, started, poll=0.01):
+        super().__init__(daemon=True)
+        self.path = path
+        self.started = started
+        self.poll = poll
+        self.first_summary = None
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.is_set() and self.first_summary is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except FileNotFoundError:
+                text = None
+            # A summary is visible once some block shows more than the placeholder
+            if text and "(Summarized)**\n- " in text:
+                self.first_summary = time.perf_counter() - self.started
+            time.sleep(self.poll)
+
+
+def run(pdf_path, output_file, overrides):
+    ea.load_config(overrides)
+    started = time.perf_counter()
+    watcher = OutputWatcher(output_file, started)
+    watcher.start()
+    result = asyncio.run(ea.process_document(pdf_path, 1))
+    watcher.done.set()
+    watcher.join()
+    ea.close_summary_cache()
+    with open(output_file, 'r', encoding='utf-8') as f:
+        markdown = f.read()
+    os.remove(output_file)
+    return result, watcher, markdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--highlights-per-page', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--latency-per-summary', type=float, default=1.0,
+                        help='Generation time of one summary, spread over its chunks when streamed')
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'synthetic.pdf')
+        output_file = os.path.join(tmp, 'synthetic (annotations).md')
+        build_annotated_pdf(pdf_path, pages=args.pages, highlights_per_page=args.highlights_per_page,
+                            seed=args.seed)
+        server = start_mock_server(latency=args.latency, latency_per_summary=args.latency_per_summary,
+                                   seed=args.seed)
+        os.environ['OPENAI_BASE_URL'] = server.base_url
+
+        print(f"{args.pages} pages, {args.latency}s latency + {args.latency_per_summary}s generation "
+              f"per summary, {args.max_concurrency} concurrent requests")
+        print(f"{'output':<12} {'first byte':>10} {'1st summary':>11} {'complete':>9}")
+        outputs = {}
+        for mode in ('final', 'progressive'):
+            overrides = {'api': {'batching': {'enabled': False}, 'max_concurrency': args.max_concurrency},
+                         'cache': {'enabled': False},
+                         'processing': {'incremental': False, 'progressive': mode == 'progressive'},
+                         'logging': {'level': 'ERROR'}}
+            with contextlib.redirect_stdout(io.StringIO()):
+                result, watcher, outputs[mode] = run(pdf_path, output_file, overrides)
+            # Without progressive output, summaries appear when the file does
+            first_summary = watcher.first_summary or result['first_byte_seconds']
+            print(f"{mode:<12} {result['first_byte_seconds']:10.2f} {first_summary:11.2f} "
+                  f"{result['complete_seconds']:9.2f}")
+        server.shutdown()
+        same = outputs['final'] == outputs['progressive']
+        print(f"\nmarkdown identical: {'yes' if same else 'no'}; "
+              f"{server.counts['streamed']} streamed answers")
+
+
+if __name__ == '__main__':
+    main()
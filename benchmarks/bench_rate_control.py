@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Adaptive rate control against an API quota the client was not told about.
+
+Summarizes the same texts against the local mock server, which enforces a
+request and a token quota per window (see mock_openai_server.py). The
+client's own api.rate_limit_per_minute is set far above the quota, as when
+config.yaml does not match the account's tier. Three runs:
+
+  fixed              api.adaptive disabled: a fixed cap of max_concurrency
+                     requests and plain exponential backoff on 429
+  adaptive           the controller: AIMD concurrency, x-ratelimit-* budgets,
+                     Retry-After pauses and jittered retries
+  adaptive/no-hdrs   the controller against a server that sends no
+                     x-ratelimit-* headers, so only 429s and Retry-After guide it
+
+Reports requests sent, 429s, summaries that failed after all retries, wall
+time, throughput, and the highest concurrency the server saw.
+
+Usage: python benchmarks/bench_rate_control.py [--texts 200] [--quota-rpm 60] [--quota-tpm 20000]
+           [--quota-window 10] [--max-concurrency 16] [--max-retries 6] [--latency 0.3]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+import metrics
+from bench_batching import make_highlights
+from mock_openai_server import start_mock_server
+
+
+def run(texts, args, adaptive, quota_headers):
+    server = start_mock_server(latency=args.latency, jitter=args.latency / 3, seed=args.seed,
+                               quota_rpm=args.quota_rpm, quota_tpm=args.quota_tpm,
+                               quota_window=args.quota_window, quota_headers=quota_headers)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    ea.config['api']['adaptive'] = {'enabled': adaptive}
+    metrics.registry.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        summaries = asyncio.run(ea.summarize_annotations(texts))
+        elapsed = time.perf_counter() - started
+        ea.close_summary_cache()  # in-memory cache: the next run starts cold
+    server.shutdown()
+    failed = sum(1 for summary in summaries if ea.is_summary_failure(summary))
+    rejected = server.counts['quota_rejected']
+    return server.counts['requests'], rejected, failed, elapsed, server.max_in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=200)
+    parser.add_argument('--quota-rpm', type=int, default=60, help='Requests per quota window')
+    parser.add_argument('--quota-tpm', type=int, default=20000, help='Tokens per quota window')
+    parser.add_argument('--quota-window', type=float, default=10.0, help='Quota window in seconds')
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    parser.add_argument('--max-retries', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    with contextlib.redirect_stdout(io.StringIO()):
+        ea.load_config({'api': {'retry_delay': 0.5, 'max_retries': args.max_retries,
+                                'max_concurrency': args.max_concurrency, 'rate_limit_per_minute': 100000,
+                                'rate_limit_burst': args.max_concurrency, 'batching': {'enabled': False}},
+                        'cache': {'enabled': False}, 'logging': {'level': 'ERROR'}})
+
+    texts = make_highlights(args.texts, args.seed)
+    print(f"{len(texts)} highlights, quota {args.quota_rpm} requests and {args.quota_tpm} tokens "
+          f"per {args.quota_window:g}s, max_concurrency {args.max_concurrency}, {args.latency}s latency")
+    print(f"{'mode':17} {'requests':>8} {'429s':>6} {'failed':>6} {'seconds':>8} {'texts/s':>8} {'peak':>5}")
+    for mode, adaptive, quota_headers in (('fixed', False, True), ('adaptive', True, True),
+                                          ('adaptive/no-hdrs', True, False)):
+        requests, rejected, failed, elapsed, peak = run(texts, args, adaptive, quota_headers)
+        print(f"{mode:17} {requests:8d} {rejected:6d} {failed:6d} {elapsed:8.2f} "
+              f"{(len(texts) - failed) / elapsed:8.2f} {peak:5d}")
+    print("(peak: most requests the server was working on at once; 429s: requests over quota)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Annotation records vs. the former dict representation, and export throughput.
+
+Builds N synthetic annotations (plain highlights, highlights with a comment,
+notes and FreeText comments) and measures:
+
+  memory       bytes retained per annotation, texts included, with
+               tracemalloc: the former dict ({'page', 'type', 'content',
+               'color'}, comment folded into 'content') vs. Annotation, which
+               also keeps the rectangle
+  format       markdown formatting time: the former formatter (which split
+               "Highlighted Text: ...\\nComment: ..." again) vs. the current one
+  export       rows per second for each export format, to a temporary directory
+
+Usage: python benchmarks/bench_records.py [--annotations 100000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from annotation_export import EXPORT_WRITERS, export_path, format_annotation_markdown, open_export_writers
+from annotation_records import Annotation, FREETEXT_COMMENT, HIGHLIGHT, HIGHLIGHT_COMMENT, NOTE
+from synthetic_pdf import WORDS
+
+COLORS = ["#ffd400", "#ff6666", "#5fb236", "#2ea8e5", "#a28ae5"]
+TYPES = [HIGHLIGHT] * 6 + [HIGHLIGHT_COMMENT] * 2 + [NOTE, FREETEXT_COMMENT]
+
+
+def legacy_format_annotation_markdown(annot, summary=None):
+    """The formatter as it was for dict annotations"""
+    if summary is not None:
+        return f"- **Highlight on Page {annot['page']} (Summarized)**\n{summary}\n\n"
+    if annot['type'] == "Highlight":
+        return f"> {annot['content']} (p. {annot['page']})\n\n"
+    if annot['type'] == "Highlight Comment":
+        highlighted = comment = ""
+        for line in annot['content'].splitlines():
+            if line.startswith("Highlighted Text:"):
+                highlighted = line.replace("Highlighted Text:", "").strip()
+            elif line.startswith("Comment:"):
+                comment = line.replace("Comment:", "").strip()
+        return f"- {comment}\n\n> {highlighted} (p. {annot['page']})\n\n"
+    if annot['type'] == "Note":
+        return f"- **Note on Page {annot['page']}**\n- {annot['content']}\n\n"
+    if annot['type'] == "FreeText Comment":
+        return f"- **Comment on Page {annot['page']}**\n- {annot['content']}\n\n"
+    return ""
+
+
+def make_fields(count, seed):
+    """(page, type, color, rect, text, comment) tuples; colors are distinct strings as read from a PDF"""
+    rnd = random.Random(seed)
+    fields = []
+    for i in range(count):
+        type_ = rnd.choice(TYPES)
+        words = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 40)))
+        x0, y0 = rnd.uniform(40, 300), rnd.uniform(40, 700)
+        rect = (x0, y0, x0 + rnd.uniform(50, 250), y0 + rnd.uniform(10, 60))
+        text = words if type_ in (HIGHLIGHT, HIGHLIGHT_COMMENT) else ""
+        comment = "" if type_ == HIGHLIGHT else " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 12)))
+        color = "".join(rnd.choice(COLORS))  # a new string object, like the one built per annotation
+        fields.append((i // 20 + 1, type_, color, rect, text, comment))
+    return fields
+
+
+def legacy_dict(page, type_, color, rect, text, comment):
+    if type_ == HIGHLIGHT_COMMENT:
+        content = f"Highlighted Text: {text}\nComment: {comment}"
+    else:
+        content = text or comment
+    return {"page": page, "type": type_, "content": content, "color": color}
+
+
+def measure_memory(count, seed, build):
+    """Bytes retained per annotation when build() turns freshly extracted fields into annotations"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(*f) for f in make_fields(count, seed)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size / len(items), items
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--annotations', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fields = make_fields(args.annotations, args.seed)
+    print(f"{len(fields)} annotations")
+
+    # Includes the texts, which both keep, and the record's rectangle, which the dict did not have
+    dict_bytes, dicts = measure_memory(args.annotations, args.seed, legacy_dict)
+    record_bytes, records = measure_memory(args.annotations, args.seed, Annotation)
+    print(f"memory per annotation: dict {dict_bytes:.0f} B, record {record_bytes:.0f} B "
+          f"({(1 - record_bytes / dict_bytes) * 100:.0f}% less)")
+
+    legacy_seconds = best_time(lambda: "".join(map(legacy_format_annotation_markdown, dicts)), args.repeat)
+    record_seconds = best_time(lambda: "".join(map(format_annotation_markdown, records)), args.repeat)
+    legacy_output = "".join(map(legacy_format_annotation_markdown, dicts))
+    identical = legacy_output == "".join(map(format_annotation_markdown, records))
+    print(f"format: dict {legacy_seconds * 1000:.1f} ms, record {record_seconds * 1000:.1f} ms "
+          f"({legacy_seconds / record_seconds:.2f}x, identical output: {identical})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench.pdf")
+        for fmt in EXPORT_WRITERS:
+            def export():
+                for writer in open_export_writers(pdf_path, [fmt]):
+                    with writer:
+                        for annot in records:
+                            writer.write(annot, None)
+            seconds = best_time(export, args.repeat)
+            size = os.path.getsize(export_path(pdf_path, fmt))
+            print(f"export {fmt:<7} {len(records) / seconds:12,.0f} rows/s  {size / 1e6:7.1f} MB")
+    print(f"(median text length {statistics.median(len(f[4]) for f in fields):.0f} chars)")
+
+
+if __name__ == '__main__':
+    main()
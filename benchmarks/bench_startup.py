@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Cold-start cost of extract_annotations.py: import time and short CLI runs.
+
+Measures, each in a fresh interpreter:
+
+  import       `python -X importtime -c "import extract_annotations"`; the
+               cumulative import time of the script and of its largest
+               top-level imports
+  cli          wall time of a complete run on a small synthetic PDF without
+               highlights in summary_colors (no API call is needed), and
+               whether that run imported the OpenAI SDK or httpx
+
+Each measurement runs --repeat times and the median is reported. Point
+--script at the extract_annotations.py of another checkout (e.g. a git
+worktree of an older commit) to compare; --output and --compare work like
+in bench_pipeline.py.
+
+Usage: python benchmarks/bench_startup.py [--pages 10] [--repeat 5] [--script PATH]
+           [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_pdf import build_annotated_pdf
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+NETWORK_MODULES = ('openai', 'httpx')
+
+
+def parse_importtime(stderr, parent='extract_annotations'):
+    """({module: cumulative seconds} for parent's direct imports, set of all modules imported)"""
+    children, pending = {}, {}
+    modules = set()
+    for line in stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        modules.add(name)
+        # A module's line follows the lines of the modules it imported, which
+        # are indented one level (two spaces) deeper
+        if len(indent) == 3:
+            pending[name] = int(cumulative) / 1e6
+        elif len(indent) == 1:
+            if name == parent:
+                children.update(pending, **{name: int(cumulative) / 1e6})
+            pending = {}
+    return children, modules
+
+
+def run_python(args, cwd, env):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{completed.stderr[-2000:]}")
+    return elapsed, completed.stderr
+
+
+def measure_imports(script_dir, env, repeat):
+    runs = [parse_importtime(run_python(['-c', 'import extract_annotations'], script_dir, env)[1])[0]
+            for _ in range(repeat)]
+    names = set().union(*runs)
+    return {name: statistics.median(run.get(name, 0.0) for run in runs) for name in names}
+
+
+def measure_cli(script, pdf_path, env, repeat):
+    times = []
+    imported = set()
+    for _ in range(repeat):
+        elapsed, stderr = run_python([script, pdf_path, '--full'], os.path.dirname(pdf_path), env)
+        times.append(elapsed)
+        imported.update(parse_importtime(stderr)[1])
+    return {'median': statistics.median(times), 'min': min(times), 'max': max(times),
+            'network_modules_imported': sorted(name for name in NETWORK_MODULES if name in imported)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--script', default=os.path.join(os.path.dirname(BENCH_DIR), 'extract_annotations.py'))
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='Top-level imports to list')
+    parser.add_argument('--output', help='Write the JSON result to this file')
+    parser.add_argument('--compare', help='Previous JSON result to compare against')
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    # Older versions of the script insist on a key; this one is never used
+    env.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    env['OPENAI_BASE_URL'] = 'http://127.0.0.1:9/v1'  # fail fast should anything try to connect
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'startup.pdf')
+        build_annotated_pdf(pdf_path, pages=args.pages, highlights_per_page=2, summary_ratio=0.0,
+                            notes_per_page=1)
+        imports = measure_imports(os.path.dirname(script), env, args.repeat)
+        cli = measure_cli(script, pdf_path, env, args.repeat)
+
+    top = sorted(((name, seconds) for name, seconds in imports.items() if name != 'extract_annotations'),
+                 key=lambda item: item[1], reverse=True)[:args.top]
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'script': script,
+        'parameters': {'pages': args.pages, 'repeat': args.repeat},
+        'import_seconds': imports.get('extract_annotations', 0.0),
+        'top_level_imports': dict(top),
+        'cli_seconds': cli,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    def line(label, value, old):
+        text = f"{label:<32} {value * 1000:9.1f} ms"
+        if old:
+            text += f"  (was {old * 1000:.1f} ms, {(value - old) / old * 100:+.1f}%)"
+        print(text)
+
+    line('import extract_annotations', result['import_seconds'], previous and previous['import_seconds'])
+    for name, seconds in top:
+        line(f"  {name}", seconds, previous and previous['top_level_imports'].get(name))
+    line(f"cli run ({args.pages} pages, no summaries)", cli['median'],
+         previous and previous['cli_seconds']['median'])
+    print(f"Network modules imported by the cli run: {', '.join(cli['network_modules_imported']) or 'none'}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
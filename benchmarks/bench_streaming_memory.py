@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Benchmark peak memory of in-memory vs. streaming markdown export.
+
+For each document size a synthetic annotated PDF is generated, then each mode
+runs in a fresh subprocess so its peak RSS is measured in isolation.
+Summaries are disabled so no API access is needed.
+
+Usage: python benchmarks/bench_streaming_memory.py [--sizes 1000,2500,5000]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(mode, pdf_path):
+    import extract_annotations as ea
+    ea.config = {
+        'processing': {'streaming': mode == 'stream', 'incremental': False},
+        'colors': {'summary_colors': []},
+    }
+    ea.colors_for_summaries = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = asyncio.run(ea.process_document(pdf_path, 1))
+        elapsed = time.perf_counter() - started
+    print(json.dumps({'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'annotations': result['annotations']}))
+
+
+def measure(mode, pdf_path):
+    output = subprocess.run([sys.executable, __file__, '--child', mode, pdf_path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,2500,5000', help='Comma-separated page counts')
+    parser.add_argument('--highlights-per-page', type=int, default=5)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    from synthetic_pdf import build_annotated_pdf
+    print(f"{'pages':>6} {'annots':>7} {'mode':>7} {'seconds':>8} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in (int(size) for size in args.sizes.split(',')):
+            pdf_path = os.path.join(tmp, f'synthetic-{pages}.pdf')
+            build_annotated_pdf(pdf_path, pages=pages, highlights_per_page=args.highlights_per_page,
+                                summary_ratio=0)
+            for mode in ('memory', 'stream'):
+                result = measure(mode, pdf_path)
+                print(f"{pages:6d} {result['annotations']:7d} {mode:>7} "
+                      f"{result['seconds']:8.2f} {result['peak_rss_mb']:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
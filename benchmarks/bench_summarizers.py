@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Summarizer backends: the local extractive summarizer vs. the OpenAI backend.
+
+Builds highlight-like texts of one to eight sentences and reports:
+
+  extractive   seconds to summarize a document's highlights in one
+               vectorized batch vs. one call per highlight, for several
+               document sizes
+  end-to-end   summarize_annotations() with each backend, through the same
+               cache and session code, the OpenAI backend against the local
+               mock server (so its time is latency and rate limiting, not
+               network)
+
+Usage: python benchmarks/bench_summarizers.py [--sizes 20,200,2000] [--texts 40] [--latency 0.3]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+from extractive_summary import ExtractiveSummarizer
+from mock_openai_server import start_mock_server
+from synthetic_pdf import WORDS
+
+CITATIONS = ["(Smith et al., 2021)", "[12]", "(cf. Fig. 3)", "(p < 0.05)", ""]
+
+
+def make_texts(count, seed):
+    """Highlights of 1-8 sentences with occasional citations"""
+    rnd = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rnd.randint(1, 8)):
+            words = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 25)))
+            sentences.append(f"{words.capitalize()} {rnd.choice(CITATIONS)}".rstrip() + ".")
+        texts.append(" ".join(sentences))
+    return texts
+
+
+def best_time(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def run_backend(texts, backend):
+    ea.config['summarizer'] = {'backend': backend}
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        summaries = asyncio.run(ea.summarize_annotations(texts))
+        elapsed = time.perf_counter() - started
+        ea.close_summary_cache()  # in-memory cache: the next run starts cold
+    return elapsed, sum(1 for summary in summaries if ea.is_summary_failure(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='20,200,2000', help='Highlights per document (comma-separated)')
+    parser.add_argument('--texts', type=int, default=40, help='Highlights for the end-to-end comparison')
+    parser.add_argument('--latency', type=float, default=0.3, help='Mock API latency in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    summarizer = ExtractiveSummarizer()
+    print(f"{'highlights':>10} {'batched ms':>11} {'per-text ms':>12} {'speedup':>8}")
+    for size in map(int, args.sizes.split(',')):
+        texts = make_texts(size, args.seed)
+        batched = best_time(lambda: summarizer.summarize(texts))
+        single = best_time(lambda: [summarizer.summarize([text]) for text in texts])
+        print(f"{size:10d} {batched * 1000:11.2f} {single * 1000:12.2f} {single / batched:7.1f}x")
+
+    server = start_mock_server(latency=args.latency, seed=args.seed)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    with contextlib.redirect_stdout(io.StringIO()):
+        ea.load_config({'cache': {'enabled': False}, 'logging': {'level': 'WARNING'}})
+    texts = make_texts(args.texts, args.seed)
+    print(f"\nend-to-end, {len(texts)} highlights ({args.latency}s mock latency, "
+          f"{ea.config['api'].get('rate_limit_per_minute', 50)} requests/minute):")
+    for backend in ('extractive', 'openai'):
+        elapsed, failed = run_backend(texts, backend)
+        print(f"  {backend:<10} {elapsed:8.3f}s  ({failed} failed)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Check TextCleaner against the golden corpus and time it against the old clean_text.
+
+benchmarks/data/clean_text_golden.json holds inputs and the output the
+previous per-call clean_text produced for them. Cases with a "legacy" field
+are the exceptions: overlapping email/version/file matches, where the old
+implementation leaked placeholders such as __PRESERVE_VERSION_0__ into its
+output ("legacy") and TextCleaner restores the original text ("expected").
+The script first verifies that TextCleaner reproduces every expected output,
+then times:
+
+  legacy      the previous implementation (kept below as a reference copy)
+  cleaner     TextCleaner.clean without memo
+  clean_many  TextCleaner.clean_many over the whole corpus
+  memo        TextCleaner with a warm memo (repeated highlights)
+
+Usage: python benchmarks/bench_text_cleaner.py [--repeat 5]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import text_cleaner as tc
+from text_cleaner import TextCleaner
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "clean_text_golden.json")
+
+
+def legacy_clean_text(text):
+    """The previous clean_text, kept verbatim for timing (reference only)"""
+    if not text:
+        return ""
+    original_text = text
+    original_length = len(text)
+    try:
+        preservations = {}
+        counter = 0
+        for prefix, pattern in (("EMAIL", tc.EMAIL_PATTERN), ("VERSION", tc.VERSION_PATTERN),
+                                ("FILE", tc.FILE_EXTENSION_PATTERN)):
+            for match in pattern.finditer(text):
+                placeholder = f"__PRESERVE_{prefix}_{counter}__"
+                preservations[placeholder] = match.group()
+                text = text.replace(match.group(), placeholder)
+                counter += 1
+
+        text = tc.WHITESPACE_PATTERN.sub(' ', text)
+
+        def smart_line_break_hyphen_join(match):
+            word1, word2 = match.groups()
+            if len(word1) <= 2 or len(word2) <= 2:
+                return f"{word1}-{word2}"
+            if word2[0].islower():
+                return word1 + word2
+            obvious_prefixes = {'pre', 'anti', 'auto', 'semi', 'inter', 'intra', 'super', 'sub'}
+            if word1.lower() in obvious_prefixes:
+                return word1 + word2
+            clear_suffixes = {'ing', 'ed', 'tion', 'sion', 'ment', 'ness', 'able', 'ible'}
+            if any(word2.lower().startswith(suffix) for suffix in clear_suffixes):
+                return word1 + word2
+            if len(word1) + len(word2) > 15:
+                return word1 + word2
+            return f"{word1}-{word2}"
+
+        text = tc.LINE_BREAK_HYPHEN_PATTERN.sub(smart_line_break_hyphen_join, text)
+
+        spaced_abbrevs = {}
+        abbrev_counter = 0
+        spaced_pattern = re.compile(r'\b([A-Z])\s+([A-Z])\s+([A-Z])(?:\s+[A-Z])*\b')
+        for match in spaced_pattern.finditer(text):
+            candidate = match.group(0)
+            if candidate.replace(' ', '').lower() in tc.COMMON_ABBREVIATIONS:
+                placeholder = f"__ABBREV_{abbrev_counter}__"
+                spaced_abbrevs[placeholder] = candidate.replace(' ', '')
+                text = text.replace(candidate, placeholder)
+                abbrev_counter += 1
+        text = tc.OCR_NOISE_PATTERN.sub(' ', text)
+        for placeholder, abbrev in spaced_abbrevs.items():
+            text = text.replace(placeholder, abbrev)
+
+        text = tc.SINGLE_CHAR_NOISE_PATTERN.sub(' ', text)
+        text = tc.SMART_PUNCT_PATTERN.sub(r'\1 \2', text)
+        text = tc.ISOLATED_SPECIAL_PATTERN.sub(' ', text)
+        text = tc.EXTRA_SPACES_PATTERN.sub(' ', text).strip()
+        for placeholder, original in preservations.items():
+            text = text.replace(placeholder, original)
+
+        final_length = len(text)
+        reduction_ratio = final_length / original_length if original_length > 0 else 1
+        if reduction_ratio < 0.3 and original_length > 50:
+            print(f"[WARNING] Aggressive text reduction: {original_length} -> {final_length} chars (ratio: {reduction_ratio:.2f})")
+            print(f"[WARNING] Original excerpt: '{original_text[:100]}...'")
+            print(f"[WARNING] Cleaned excerpt: '{text[:100]}...'")
+        elif original_length > 20:
+            print(f"[DEBUG] Text cleaned: {original_length} -> {final_length} chars (ratio: {reduction_ratio:.2f})")
+        return text
+    except Exception:
+        return original_text
+
+
+def load_golden():
+    with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_golden(cases) -> int:
+    cleaner = TextCleaner()
+    failures = 0
+    for case in cases:
+        actual = cleaner.clean(case["input"])
+        if actual != case["expected"]:
+            failures += 1
+            if failures <= 5:
+                print(f"MISMATCH input:    {case['input'][:120]!r}")
+                print(f"         expected: {case['expected'][:120]!r}")
+                print(f"         actual:   {actual[:120]!r}")
+    return failures
+
+
+def time_per_text(label, run, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(texts)
+        best = min(best, time.perf_counter() - started)
+    per_text_us = best / len(texts) * 1e6
+    print(f"{label:<11} {best * 1000:8.2f} ms total  {per_text_us:7.1f} us/text")
+    return per_text_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = load_golden()
+    failures = check_golden(cases)
+    changed = [case for case in cases if "legacy" in case]
+    with contextlib.redirect_stdout(io.StringIO()):
+        stale = sum(legacy_clean_text(case["input"]) != case["legacy"] for case in changed)
+    print(f"Golden corpus: {len(cases) - failures}/{len(cases)} outputs identical "
+          f"({len(changed)} intentionally differ from the old clean_text"
+          f"{f', {stale} no longer reproduce it' if stale else ''})")
+    if failures:
+        sys.exit(1)
+
+    texts = [case["input"] for case in cases]
+    cleaner = TextCleaner()
+    memo_cleaner = TextCleaner(memo_size=len(texts))
+    memo_cleaner.clean_many(texts)
+
+    legacy = time_per_text("legacy", lambda batch: [legacy_clean_text(t) for t in batch], texts, args.repeat)
+    single = time_per_text("cleaner", lambda batch: [cleaner.clean(t) for t in batch], texts, args.repeat)
+    time_per_text("clean_many", cleaner.clean_many, texts, args.repeat)
+    memo = time_per_text("memo", memo_cleaner.clean_many, texts, args.repeat)
+    print(f"Speedup per text: {legacy / single:.2f}x compiled, {legacy / memo:.1f}x with a warm memo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Check that settings which change the extracted text invalidate the incremental state.
+
+Processes a synthetic PDF with incremental mode on and no summaries, then
+again after each change below, and checks whether the run was skipped:
+
+  unchanged                 same settings again: skipped
+  text_extraction words     re-extracted
+  word_overlap_threshold    re-extracted (words mode only)
+  cleaner version           re-extracted (text_cleaner.CLEANER_VERSION bumped)
+
+Every re-extracted markdown must equal a --full run with the same settings.
+Exits with status 1 if any check fails.
+
+Usage: python benchmarks/check_incremental_options.py [--pages 20]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import extract_annotations as ea
+import metrics
+from synthetic_pdf import build_annotated_pdf
+
+
+def run(pdf_path, processing, incremental=True):
+    """(skipped, pages extracted, markdown) of one run"""
+    ea.load_config({'processing': dict(processing, summaries=False), 'logging': {'level': 'ERROR'}})
+    metrics.registry.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(ea.process_document(pdf_path, 1, incremental))
+    with open(result['output_file'], 'r', encoding='utf-8') as f:
+        markdown = f.read()
+    return result['skipped'], int(metrics.registry.counter_value('pages_processed_total')), markdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    args = parser.parse_args()
+
+    failures = 0
+
+    def check(label, processing, expect_skipped):
+        nonlocal failures
+        skipped, pages, markdown = run(pdf_path, processing)
+        ok = skipped == expect_skipped
+        if not skipped:
+            ok = ok and markdown == run(pdf_path, processing, incremental=False)[2]
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {label:<28} {'skipped' if skipped else f'{pages} pages re-extracted'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'synthetic.pdf')
+        build_annotated_pdf(pdf_path, pages=args.pages)
+        clip = {'text_extraction': 'clip'}
+        words = {'text_extraction': 'words', 'word_overlap_threshold': 0.5}
+
+        check('first run', clip, False)
+        check('unchanged', clip, True)
+        check('text_extraction words', words, False)
+        check('unchanged', words, True)
+        check('word_overlap_threshold 0.7', dict(words, word_overlap_threshold=0.7), False)
+        ea.CLEANER_VERSION += 1
+        check('cleaner version', dict(words, word_overlap_threshold=0.7), False)
+
+    if failures:
+        print(f"\n{failures} checks failed")
+        sys.exit(1)
+    print("\nall checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI chat-completions endpoint.
+
+Answers POST /v1/chat/completions after a configurable latency. A
+configurable share of requests gets 429 (with Retry-After) or 500
+instead, so summarization can be benchmarked, including its retry paths,
+without network access or API cost. Point the script at it with
+OPENAI_BASE_URL=http://127.0.0.1:PORT/v1 and any OPENAI_API_KEY.
+
+Batched prompts ("### TEXT <n>" sections) are answered with one
+"### SUMMARY <n>" section per text; --drop-batch-item-rate leaves some
+out to exercise the single-request fallback. --latency-per-summary adds
+generation time for every summary in an answer. Requests with
+"stream": true are answered as server-sent events, one chunk per word
+with the generation time spread across them, ending with a usage chunk
+(when stream_options.include_usage is set) and "data: [DONE]".
+
+--quota-rpm and --quota-tpm enforce a request and a token quota per
+--quota-window seconds, like the real API: every answer carries the
+x-ratelimit-{limit,remaining,reset}-{requests,tokens} headers, and a
+request over quota gets 429 with Retry-After (and retry-after-ms) set to
+when the window refills. --no-quota-headers leaves the x-ratelimit-*
+headers out, so only the 429s tell clients about the quota.
+
+It also stands in for the Files and Batch APIs used by bulk jobs: POST
+/v1/files, GET /v1/files/<id>/content, POST /v1/batches and GET
+/v1/batches/<id>. A batch is answered as soon as it is created but reports
+"in_progress" for --batch-delay seconds; --batch-error-rate of its
+requests end up in the error file. --answer-batch REQUESTS RESULTS does
+the same offline, from one JSONL file to another (failed requests and
+answers in one file).
+
+Usage: python benchmarks/mock_openai_server.py [--port 8765] [--latency 0.3] [--jitter 0.1]
+           [--rate-429 0.05] [--error-rate 0.01] [--latency-per-summary 0.1] [--seed 0]
+           [--quota-rpm 60] [--quota-tpm 40000] [--quota-window 60] [--no-quota-headers]
+           [--batch-delay 2] [--batch-error-rate 0.05]
+       python benchmarks/mock_openai_server.py --answer-batch requests.jsonl results.jsonl
+"""
+
+import argparse
+import email.parser
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_TEXT_PATTERN = re.compile(r'^### TEXT (\d+)$', re.MULTILINE)
+
+
+def mock_summary(text):
+    """A few bullet points made of the text's last words"""
+    words = text.split()
+    summary = "\n".join(f"- {' '.join(words[i:i + 8])}" for i in range(max(len(words) - 24, 0), len(words), 8))
+    return summary or "- (empty)"
+
+
+def mock_token_count(prompt):
+    """(prompt tokens, completion tokens) the mock charges for a prompt"""
+    words = len(prompt.split())
+    return words, min(words, 24)
+
+
+def chat_completion(completion_id, model, prompt, content):
+    prompt_tokens, completion_tokens = mock_token_count(prompt)
+    return {
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens},
+    }
+
+
+def chat_completion_chunks(completion_id, model, prompt, content, include_usage=False):
+    """The chat.completion.chunk events of a streamed answer: role, one per word, finish, usage"""
+    base = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model}
+    chunk = lambda delta, finish_reason=None: dict(base, choices=[{'index': 0, 'delta': delta,
+                                                                    'finish_reason': finish_reason}])
+    yield chunk({'role': 'assistant', 'content': ''})
+    for piece in re.findall(r'\s*\S+', content) or [content]:
+        yield chunk({'content': piece})
+    yield chunk({}, 'stop')
+    if include_usage:
+        usage = chat_completion(completion_id, model, prompt, content)['usage']
+        yield dict(base, choices=[], usage=usage)
+
+
+def answer_batch(requests_data, rnd, error_rate=0.0, answer=None):
+    """(output JSONL, error JSONL) bytes for a Batch API input file"""
+    answer = answer or mock_summary
+    output, errors = [], []
+    for number, line in enumerate(requests_data.decode('utf-8').splitlines(), 1):
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        body = request.get('body', {})
+        prompt = body.get('messages', [{}])[-1].get('content', '')
+        entry = {'id': f"batch_req_mock_{number}", 'custom_id': request.get('custom_id')}
+        if rnd.random() < error_rate:
+            entry.update(response={'status_code': 500, 'request_id': f"req_mock_{number}",
+                                   'body': {'error': {'message': 'Internal server error (mock)',
+                                                      'type': 'server_error'}}},
+                         error=None)
+            errors.append(entry)
+            continue
+        completion = chat_completion(f"chatcmpl-mock-batch-{number}", body.get('model', 'mock'), prompt,
+                                     answer(prompt))
+        entry.update(response={'status_code': 200, 'request_id': f"req_mock_{number}", 'body': completion},
+                     error=None)
+        output.append(entry)
+    encode = lambda entries: "".join(json.dumps(entry) + "\n" for entry in entries).encode('utf-8')
+    return encode(output), encode(errors)
+
+
+class Quota:
+    """A fixed-window quota (requests or tokens) that refills every window seconds"""
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.window_start = time.monotonic()
+        self.used = 0
+
+    def _roll(self, now):
+        if now - self.window_start >= self.window:
+            self.window_start += (now - self.window_start) // self.window * self.window
+            self.used = 0
+
+    def reset_in(self, now):
+        return self.window_start + self.window - now
+
+    def fits(self, amount, now):
+        self._roll(now)
+        return self.used + amount <= self.limit
+
+    def take(self, amount, now):
+        self._roll(now)
+        self.used += amount
+
+    def headers(self, now):
+        self._roll(now)
+        return {f'x-ratelimit-limit-{self.name}': str(self.limit),
+                f'x-ratelimit-remaining-{self.name}': str(max(0, self.limit - self.used)),
+                f'x-ratelimit-reset-{self.name}': f"{self.reset_in(now):.3f}s"}
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """HTTP server holding the simulated endpoint's behavior and request counters"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.3, jitter=0.0, rate_429=0.0, error_rate=0.0,
+                 retry_after=1.0, latency_per_summary=0.0, drop_batch_item_rate=0.0, seed=0,
+                 quota_rpm=None, quota_tpm=None, quota_window=60.0, quota_headers=True,
+                 batch_delay=0.0, batch_error_rate=0.0):
+        super().__init__(address, ChatCompletionsHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.latency_per_summary = latency_per_summary
+        self.drop_batch_item_rate = drop_batch_item_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.quotas = [Quota(name, limit, quota_window)
+                       for name, limit in (('requests', quota_rpm), ('tokens', quota_tpm)) if limit]
+        self.quota_headers = quota_headers
+        self.counts = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'errors': 0, 'quota_rejected': 0,
+                       'batched_requests': 0, 'summaries': 0, 'dropped_batch_items': 0,
+                       'streamed': 0}
+        self.max_in_flight = 0
+        self.in_flight = 0
+        self.batch_delay = batch_delay
+        self.batch_error_rate = batch_error_rate
+        self.files = {}  # id -> (metadata, bytes)
+        self.batches = {}  # id -> batch object, answered when created
+        self.ids = itertools.count(1)
+
+    def answer(self, prompt):
+        """Return (answer text, number of summaries written)"""
+        markers = list(BATCH_TEXT_PATTERN.finditer(prompt))
+        if not markers:
+            return mock_summary(prompt), 1
+        sections = []
+        with self.lock:
+            self.counts['batched_requests'] += 1
+            for position, marker in enumerate(markers):
+                end = markers[position + 1].start() if position + 1 < len(markers) else len(prompt)
+                if self.random.random() < self.drop_batch_item_rate:
+                    self.counts['dropped_batch_items'] += 1
+                    continue
+                sections.append(f"### SUMMARY {marker.group(1)}\n{mock_summary(prompt[marker.end():end])}")
+        return "\n\n".join(sections), len(sections)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def admit(self, prompt):
+        """Charge a request to the quotas; returns (headers, Retry-After seconds or None if admitted)"""
+        if not self.quotas:
+            return {}, None
+        prompt_tokens, completion_tokens = mock_token_count(prompt)
+        amounts = {'requests': 1, 'tokens': prompt_tokens + completion_tokens}
+        with self.lock:
+            now = time.monotonic()
+            full = [quota for quota in self.quotas if not quota.fits(amounts[quota.name], now)]
+            if full:
+                self.counts['requests'] += 1
+                self.counts['quota_rejected'] += 1
+                retry_after = max(quota.reset_in(now) for quota in full)
+            else:
+                retry_after = None
+                for quota in self.quotas:
+                    quota.take(amounts[quota.name], now)
+            headers = {}
+            for quota in self.quotas if self.quota_headers else ():
+                headers.update(quota.headers(now))
+        return headers, retry_after
+
+    def add_file(self, filename, data, purpose):
+        with self.lock:
+            file_id = f"file-mock-{next(self.ids)}"
+            metadata = {'id': file_id, 'object': 'file', 'bytes': len(data), 'created_at': int(time.time()),
+                        'filename': filename, 'purpose': purpose}
+            self.files[file_id] = (metadata, data)
+        return metadata
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        with self.lock:
+            data = self.files[input_file_id][1]
+            output, errors = answer_batch(data, self.random, self.batch_error_rate)
+        completed = output.count(b"\n")
+        failed = errors.count(b"\n")
+        batch = {'id': f"batch_mock_{next(self.ids)}", 'object': 'batch', 'endpoint': endpoint, 'errors': None,
+                 'input_file_id': input_file_id, 'completion_window': completion_window,
+                 'created_at': int(time.time()), 'ready_at': time.monotonic() + self.batch_delay,
+                 'output_file_id': self.add_file('output.jsonl', output, 'batch_output')['id'] if completed else None,
+                 'error_file_id': self.add_file('errors.jsonl', errors, 'batch_output')['id'] if failed else None,
+                 'request_counts': {'total': completed + failed, 'completed': completed, 'failed': failed}}
+        with self.lock:
+            self.batches[batch['id']] = batch
+            self.counts['batches'] = self.counts.get('batches', 0) + 1
+            self.counts['batch_requests'] = self.counts.get('batch_requests', 0) + completed + failed
+        return self.batch_view(batch)
+
+    def batch_view(self, batch):
+        """The batch as the API reports it now: in progress until its delay has passed"""
+        view = {key: value for key, value in batch.items() if key != 'ready_at'}
+        if time.monotonic() < batch['ready_at']:
+            view.update(status='in_progress', output_file_id=None, error_file_id=None,
+                        request_counts={'total': batch['request_counts']['total'], 'completed': 0, 'failed': 0})
+        else:
+            view.update(status='completed', completed_at=int(time.time()))
+        return view
+
+    def draw_outcome(self):
+        """Pick (outcome, delay) for one request; 'ok', 'rate_limited' or 'errors'"""
+        with self.lock:
+            roll = self.random.random()
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            if roll < self.rate_429:
+                outcome = 'rate_limited'
+            elif roll < self.rate_429 + self.error_rate:
+                outcome = 'errors'
+            else:
+                outcome = 'ok'
+            self.counts['requests'] += 1
+            self.counts[outcome] += 1
+        return outcome, delay
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self, events, delay, headers=None):
+        """Stream events as server-sent events (chunked), sleeping delay seconds before each"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for event in itertools.chain((json.dumps(event) for event in events), ['[DONE]']):
+            time.sleep(delay)
+            data = f"data: {event}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        match = re.search(r'/(files|batches)/([\w-]+)(/content)?$', self.path.rstrip('/'))
+        if match and match.group(1) == 'files' and match.group(3) and match.group(2) in self.server.files:
+            data = self.server.files[match.group(2)][1]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif match and match.group(1) == 'batches' and match.group(2) in self.server.batches:
+            self.send_json(200, self.server.batch_view(self.server.batches[match.group(2)]))
+        else:
+            self.send_json(404, {'error': {'message': f'unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+    def upload_file(self, data):
+        """POST /v1/files: a multipart form with 'file' and 'purpose'"""
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode('utf-8') + data)
+        fields = {part.get_param('name', header='content-disposition'): part for part in message.get_payload()}
+        if 'file' not in fields:
+            self.send_json(400, {'error': {'message': 'missing file', 'type': 'invalid_request_error'}})
+            return
+        self.send_json(200, self.server.add_file(fields['file'].get_filename() or 'upload.jsonl',
+                                                 fields['file'].get_payload(decode=True),
+                                                 fields['purpose'].get_payload() if 'purpose' in fields else 'batch'))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+        if self.path.rstrip('/').endswith('/files'):
+            self.upload_file(data)
+            return
+        try:
+            request = json.loads(data or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': {'message': 'invalid JSON', 'type': 'invalid_request_error'}})
+            return
+        if self.path.rstrip('/').endswith('/batches'):
+            if request.get('input_file_id') not in self.server.files:
+                self.send_json(404, {'error': {'message': 'unknown input file', 'type': 'invalid_request_error'}})
+                return
+            self.send_json(200, self.server.create_batch(request['input_file_id'], request.get('endpoint'),
+                                                         request.get('completion_window', '24h')))
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f'unknown path {self.path}', 'type': 'invalid_request_error'}})
+            return
+
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        quota_headers, quota_retry_after = self.server.admit(prompt)
+        if quota_retry_after is not None:
+            self.send_json(429, {'error': {'message': 'Rate limit reached for requests or tokens (mock quota)',
+                                           'type': 'rate_limit_error'}},
+                           headers=dict(quota_headers, **{'Retry-After': str(math.ceil(quota_retry_after)),
+                                                          'retry-after-ms': str(int(quota_retry_after * 1000))}))
+            return
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        try:
+            self.respond(request, prompt, quota_headers)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def respond(self, request, prompt, quota_headers):
+        outcome, delay = self.server.draw_outcome()
+        time.sleep(delay)
+        if outcome == 'rate_limited':
+            self.send_json(429, {'error': {'message': 'Rate limit reached (mock)', 'type': 'rate_limit_error'}},
+                           headers=dict(quota_headers, **{'Retry-After': f"{self.server.retry_after:g}"}))
+            return
+        if outcome == 'errors':
+            self.send_json(500, {'error': {'message': 'Internal server error (mock)', 'type': 'server_error'}})
+            return
+
+        summary, summary_count = self.server.answer(prompt)
+        with self.server.lock:
+            self.server.counts['summaries'] += summary_count
+        completion_id = f"chatcmpl-mock-{self.server.counts['requests']}"
+        generation_time = self.server.latency_per_summary * summary_count
+        if request.get('stream'):
+            events = list(chat_completion_chunks(completion_id, request.get('model', 'mock'), prompt, summary,
+                                                 (request.get('stream_options') or {}).get('include_usage', False)))
+            with self.server.lock:
+                self.server.counts['streamed'] += 1
+            self.send_events(events, generation_time / len(events), headers=quota_headers)
+            return
+        time.sleep(generation_time)
+        self.send_json(200, chat_completion(completion_id, request.get('model', 'mock'), prompt, summary),
+                       headers=quota_headers)
+
+
+def start_mock_server(port=0, **behavior) -> MockOpenAIServer:
+    """Start a server on a background thread (port 0 picks a free port)"""
+    server = MockOpenAIServer(('127.0.0.1', port), **behavior)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds per response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- seconds added to the latency')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429')
+    parser.add_argument('--latency-per-summary', type=float, default=0.0,
+                        help='Extra seconds per summary in an answer (generation time)')
+    parser.add_argument('--drop-batch-item-rate', type=float, default=0.0,
+                        help='Fraction of texts in batched prompts left without a summary')
+    parser.add_argument('--quota-rpm', type=int, default=None, help='Requests allowed per quota window')
+    parser.add_argument('--quota-tpm', type=int, default=None, help='Tokens allowed per quota window')
+    parser.add_argument('--quota-window', type=float, default=60.0, help='Quota window in seconds')
+    parser.add_argument('--no-quota-headers', dest='quota_headers', action='store_false',
+                        help='Do not send x-ratelimit-* headers')
+    parser.add_argument('--batch-delay', type=float, default=0.0,
+                        help='Seconds a batch reports "in_progress" before its results are available')
+    parser.add_argument('--batch-error-rate', type=float, default=0.0,
+                        help='Fraction of batch requests put into the error file')
+    parser.add_argument('--answer-batch', nargs=2, metavar=('REQUESTS', 'RESULTS'),
+                        help='Answer a Batch API input file offline into one results file '
+                             '(failed requests included) and exit')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.answer_batch:
+        requests_path, results_path = args.answer_batch
+        with open(requests_path, 'rb') as f:
+            output, errors = answer_batch(f.read(), random.Random(args.seed), args.batch_error_rate)
+        with open(results_path, 'wb') as f:
+            f.write(output + errors)
+        print(f"{len(output.splitlines())} answers and {len(errors.splitlines())} failed requests "
+              f"written to {results_path}")
+        return
+
+    server = MockOpenAIServer(('127.0.0.1', args.port), latency=args.latency, jitter=args.jitter,
+                              rate_429=args.rate_429, error_rate=args.error_rate,
+                              retry_after=args.retry_after, latency_per_summary=args.latency_per_summary,
+                              drop_batch_item_rate=args.drop_batch_item_rate, seed=args.seed,
+                              quota_rpm=args.quota_rpm, quota_tpm=args.quota_tpm, quota_window=args.quota_window,
+                              quota_headers=args.quota_headers, batch_delay=args.batch_delay,
+                              batch_error_rate=args.batch_error_rate)
+    print(f"Mock OpenAI endpoint at {server.base_url} "
+          f"(latency {args.latency}s, 429 rate {args.rate_429}, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Requests served: {server.counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Generate synthetic annotated PDFs for the benchmarks.
+
+Pages hold one or more text columns with highlights (a share of them in
+one of colors.summary_colors from config.yaml), sticky notes and FreeText
+comments. The same arguments and seed always produce the same document.
+
+Usage: python benchmarks/synthetic_pdf.py OUTPUT.pdf [--pages 1000] [--highlights-per-page 3]
+           [--columns 2] [--notes-per-page 1] [--freetext-per-page 1]
+"""
+
+import argparse
+import os
+import random
+
+import fitz  # PyMuPDF
+import yaml
+
+WORDS = ("annotation extraction performance vectorized highlight reading order multi-column "
+         "layout citation reference Smith et al. 2021 version 1.2.3 inter- national analysis "
+         "method results discussion evidence hypothesis").split()
+
+SUMMARY_COLORS = ["#92e1fb", "#69aff0", "#2ea8e5"]
+OTHER_COLORS = ["#ffd400", "#ff6666", "#5fb236"]
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yaml')
+MARGIN = 54
+COLUMN_GAP = 24
+
+
+def hex_to_rgb(color_hex):
+    return tuple(int(color_hex[i:i + 2], 16) / 255 for i in (1, 3, 5))
+
+
+def load_summary_colors(config_path=CONFIG_PATH):
+    """colors.summary_colors from config.yaml, or the defaults if it can't be read"""
+    try:
+        with open(config_path, 'r') as f:
+            return yaml.safe_load(f)['colors']['summary_colors']
+    except (OSError, KeyError, TypeError, yaml.YAMLError):
+        return SUMMARY_COLORS
+
+
+def column_rects(page, columns):
+    """Text boxes for a page split into equally wide columns"""
+    width = (page.rect.width - 2 * MARGIN - (columns - 1) * COLUMN_GAP) / columns
+    return [fitz.Rect(MARGIN + i * (width + COLUMN_GAP), MARGIN,
+                      MARGIN + i * (width + COLUMN_GAP) + width, page.rect.height - MARGIN)
+            for i in range(columns)]
+
+
+def build_annotated_pdf(path, pages=100, highlights_per_page=3, annotated_page_ratio=1.0,
+                        lines_per_highlight=2, summary_ratio=0.3, seed=0, columns=1,
+                        notes_per_page=0, freetext_per_page=0, summary_colors=None):
+    """Write a PDF of text pages carrying highlights, notes and FreeText comments.
+
+    annotated_page_ratio is the fraction of pages that carry annotations;
+    summary_ratio is the fraction of highlights drawn in a summary color
+    (summary_colors, by default those in config.yaml).
+    Returns the number of annotations written.
+    """
+    rnd = random.Random(seed)
+    summary_colors = summary_colors or load_summary_colors()
+    doc = fitz.open()
+    annotation_count = 0
+    for page_num in range(pages):
+        page = doc.new_page()
+        boxes = column_rects(page, columns)
+        words_per_column = 350 // columns
+        for box in boxes:
+            text = " ".join(rnd.choice(WORDS) for _ in range(words_per_column))
+            page.insert_textbox(box, text, fontsize=10)
+        if rnd.random() >= annotated_page_ratio:
+            continue
+
+        line_rects = [fitz.Rect(line["bbox"])
+                      for block in page.get_text("dict")["blocks"]
+                      for line in block.get("lines", [])]
+        step = max(lines_per_highlight + 1, len(line_rects) // max(highlights_per_page, 1))
+        for first_line in range(0, step * highlights_per_page, step):
+            quads = line_rects[first_line:first_line + lines_per_highlight]
+            if not quads:
+                break
+            annot = page.add_highlight_annot(quads)
+            palette = summary_colors if rnd.random() < summary_ratio else OTHER_COLORS
+            annot.set_colors(stroke=hex_to_rgb(rnd.choice(palette)))
+            annot.update()
+            annotation_count += 1
+
+        for _ in range(notes_per_page):
+            box = rnd.choice(boxes)
+            point = fitz.Point(box.x1 + 2, rnd.uniform(box.y0, box.y1 - 20))
+            page.add_text_annot(point, " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 25))))
+            annotation_count += 1
+
+        for _ in range(freetext_per_page):
+            box = rnd.choice(boxes)
+            y0 = rnd.uniform(box.y0, box.y1 - 40)
+            page.add_freetext_annot(fitz.Rect(box.x0, y0, box.x1, y0 + 36),
+                                    " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 15))),
+                                    fontsize=8)
+            annotation_count += 1
+    doc.set_metadata({"title": f"Synthetic benchmark document ({pages} pages)"})
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return annotation_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--highlights-per-page', type=int, default=3)
+    parser.add_argument('--annotated-page-ratio', type=float, default=1.0)
+    parser.add_argument('--lines-per-highlight', type=int, default=2)
+    parser.add_argument('--summary-ratio', type=float, default=0.3)
+    parser.add_argument('--columns', type=int, default=1)
+    parser.add_argument('--notes-per-page', type=int, default=0)
+    parser.add_argument('--freetext-per-page', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    count = build_annotated_pdf(args.output, args.pages, args.highlights_per_page,
+                                args.annotated_page_ratio, args.lines_per_highlight,
+                                args.summary_ratio, seed=args.seed, columns=args.columns,
+                                notes_per_page=args.notes_per_page,
+                                freetext_per_page=args.freetext_per_page)
+    print(f"Wrote {args.output}: {args.pages} pages, {count} annotations")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""Job directories for offline bulk summarization.
+
+A bulk job is a directory holding:
+
+  job.json         settings (model, prompt), the documents with their
+                   progress, and the submitted batch, if any
+  requests.jsonl   one chat completion request per pending summary, in the
+                   OpenAI Batch API input format
+  results.jsonl    the answers, in the Batch API output format, however
+                   they were produced
+  errors.jsonl     requests the batch endpoint rejected
+
+Every request's custom_id is the summary cache key of its text, so the
+same highlight always gets the same ID, a job never asks for a summary
+twice, and results go straight into the summary cache. job.json is
+replaced atomically after every document, so an interrupted job picks up
+where it stopped.
+
+The phases run as bulk_prepare(), bulk_submit(), bulk_poll() and
+bulk_ingest() (--bulk prepare|submit|poll|ingest).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, Optional, Set, Tuple
+
+import extract_annotations as ea
+import metrics
+from batch_mode import collect_batch_inputs, load_manifest
+from summary_cache import make_cache_key
+
+logger = logging.getLogger("pdfextractor.bulk")
+
+JOB_VERSION = 1
+JOB_FILE = "job.json"
+REQUESTS_FILE = "requests.jsonl"
+RESULTS_FILE = "results.jsonl"
+ERRORS_FILE = "errors.jsonl"
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Batch states after which nothing more will come back
+BATCH_FINAL_STATES = frozenset({'completed', 'failed', 'expired', 'cancelled'})
+
+
+class BulkJobError(Exception):
+    """The job directory cannot be used as asked (missing, or made with other settings)"""
+
+
+def request_line(custom_id: str, model: str, content: str) -> Dict:
+    return {'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT,
+            'body': {'model': model, 'messages': [{'role': 'user', 'content': content}]}}
+
+
+def parse_result_line(entry: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """(summary, None) for a successful answer, (None, error message) otherwise"""
+    response = entry.get('response') or {}
+    body = response.get('body') or {}
+    if entry.get('error') or response.get('status_code', 200) != 200:
+        error = entry.get('error') or body.get('error') or {}
+        return None, error.get('message') or f"status {response.get('status_code')}"
+    try:
+        return body['choices'][0]['message']['content'], None
+    except (KeyError, IndexError, TypeError):
+        return None, "no message in the response"
+
+
+def read_jsonl(path: str):
+    """Yield the entries of a JSONL file, skipping lines cut short by an interrupted write"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class BulkJob:
+    """A bulk job directory; state is job.json's content"""
+
+    def __init__(self, directory: str, state: Dict):
+        self.directory = directory
+        self.state = state
+
+    @classmethod
+    def open(cls, directory: str, model: str, prompt: str, create: bool = False) -> "BulkJob":
+        """Load the job in directory (or start one there); its settings must match model and prompt"""
+        directory = os.path.abspath(os.path.expanduser(directory))
+        path = os.path.join(directory, JOB_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') != JOB_VERSION:
+                raise BulkJobError(f"{path} was written by an incompatible version")
+            if (state['model'], state['prompt']) != (model, prompt):
+                raise BulkJobError(f"The job in {directory} was prepared with another model or prompt; "
+                                   f"its results would not match the current configuration")
+            return cls(directory, state)
+        if not create:
+            raise BulkJobError(f"No bulk job in {directory}; prepare one first")
+        os.makedirs(directory, exist_ok=True)
+        return cls(directory, {'version': JOB_VERSION, 'model': model, 'prompt': prompt,
+                               'created': time.time(), 'documents': {}, 'batch': None})
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def save(self):
+        path = self.path(JOB_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    @property
+    def documents(self) -> Dict[str, Dict]:
+        """PDF path -> {'start_page', 'prepared', 'requests', 'rendered', ...}"""
+        return self.state['documents']
+
+    def add_document(self, pdf_path: str, start_page: int):
+        entry = self.documents.setdefault(pdf_path, {'prepared': False, 'rendered': False})
+        if entry.get('start_page') != start_page:
+            entry.update(start_page=start_page, prepared=False, rendered=False)
+
+    def request_ids(self) -> Set[str]:
+        """custom_ids already in requests.jsonl; a torn last line is cut off so appends stay valid"""
+        path = self.path(REQUESTS_FILE)
+        ids = set()
+        if not os.path.exists(path):
+            return ids
+        valid_size = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    ids.add(json.loads(line)['custom_id'])
+                except (ValueError, KeyError):
+                    break
+                valid_size += len(line)
+        if valid_size != os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(valid_size)
+        return ids
+
+    def request_writer(self):
+        """Append handle for requests.jsonl"""
+        return open(self.path(REQUESTS_FILE), 'a', encoding='utf-8')
+
+    def read_results(self, results_path: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """({custom_id: summary}, {custom_id: error}) from a results file and errors.jsonl.
+
+        A later successful answer for an ID wins over an earlier error.
+        """
+        summaries, errors = {}, {}
+        paths = [results_path or self.path(RESULTS_FILE), self.path(ERRORS_FILE)]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            for entry in read_jsonl(path):
+                custom_id = entry.get('custom_id')
+                if not custom_id:
+                    continue
+                summary, error = parse_result_line(entry)
+                if summary is not None:
+                    summaries[custom_id] = summary
+                    errors.pop(custom_id, None)
+                elif custom_id not in summaries:
+                    errors[custom_id] = error
+        return summaries, errors
+
+    def write_output(self, name: str, content: bytes):
+        """Store a downloaded results or errors file, replacing any earlier one only when complete"""
+        path = self.path(name)
+        with open(path + ".tmp", 'wb') as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+
+# ---------------------------------------------------------------------------
+# Bulk mode: summaries through batch-job files instead of interactive requests
+# ---------------------------------------------------------------------------
+
+def open_bulk_job(job_dir, create=False) -> BulkJob:
+    """The bulk job in job_dir for the configured model and prompt; exits if it cannot be used"""
+    if ea.summarizer_backend() != 'openai' or not ea.config.get('processing', {}).get('summaries', True):
+        logger.error("Bulk jobs summarize through the OpenAI backend; "
+                     "do not combine --bulk with --summarizer extractive or --no-summaries")
+        sys.exit(1)
+    model, prompt = ea.summary_settings()
+    try:
+        return BulkJob.open(job_dir, model, prompt, create=create)
+    except BulkJobError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+def bulk_prepare(job_dir, paths, file_list=None, manifest=None, start_page=1, overrides=None) -> BulkJob:
+    """Phase one: write a request for every highlight without a cached summary to requests.jsonl.
+
+    A request's custom_id is its text's cache key, so a text that is already
+    cached, already requested by this job, or repeated across documents is
+    requested at most once. Documents are marked prepared one by one; a rerun
+    after an interruption continues with the first unprepared document.
+    """
+    ea.load_config(overrides)
+    job = open_bulk_job(job_dir, create=True)
+    if job.state['batch']:
+        logger.error(f"The job in {job.directory} was already submitted; prepare new PDFs in another directory")
+        sys.exit(1)
+    start_pages = load_manifest(manifest) if manifest else {}
+    # The manifest's PDFs are part of the job even when not listed otherwise
+    for pdf_path in collect_batch_inputs(list(paths) + list(start_pages), file_list):
+        job.add_document(pdf_path, start_pages.get(pdf_path, start_page))
+    job.save()
+
+    model, prompt = ea.summary_settings()
+    cache = ea.get_summary_cache()
+    requested = job.request_ids()
+    pending = [path for path, entry in job.documents.items() if not entry['prepared']]
+    logger.info(f"Bulk job {job.directory}: {len(job.documents)} PDFs, {len(pending)} to prepare, "
+                f"{len(requested)} requests written so far")
+    try:
+        with job.request_writer() as requests_file:
+            for pdf_path in pending:
+                entry = job.documents[pdf_path]
+                try:
+                    annotations, _ = ea.extract_annotations(pdf_path, entry['start_page'])
+                except Exception as e:
+                    logger.error(f"Could not extract {pdf_path}: {e}")
+                    continue
+                texts = [annot.text for annot in annotations if ea.needs_summary(annot)]
+                new_requests = 0
+                for text in texts:
+                    cache_key = make_cache_key(model, prompt, text)
+                    if cache_key in requested or cache.get(cache_key) is not None:
+                        continue
+                    requests_file.write(json.dumps(request_line(cache_key, model, f"{prompt}\n\n{text}")) + "\n")
+                    requested.add(cache_key)
+                    new_requests += 1
+                # The requests must be on disk before the document counts as prepared
+                requests_file.flush()
+                os.fsync(requests_file.fileno())
+                entry.update(prepared=True, texts=len(texts), requests=new_requests)
+                job.save()
+                metrics.inc('bulk_requests_total', new_requests)
+                logger.info(f"Prepared {pdf_path}: {len(texts)} texts, {new_requests} new requests")
+    finally:
+        ea.close_summary_cache()
+    logger.info(f"{len(requested)} requests in {job.path(REQUESTS_FILE)}; send them with --bulk submit, "
+                f"or answer them elsewhere and load the results with --bulk ingest --results FILE")
+    return job
+
+
+async def bulk_submit(job_dir, overrides=None) -> BulkJob:
+    """Phase one and a half: upload requests.jsonl and start a batch, once per job"""
+    ea.load_config(overrides)
+    job = open_bulk_job(job_dir)
+    batch = job.state['batch'] or {}
+    if batch.get('id'):
+        logger.info(f"Already submitted as batch {batch['id']}; check on it with --bulk poll")
+        return job
+    if not os.path.exists(job.path(REQUESTS_FILE)) or not job.request_ids():
+        logger.info("No requests to submit; everything is cached, render with --bulk ingest")
+        return job
+    ea.import_openai()
+    ea.get_api_key()
+    async with ea.new_api_client() as client:
+        # Each step is saved as soon as it succeeds, so a rerun never uploads or starts a batch twice
+        if not batch.get('input_file_id'):
+            with open(job.path(REQUESTS_FILE), 'rb') as f:
+                uploaded = await client.files.create(file=(REQUESTS_FILE, f), purpose='batch')
+            batch['input_file_id'] = uploaded.id
+            job.state['batch'] = batch
+            job.save()
+            logger.info(f"Uploaded {job.path(REQUESTS_FILE)} as {uploaded.id}")
+        created = await client.batches.create(input_file_id=batch['input_file_id'], endpoint=BATCH_ENDPOINT,
+                                              completion_window='24h')
+        batch.update(id=created.id, status=created.status)
+        job.save()
+    logger.info(f"Submitted batch {created.id}; check on it with --bulk poll")
+    return job
+
+
+async def bulk_poll(job_dir, wait=False, overrides=None) -> Optional[str]:
+    """Check the job's batch and download its results once it is done; returns the batch status"""
+    ea.load_config(overrides)
+    job = open_bulk_job(job_dir)
+    batch = job.state['batch'] or {}
+    if not batch.get('id'):
+        logger.error(f"The job in {job.directory} has not been submitted; run --bulk submit first")
+        sys.exit(1)
+    poll_interval = ea.config.get('bulk', {}).get('poll_interval', 60)
+    ea.import_openai()
+    ea.get_api_key()
+    async with ea.new_api_client() as client:
+        while True:
+            retrieved = await client.batches.retrieve(batch['id'])
+            counts = retrieved.request_counts
+            logger.info(f"Batch {retrieved.id}: {retrieved.status}"
+                        + (f", {counts.completed} of {counts.total} completed, {counts.failed} failed"
+                           if counts is not None else ""))
+            if retrieved.status in BATCH_FINAL_STATES or not wait:
+                break
+            await asyncio.sleep(poll_interval)
+        if retrieved.status in BATCH_FINAL_STATES:
+            for file_id, name in ((retrieved.output_file_id, RESULTS_FILE), (retrieved.error_file_id, ERRORS_FILE)):
+                if file_id:
+                    content = await client.files.content(file_id)
+                    job.write_output(name, content.content)
+                    logger.info(f"Downloaded {job.path(name)}")
+    batch['status'] = retrieved.status
+    job.save()
+    if retrieved.status in BATCH_FINAL_STATES:
+        logger.info("Render the documents with --bulk ingest")
+    return retrieved.status
+
+
+async def bulk_ingest(job_dir, results_path=None, overrides=None) -> BulkJob:
+    """Phase two: cache the answers in a results file and render every prepared document.
+
+    The results may come from --bulk poll (the job's results.jsonl) or from
+    anything else that writes the Batch API output format. Answers to IDs
+    the job never requested are ignored. A document is marked rendered only
+    if all its summaries were available, so a rerun with more results
+    renders just the rest.
+    """
+    ea.load_config(overrides)
+    job = open_bulk_job(job_dir)
+    requested = job.request_ids()
+    summaries, errors = job.read_results(results_path)
+    summaries = {key: summary for key, summary in summaries.items() if key in requested}
+    errors = {key: error for key, error in errors.items() if key in requested and key not in summaries}
+    missing = len(requested) - len(summaries) - len(errors)
+    logger.info(f"Bulk results: {len(summaries)} of {len(requested)} requests answered, {len(errors)} failed, "
+                f"{missing} missing")
+    for error in sorted(set(errors.values()))[:5]:
+        logger.warning(f"Bulk request failed: {error}")
+
+    cache = ea.get_summary_cache()
+    for cache_key, summary in summaries.items():
+        cache.put(cache_key, summary)
+    metrics.inc('bulk_results_total', len(summaries))
+
+    pending = [path for path, entry in job.documents.items() if entry['prepared'] and not entry['rendered']]
+    rendered = 0
+    # Summaries come from the results (and the cache) only, never from the API
+    resources = ea.SharedResources(bulk_results=summaries)
+    try:
+        for pdf_path in pending:
+            entry = job.documents[pdf_path]
+            missing_before = metrics.registry.counter_value('bulk_results_missing_total')
+            try:
+                result = await ea.process_document(pdf_path, entry['start_page'], resources=resources)
+            except Exception as e:
+                logger.error(f"Rendering failed for {pdf_path}: {e}")
+                continue
+            complete = metrics.registry.counter_value('bulk_results_missing_total') == missing_before
+            entry.update(rendered=complete, output_file=result['output_file'])
+            job.save()
+            rendered += complete
+            logger.info(f"Rendered {result['output_file']}" + ("" if complete else " (some summaries pending)"))
+    finally:
+        ea.close_summary_cache()
+        ea.close_annotation_index()
+    logger.info(f"Bulk job {job.directory}: {rendered} of {len(pending)} documents rendered completely")
+    return job
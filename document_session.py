@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""One PDF, opened once per run.
+
+A DocumentSession hands the same fitz.Document to everything that needs
+the PDF: the title, the per-page annotation fingerprints, the
+annotated-page scan and page extraction. It also computes the content
+hash for the incremental state from the same input, without reading the
+file a second time. Every open re-reads and re-parses the xref table,
+which on a network mount is a round trip per open.
+
+The PDF comes from one of these inputs:
+
+  file     MuPDF reads the file itself, seeking as it needs (the default)
+  mmap     the file is mapped into memory and MuPDF parses the mapping, so
+           MuPDF and the hash share the same page cache. Opt-in: if the
+           file is truncated or rewritten while it is mapped, the process
+           gets SIGBUS instead of an exception it could handle
+  memory   the file is read in one sequential pass, which suits network
+           file systems with slow random access
+  bytes    PDF data that is already in memory, e.g. read from stdin or a
+           pipe; no file and no temporary copy
+
+Opening the document and mapping or reading the file happen lazily, so a
+session for a PDF that turns out to be unchanged costs nothing. Opens and
+bytes read by the extractor itself are counted as document_opens_total
+and document_input_bytes_total. In file and mmap mode, the reads MuPDF
+makes itself are not included.
+"""
+
+import hashlib
+import mmap
+from typing import Dict, Optional
+
+import fitz  # PyMuPDF
+
+import annotation_state
+import metrics
+
+INPUT_MODES = ('file', 'memory', 'mmap')
+
+
+class DocumentSession:
+    """A PDF from a path (in one of INPUT_MODES) or from bytes, and its lazily opened document"""
+
+    def __init__(self, name: str, path: Optional[str] = None, data: Optional[bytes] = None,
+                 input_mode: str = 'file'):
+        if input_mode not in INPUT_MODES:
+            raise ValueError(f"Unknown document input {input_mode!r}; use one of {', '.join(INPUT_MODES)}")
+        self.name = name
+        self.path = path  # None for PDFs that only exist in memory
+        self.input_mode = 'bytes' if path is None else input_mode
+        self._data = memoryview(data) if data is not None else None
+        self._file = None
+        self._mapping = None
+        self._doc = None
+        self._sha256 = None
+
+    @classmethod
+    def from_path(cls, path: str, input_mode: str = 'file') -> "DocumentSession":
+        return cls(path, path=path, input_mode=input_mode)
+
+    @classmethod
+    def from_stream(cls, stream, name: str) -> "DocumentSession":
+        """Read a whole PDF from a binary stream (sys.stdin.buffer, a pipe, a socket file)"""
+        data = stream.read()
+        metrics.inc('document_input_bytes_total', len(data))
+        return cls(name, data=data)
+
+    @property
+    def data(self) -> Optional[memoryview]:
+        """The PDF's bytes for mmap, memory and bytes input; None in file mode"""
+        if self._data is None and self.input_mode == 'mmap':
+            self._file = open(self.path, 'rb')
+            try:
+                self._mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file, which cannot be mapped
+                self._data = memoryview(b'')
+            else:
+                self._data = memoryview(self._mapping)
+        elif self._data is None and self.input_mode == 'memory':
+            with open(self.path, 'rb') as f:
+                self._data = memoryview(f.read())
+            metrics.inc('document_input_bytes_total', len(self._data))
+        return self._data
+
+    @property
+    def doc(self) -> fitz.Document:
+        """The document, opened on first use; raises what fitz.open raises"""
+        if self._doc is None:
+            with metrics.timer('pdf_open_seconds'):
+                if self.input_mode == 'file':
+                    self._doc = fitz.open(self.path)
+                else:
+                    self._doc = fitz.open(stream=self.data, filetype='pdf')
+            metrics.inc('document_opens_total')
+        return self._doc
+
+    @property
+    def metadata(self) -> Dict:
+        return self.doc.metadata or {}
+
+    def sha256(self) -> str:
+        """Hash of the PDF's content, from the same bytes the document is parsed from"""
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            if self.input_mode == 'file':
+                with open(self.path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(annotation_state.HASH_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        metrics.inc('document_input_bytes_total', len(chunk))
+            else:
+                digest.update(self.data)
+                if self.input_mode == 'mmap':
+                    metrics.inc('document_input_bytes_total', len(self.data))
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    def fingerprint(self, previous: Optional[Dict] = None) -> Dict:
+        """annotation_state.file_fingerprint, hashed from this session's input.
+
+        PDFs without a file have no mtime and are always hashed.
+        """
+        if self.path is None:
+            return {'size': len(self.data), 'mtime_ns': None, 'sha256': self.sha256()}
+        return annotation_state.file_fingerprint(self.path, previous, self.sha256)
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None  # drops the document's reference to the buffer
+        if self._mapping is not None:
+            try:
+                self._data.release()
+                self._mapping.close()
+            except BufferError:
+                pass  # objects still alive elsewhere use the mapping; it is unmapped with them
+            self._data = None
+            self._mapping = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,133 +1,496 @@
 #!/usr/bin/env python3
 
 import fitz  # PyMuPDF
+import numpy as np
 import sys
 import os
-import openai
 import re
 import asyncio
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import collections
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import yaml
 import logging
-import hashlib
 import time
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple, Optional
+from dataclasses import dataclass, field
 from enum import Enum
 
+import annotation_state
+import metrics
+from annotation_index import AnnotationIndex
+from annotation_export import (MARKDOWN_HEADER, MarkdownWriter, ProgressiveMarkdownWriter, export_path,
+                               format_annotation_markdown, open_export_writers, validate_export_formats)
+from annotation_records import Annotation, FREETEXT_COMMENT, HIGHLIGHT, HIGHLIGHT_COMMENT, NOTE
+from document_session import INPUT_MODES, DocumentSession
+from extractive_summary import EXTRACTIVE_MODEL, ExtractiveSummarizer
+from rate_control import AdaptiveRateController, parse_retry_after
+from summary_cache import SummaryCache, make_cache_key
+from summary_dedup import NearDuplicateIndex
+from text_cleaner import CLEANER_VERSION, TextCleaner
+
+logger = logging.getLogger("pdfextractor")
+
+CONSOLE_LOG_FORMAT = "[%(levelname)s] %(message)s"
+FILE_LOG_FORMAT = "%(asctime)s %(processName)s [%(levelname)s] %(name)s: %(message)s"
+
 # Configuration and globals
 config = {}
 colors_for_summaries = []
 
-# API response cache
-api_cache = {}
-api_call_times = []
-
-# Pre-compiled regex patterns for text cleaning (performance optimization)
-WHITESPACE_PATTERN = re.compile(r'[\n\t\r]+')
-# Improved pattern for line-break hyphens (hyphen + whitespace + continuation)
-LINE_BREAK_HYPHEN_PATTERN = re.compile(r'(\w+)-\s+(\w+)')
-# More selective OCR noise removal - only remove 4+ consecutive consonants
-OCR_NOISE_PATTERN = re.compile(r'\b(?:[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\s+){4,}\b')
-# Smart punctuation spacing - only after letters, preserve emails/versions
-SMART_PUNCT_PATTERN = re.compile(r'([.,;?!])([a-zA-Z])')
-ISOLATED_SPECIAL_PATTERN = re.compile(r'\s[^\w\s]\s')
-# More conservative single character removal - only remove obvious noise
-SINGLE_CHAR_NOISE_PATTERN = re.compile(r'\s+[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\s+(?=\s*[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\s+)')
-EXTRA_SPACES_PATTERN = re.compile(r'\s+')
-
-# Patterns to preserve important content
-EMAIL_PATTERN = re.compile(r'\b[\w.-]+@[\w.-]+\.\w+\b')
-VERSION_PATTERN = re.compile(r'\b\d+\.\d+(?:\.\d+)*\b')
-FILE_EXTENSION_PATTERN = re.compile(r'\b\w+\.\w{2,4}\b')
-
-# Common abbreviations to preserve (case insensitive)
-COMMON_ABBREVIATIONS = {
-    'pdf', 'usa', 'ceo', 'dna', 'rna', 'cpu', 'gpu', 'api', 'url', 'http', 'https',
-    'ftp', 'ssh', 'tcp', 'udp', 'ip', 'ui', 'ux', 'ai', 'ml', 'nlp', 'ocr',
-    'eu', 'uk', 'us', 'ca', 'au', 'de', 'fr', 'it', 'es', 'jp', 'cn'
-}
+# The OpenAI SDK is most of this script's import time, so it is imported by
+# import_openai() once there is something to summarize
+openai = None
+
+# Summarizer backends (summarizer.backend): 'openai' sends chat completion
+# requests, 'extractive' picks central sentences locally, without network access
+SUMMARIZER_BACKENDS = ('openai', 'extractive')
+
+# Persistent summary cache (opened lazily by get_summary_cache)
+summary_cache = None
+
+# Shared TextCleaner (created lazily by get_text_cleaner)
+text_cleaner = None
+
+# Library search index (opened lazily by get_annotation_index when index.enabled);
+# False once opening it failed, so the failure is reported once
+annotation_index = None
+DEFAULT_INDEX_PATH = "~/.cache/pdfextractor/library.sqlite3"
+
+BULK_PENDING_SUMMARY = "Summary not available: not among the bulk job's results"
 
 class AnnotationType(Enum):
     HIGHLIGHT = 8
     TEXT_NOTE = 12
     FREETEXT = 2
 
-def load_config():
-    """Load configuration from config.yaml and environment variables"""
+# PDF /Subtype names of the annotation types above
+EXTRACTED_ANNOT_SUBTYPES = {'Highlight', 'Text', 'FreeText'}
+
+# Tokens a summary is expected to take, counted against the API's token
+# budget before the response reports the actual use
+EXPECTED_COMPLETION_TOKENS = 300
+
+# Batched summarization: several highlights per request, split again by marker
+CHARS_PER_TOKEN = 4
+BATCH_TEXT_MARKER = "### TEXT"
+BATCH_MARKER_TOKENS = 8  # marker lines and separators per text
+BATCH_SUMMARY_PATTERN = re.compile(r'^[ \t]*#{1,6}[ \t]*SUMMARY[ \t]+(\d+)[ \t]*:?[ \t]*$',
+                                   re.MULTILINE | re.IGNORECASE)
+BATCH_INSTRUCTIONS = (
+    "The input below contains {count} separate texts, each introduced by a line '### TEXT <n>'. "
+    "Apply the instructions above to each text independently. Start the answer for each text with "
+    "a line '### SUMMARY <n>' using the same number, and write nothing before the first such line.")
+
+def merge_config(base: Dict, overrides: Optional[Dict]) -> Dict:
+    """Recursively apply overrides (e.g. from command-line flags) to a config dict"""
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merge_config(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+def _project_records(record: logging.LogRecord) -> bool:
+    """Log filter: pass this tool's records, and others only from WARNING up.
+
+    Keeps HTTP client chatter ("HTTP Request: POST ...") out of the log
+    whichever logger name the installed OpenAI SDK and its HTTP client use.
+    """
+    if record.levelno >= logging.WARNING:
+        return True
+    return record.name in ('pdfextractor', '__main__') or record.name.startswith('pdfextractor.')
+
+def setup_logging(logging_config: Dict):
+    """Configure the root logger from the config.yaml logging section.
+
+    level applies to console and file; file (optional) additionally writes
+    timestamped entries to that path. Unless level is DEBUG, other libraries'
+    records are only logged from WARNING up.
+    """
+    level_name = str(logging_config.get('level', 'INFO')).upper()
+    level = getattr(logging, level_name, None)
+    known_level = isinstance(level, int)
+    if not known_level:
+        level = logging.INFO
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(logging_config.get('format', CONSOLE_LOG_FORMAT)))
+    handlers = [console]
+    log_file = logging_config.get('file')
+    if log_file:
+        file_handler = logging.FileHandler(os.path.expanduser(log_file), encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter(FILE_LOG_FORMAT))
+        handlers.append(file_handler)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:  # replace handlers from an earlier load_config
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        if level > logging.DEBUG:
+            handler.addFilter(_project_records)
+        root.addHandler(handler)
+    root.setLevel(level)
+    if not known_level:
+        logger.warning(f"Unknown logging.level '{level_name}', using INFO")
+
+def load_config(overrides=None):
+    """Load configuration from config.yaml and environment variables.
+
+    overrides is a nested dict applied on top of the file, e.g.
+    {'processing': {'streaming': True}}.
+    """
     global config, colors_for_summaries
     
     # Load YAML configuration
     script_dir = os.path.dirname(os.path.abspath(__file__))
     config_path = os.path.join(script_dir, 'config.yaml')
     
+    config_found = True
     try:
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
-        colors_for_summaries = config['colors']['summary_colors']
-        print(f"[INFO] Configuration loaded from {config_path}")
     except FileNotFoundError:
-        print(f"[WARNING] Config file not found at {config_path}, using defaults")
+        config_found = False
         config = {
-            'api': {'model': 'gpt-4', 'max_retries': 3, 'retry_delay': 1.0, 'rate_limit_per_minute': 50},
+            'api': {'model': 'gpt-4', 'max_retries': 3, 'retry_delay': 1.0, 'rate_limit_per_minute': 50,
+                    'max_concurrency': 8},
             'colors': {'summary_colors': ["#92e1fb", "#69aff0", "#2ea8e5"]},
             'prompts': {'summarization': 'Please, explain the following to me in bullet points. Make sure to keep scientific references if they are present in the text!'},
-            'processing': {'max_workers': 4, 'chunk_size': 100}
+            'processing': {'max_workers': 4, 'chunk_size': 100, 'engine': 'thread', 'annotation_prescan': True,
+                           'prescan_subtypes': True, 'text_extraction': 'clip',
+                           'word_overlap_threshold': 0.5, 'clean_memo_size': 4096},
+            'cache': {'enabled': True, 'directory': '~/.cache/pdfextractor', 'max_size_mb': 100, 'ttl_days': 90},
+            'logging': {'level': 'INFO'}
         }
-        colors_for_summaries = config['colors']['summary_colors']
     except Exception as e:
-        print(f"[ERROR] Failed to load configuration: {e}")
+        setup_logging({})
+        logger.error(f"Failed to load configuration: {e}")
         sys.exit(1)
-    
-    # Setup OpenAI API key from environment or config
-    api_key = os.getenv('OPENAI_API_KEY')
-    
-    # If not in environment, try to load from config
-    if not api_key and 'api' in config and 'openai_api_key' in config['api']:
-        api_key = config['api']['openai_api_key']
-        print("[INFO] OpenAI API key loaded from config file")
-    elif api_key:
-        print("[INFO] OpenAI API key loaded from environment")
-    
-    if not api_key:
-        print("[ERROR] OPENAI_API_KEY not found in environment or config file")
-        print("[INFO] Please either:")
-        print("  1. Set environment variable: export OPENAI_API_KEY='your-key-here'")
-        print("  2. Add to config.yaml: api.openai_api_key: 'your-key-here'")
+    merge_config(config, overrides)
+    colors_for_summaries = summary_colors(config)
+    setup_logging(config.get('logging', {}))
+    try:
+        config['output'] = dict(config.get('output') or {},
+                                exports=validate_export_formats((config.get('output') or {}).get('exports')))
+    except ValueError as e:
+        logger.error(f"Invalid output.exports: {e}")
         sys.exit(1)
-    
-    openai.api_key = api_key
+    if summarizer_backend() not in SUMMARIZER_BACKENDS:
+        logger.error(f"Invalid summarizer.backend: {summarizer_backend()!r} "
+                     f"(choose from {', '.join(SUMMARIZER_BACKENDS)})")
+        sys.exit(1)
+    if document_input() not in INPUT_MODES:
+        logger.error(f"Invalid processing.document_input: {document_input()!r} "
+                     f"(choose from {', '.join(INPUT_MODES)})")
+        sys.exit(1)
+    if config_found:
+        logger.info(f"Configuration loaded from {config_path}")
+    else:
+        logger.warning(f"Config file not found at {config_path}, using defaults")
+    if not colors_for_summaries:
+        logger.info("Summaries are disabled, extracting annotations only")
 
-def rate_limit_check():
-    """Simple rate limiting for API calls"""
-    global api_call_times
-    now = time.time()
-    
-    # Remove calls older than 1 minute
-    api_call_times = [t for t in api_call_times if now - t < 60]
-    
-    # Check if we're at the rate limit
-    if len(api_call_times) >= config['api']['rate_limit_per_minute']:
-        wait_time = 60 - (now - api_call_times[0])
+def summary_colors(config) -> List[str]:
+    """Highlight colors to summarize; none when processing.summaries is off"""
+    if not config.get('processing', {}).get('summaries', True):
+        return []
+    return config.get('colors', {}).get('summary_colors', [])
+
+def summarizer_backend() -> str:
+    return (config.get('summarizer') or {}).get('backend', 'openai')
+
+def document_input() -> str:
+    return config.get('processing', {}).get('document_input', 'file')
+
+def extraction_options() -> Dict:
+    """Settings that change the extracted text, for the incremental state's options"""
+    processing = config.get('processing', {})
+    text_extraction = processing.get('text_extraction', 'clip')
+    return {
+        'text_extraction': text_extraction,
+        'word_overlap_threshold': (processing.get('word_overlap_threshold', 0.5)
+                                   if text_extraction == 'words' else None),
+        'cleaner_version': CLEANER_VERSION,
+    }
+
+def open_document(source):
+    """Context manager for a DocumentSession: a new one for a PDF path, closed afterwards,
+    or the session given, which its owner closes"""
+    if isinstance(source, DocumentSession):
+        return contextlib.nullcontext(source)
+    return DocumentSession.from_path(source, document_input())
+
+def get_api_key() -> str:
+    """OpenAI API key from the environment or config.yaml.
+
+    Only needed once there is something to summarize; raises ValueError
+    (a configuration error) when neither provides one.
+    """
+    api_key = os.getenv('OPENAI_API_KEY')
+    if api_key:
+        logger.debug("OpenAI API key loaded from environment")
+        return api_key
+    api_key = config.get('api', {}).get('openai_api_key')
+    if api_key:
+        logger.debug("OpenAI API key loaded from config file")
+        return api_key
+    raise ValueError("OPENAI_API_KEY not found in environment or config file, but highlights need summaries. "
+                     "Please either:\n"
+                     "  1. Set environment variable: export OPENAI_API_KEY='your-key-here'\n"
+                     "  2. Add to config.yaml: api.openai_api_key: 'your-key-here'\n"
+                     "  3. Run with --no-summaries to extract annotations only")
+
+def import_openai():
+    """Import the OpenAI SDK on first use"""
+    global openai
+    if openai is None:
+        with metrics.timer('openai_import_seconds'):
+            import openai as openai_sdk
+        openai = openai_sdk
+    return openai
+
+def new_api_client() -> "openai.AsyncOpenAI":
+    api_key = get_api_key()
+    # Retries are request_completion's job, so every 429 reaches the rate controller
+    return import_openai().AsyncOpenAI(api_key=api_key, max_retries=0)
+
+class TokenBucket:
+    """Non-blocking token bucket enforcing api.rate_limit_per_minute inside the event loop.
+
+    With ``shared=(lock, state)`` (multiprocessing manager proxies) the bucket's
+    balance lives in the manager, so every batch worker draws from one budget.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1, shared=None):
+        self.rate = max(rate_per_minute, 1e-6) / 60.0  # tokens per second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        # Wall-clock seconds during which at least one caller was waiting for a
+        # token; concurrent waits overlap, so summing them would overcount
+        self.blocked_seconds = 0.0
+        self._blocked_until = 0.0
+        self.shared = shared
+
+    def _reserve(self, tokens: float, updated: float) -> Tuple[float, float, float]:
+        """Take one token from a balance; returns (new balance, now, wait seconds)"""
+        now = time.monotonic()
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate) - 1
+        # A negative balance means the token is borrowed from the future: callers
+        # queue up behind each other without needing to hold a lock while waiting.
+        wait_time = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, now, wait_time
+
+    def _reserve_shared(self) -> float:
+        lock, state = self.shared
+        with lock:
+            tokens, now, wait_time = self._reserve(state['tokens'], state['updated'])
+            state.update(tokens=tokens, updated=now)
+        return wait_time
+
+    async def acquire(self) -> float:
+        """Reserve one token and sleep (without blocking the loop) until it is due"""
+        if self.shared is not None:
+            # Manager calls are IPC round-trips; keep them off the event loop
+            wait_time = await asyncio.get_running_loop().run_in_executor(None, self._reserve_shared)
+        else:
+            self.tokens, self.updated, wait_time = self._reserve(self.tokens, self.updated)
+        metrics.observe('rate_limit_wait_seconds', wait_time)
         if wait_time > 0:
-            print(f"[INFO] Rate limit reached, waiting {wait_time:.1f} seconds")
-            time.sleep(wait_time)
-    
-    api_call_times.append(now)
+            now = time.monotonic()
+            due = now + wait_time
+            self.blocked_seconds += max(0.0, due - max(now, self._blocked_until))
+            self._blocked_until = max(self._blocked_until, due)
+            await asyncio.sleep(wait_time)
+        return wait_time
+
+    def floor_seconds(self, calls: int) -> float:
+        """Shortest wall time the rate limit allows for calls requests (the burst is free)"""
+        return max(0, calls - self.capacity) / self.rate
+
+@dataclass
+class SharedResources:
+    """What a mode keeps open across documents and hands to process_document().
+
+    Without one, every document opens its own API client and page workers
+    and summarizes through the configured backend.
+    """
+    # Watch mode: one API client for the service's event loop, opened on first use
+    reuse_api_client: bool = False
+    api_client: Optional["openai.AsyncOpenAI"] = None
+    # Watch mode: the warm worker pool of processing.engine "process"
+    page_pool: Optional[ProcessPoolExecutor] = None
+    # Batch workers: (lock, dict) manager proxies of one token bucket for all workers
+    rate_state: Optional[Tuple] = None
+    # --bulk ingest: {cache key: summary} from a bulk job's results. When set,
+    # summaries come from it (and the cache) only, never from the API
+    bulk_results: Optional[Dict[str, str]] = None
+
+@dataclass
+class SummarizationSession:
+    """Shared state for one batch of concurrent summarization requests"""
+    # None for the local extractive backend
+    client: Optional["openai.AsyncOpenAI"] = None
+    limiter: Optional[TokenBucket] = None
+    controller: Optional[AdaptiveRateController] = None
+    request_seconds: float = 0.0  # summed per-call latency, i.e. the cost of a serial run
+    api_calls: int = 0
+    # time.perf_counter() when the first request started waiting for a slot and a
+    # rate-limit token, and when the last response was received; the session itself
+    # may also span extraction (overlapped pipeline, streaming)
+    first_request_at: Optional[float] = None
+    last_response_at: Optional[float] = None
+    batcher: Optional["SummaryBatcher"] = None
+    # cache key -> future of the request summarizing that text right now
+    in_flight: Dict[str, asyncio.Future] = field(default_factory=dict)
+    near_duplicates: Optional[NearDuplicateIndex] = None
+    coalesced: int = 0  # texts that shared an identical text's in-flight request
+    near_duplicate_hits: int = 0  # texts that reused a near-duplicate's summary
+    # Progressive output: called with (text index, summary received so far)
+    # while a single request streams its answer
+    on_partial: Optional[Callable[[int, str], None]] = None
+
+def get_summary_cache() -> SummaryCache:
+    """Open the summary cache configured in config.yaml (once per process)"""
+    global summary_cache
+    if summary_cache is None:
+        cache_config = config.get('cache', {})
+        if cache_config.get('enabled', True):
+            directory = cache_config.get('directory', '~/.cache/pdfextractor')
+            try:
+                summary_cache = SummaryCache(directory,
+                                             max_size_mb=cache_config.get('max_size_mb', 100),
+                                             ttl_days=cache_config.get('ttl_days', 90))
+                logger.info(f"Using summary cache at {summary_cache.path}")
+            except Exception as e:
+                logger.warning(f"Could not open summary cache in {directory}: {e}")
+        if summary_cache is None:
+            # Disabled or unavailable: fall back to a cache for this run only
+            summary_cache = SummaryCache(None)
+    return summary_cache
+
+def summary_cache_counts() -> Tuple[int, int]:
+    """(hits, misses) of the summary cache, without opening it if nothing has yet"""
+    if summary_cache is None:
+        return 0, 0
+    return summary_cache.hits, summary_cache.misses
+
+def close_summary_cache():
+    """Run final eviction and release the cache database"""
+    global summary_cache
+    if summary_cache is not None:
+        summary_cache.close()
+        summary_cache = None
+
+def get_annotation_index() -> Optional[AnnotationIndex]:
+    """Open the library search index if index.enabled (once per process); None otherwise"""
+    global annotation_index
+    if annotation_index is None:
+        annotation_index = False
+        index_config = config.get('index', {})
+        if index_config.get('enabled', False):
+            path = index_config.get('path', DEFAULT_INDEX_PATH)
+            try:
+                annotation_index = AnnotationIndex(path)
+                logger.info(f"Using library index at {annotation_index.path}")
+            except Exception as e:
+                logger.warning(f"Could not open library index {path}: {e}")
+    return annotation_index or None
+
+def close_annotation_index():
+    global annotation_index
+    if annotation_index:
+        annotation_index.close()
+    annotation_index = None
+
+def highlight_quad_rects(annot) -> List[fitz.Rect]:
+    """Bounding rect of every quad (usually one per highlighted line)"""
+    quads = annot.vertices or []
+    return [fitz.Quad(quads[i:i+4]).rect for i in range(0, len(quads), 4)]
+
+def extract_highlight_texts_clip(page, highlight_quads: List[List[fitz.Rect]]) -> List[str]:
+    """Extract each highlight's text with one clipped text extraction per quad"""
+    texts = []
+    for quad_rects in highlight_quads:
+        highlighted_text = ""
+        for rect in quad_rects:
+            highlighted_text += page.get_text("text", clip=rect, sort=True)
+        texts.append(highlighted_text)
+    return texts
+
+class PageWords:
+    """Word boxes of one page, extracted once and matched against all highlight quads.
+
+    Replaces one get_text(clip=...) call per quad with a single word extraction
+    and a vectorized NumPy box intersection.
+    """
+
+    def __init__(self, page):
+        # PyMuPDF's own sort=True is pure Python; ordering is done in NumPy below
+        words = page.get_text("words")
+        self.words = [w[4] for w in words]
+        self.boxes = np.array([w[:4] for w in words], dtype=np.float64).reshape(-1, 4)
+        widths = self.boxes[:, 2] - self.boxes[:, 0]
+        heights = self.boxes[:, 3] - self.boxes[:, 1]
+        self.areas = np.maximum(widths * heights, 1e-9)
+
+    def highlight_texts(self, highlight_quads: List[List[fitz.Rect]], overlap_threshold: float = 0.5) -> List[str]:
+        """Return the text of each highlight.
+
+        A word belongs to a highlight when at least overlap_threshold of its
+        box area lies inside one of the highlight's quads. Words are ordered by
+        the first quad they fall in, then by line (baseline) and x position.
+        """
+        texts = [""] * len(highlight_quads)
+        counts = np.array([len(quads) for quads in highlight_quads], dtype=np.intp)
+        if not self.words or not counts.sum():
+            return texts
 
-def get_text_hash(text: str) -> str:
-    """Generate a hash for text to use as cache key"""
-    return hashlib.md5(text.encode('utf-8')).hexdigest()
+        quads = np.array([tuple(rect) for quad_rects in highlight_quads for rect in quad_rects],
+                         dtype=np.float64).reshape(-1, 4)
+        n_quads = len(quads)
 
-def process_single_page(page_data: Tuple[int, fitz.Page, int]) -> Tuple[List[Dict], set]:
-    """Process annotations from a single page (for concurrent processing)"""
+        # (words x quads) intersection areas in one broadcast pass
+        ix0 = np.maximum(self.boxes[:, None, 0], quads[None, :, 0])
+        iy0 = np.maximum(self.boxes[:, None, 1], quads[None, :, 1])
+        ix1 = np.minimum(self.boxes[:, None, 2], quads[None, :, 2])
+        iy1 = np.minimum(self.boxes[:, None, 3], quads[None, :, 3])
+        overlap = np.clip(ix1 - ix0, 0, None) * np.clip(iy1 - iy0, 0, None)
+        hits = overlap >= overlap_threshold * self.areas[:, None]
+
+        # Index of the first matching quad per (word, highlight); n_quads = no match
+        quad_index = np.where(hits, np.arange(n_quads)[None, :], n_quads)
+        with_quads = np.nonzero(counts)[0]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[with_quads]
+        first_quad = np.minimum.reduceat(quad_index, starts, axis=1)
+
+        for column, highlight in enumerate(with_quads):
+            word_idx = np.nonzero(first_quad[:, column] < n_quads)[0]
+            if len(word_idx):
+                boxes = self.boxes[word_idx]
+                order = word_idx[np.lexsort((boxes[:, 0], np.round(boxes[:, 3]),
+                                             first_quad[word_idx, column]))]
+                texts[highlight] = " ".join(self.words[i] for i in order)
+        return texts
+
+def process_single_page(page_data: Tuple[int, fitz.Page, int], clean: bool = True) -> Tuple[List[Annotation], set]:
+    """Process annotations from a single page (for concurrent processing).
+
+    With clean=False, highlight texts are left as extracted (one line, not
+    yet cleaned) for the caller to clean, as corpus mode does in a process pool.
+    """
     page_num, page, start_page = page_data
-    annotations_with_pos = []  # (sort_key, annotation_dict)
+    annotations_with_pos = []  # (sort_key, Annotation)
     annotations = []
     highlight_colors = set()
     page_mid_x = page.rect.width / 2
 
+    pending_highlights = []  # Annotations awaiting their highlighted text
+    highlight_quads = []  # quad rects of each pending highlight
+
     try:
         annot = page.first_annot
         page_annotations = 0
@@ -146,465 +509,1563 @@ def process_single_page(page_data: Tuple[int, fitz.Page, int]) -> Tuple[List[Dic
             if annot.type[0] == AnnotationType.HIGHLIGHT.value:
                 highlight_colors.add(color_hex)
 
-                highlighted_text = ""
-                quads = annot.vertices
-                for i in range(0, len(quads), 4):
-                    rect = fitz.Quad(quads[i:i+4]).rect
-                    highlighted_text += page.get_text("text", clip=rect, sort=True)
-                highlighted_text = clean_text(highlighted_text.strip().replace('\n', ' '))
-
-                text_content_from_info = annot.info.get("content", "").strip()
-
-                if text_content_from_info:
-                    annotations_with_pos.append((sort_key, {
-                        "page": page_num + start_page,
-                        "type": "Highlight Comment",
-                        "content": f"Highlighted Text: {highlighted_text}\nComment: {text_content_from_info}",
-                        "color": color_hex,
-                    }))
-                else:
-                    annotations_with_pos.append((sort_key, {
-                        "page": page_num + start_page,
-                        "type": "Highlight",
-                        "content": highlighted_text,
-                        "color": color_hex,
-                    }))
+                # Text is filled in below, once all highlights on the page are known
+                comment = annot.info.get("content", "").strip()
+                entry = Annotation(page_num + start_page, HIGHLIGHT_COMMENT if comment else HIGHLIGHT,
+                                   color_hex, annot.rect, comment=comment)
+                annotations_with_pos.append((sort_key, entry))
+                pending_highlights.append(entry)
+                highlight_quads.append(highlight_quad_rects(annot))
+                metrics.observe('quads_per_highlight', len(highlight_quads[-1]), buckets=metrics.COUNT_BUCKETS)
                 page_annotations += 1
             elif annot.type[0] == AnnotationType.TEXT_NOTE.value:
-                annotations_with_pos.append((sort_key, {
-                    "page": page_num + start_page,
-                    "type": "Note",
-                    "content": annot.info.get("content", "").strip(),
-                    "color": color_hex,
-                }))
+                annotations_with_pos.append((sort_key, Annotation(
+                    page_num + start_page, NOTE, color_hex, annot.rect,
+                    comment=annot.info.get("content", "").strip())))
                 page_annotations += 1
             elif annot.type[0] == AnnotationType.FREETEXT.value:
-                annotations_with_pos.append((sort_key, {
-                    "page": page_num + start_page,
-                    "type": "FreeText Comment",
-                    "content": annot.info.get("content", "").strip(),
-                    "color": color_hex,
-                }))
+                annotations_with_pos.append((sort_key, Annotation(
+                    page_num + start_page, FREETEXT_COMMENT, color_hex, annot.rect,
+                    comment=annot.info.get("content", "").strip())))
                 page_annotations += 1
             annot = annot.next
 
-        annotations = [a for _, a in sorted(annotations_with_pos)]
+        if pending_highlights:
+            if config.get('processing', {}).get('text_extraction', 'clip') == 'words':
+                threshold = config.get('processing', {}).get('word_overlap_threshold', 0.5)
+                raw_texts = PageWords(page).highlight_texts(highlight_quads, threshold)
+            else:
+                raw_texts = extract_highlight_texts_clip(page, highlight_quads)
+
+            raw_texts = [raw_text.strip().replace('\n', ' ') for raw_text in raw_texts]
+            if clean:
+                with metrics.timer('text_clean_seconds'):
+                    cleaned_texts = get_text_cleaner().clean_many(raw_texts)
+                metrics.inc('texts_cleaned_total', len(cleaned_texts))
+            else:
+                cleaned_texts = raw_texts
+            for entry, highlighted_text in zip(pending_highlights, cleaned_texts):
+                entry.text = highlighted_text
+
+        annotations = [a for _, a in sorted(annotations_with_pos, key=lambda item: item[0])]
 
+        metrics.inc('pages_processed_total')
+        for annotation in annotations:
+            metrics.inc('annotations_total', type=annotation.type)
         if page_annotations > 0:
-            print(f"[INFO] Page {page_num + start_page}: Found {page_annotations} annotations")
+            logger.debug("Page %d: Found %d annotations", page_num + start_page, page_annotations)
             
     except Exception as e:
-        print(f"[ERROR] Failed to process page {page_num + start_page}: {e}")
+        metrics.inc('page_errors_total')
+        logger.error(f"Failed to process page {page_num + start_page}: {e}")
     
     return annotations, highlight_colors
 
-def extract_annotations(pdf_path, start_page):
-    print(f"\n[INFO] Starting annotation extraction from: {pdf_path}")
-    print(f"[INFO] Using start page number: {start_page}")
-    
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        print(f"[ERROR] Could not open PDF file {pdf_path}: {e}")
-        return [], set()
+def scan_annotated_pages(doc, read_subtypes=True, page_numbers=None) -> Dict[int, List[str]]:
+    """Find annotated pages from each page object's /Annots entry, without loading pages.
 
-    total_pages = len(doc)
-    print(f"[INFO] PDF has {total_pages} pages")
-    
+    Returns {page_num: [subtype, ...]}. With read_subtypes, each annotation's
+    /Subtype is read too and annotations the extractor ignores (links, form
+    widgets, ...) are dropped, so pages carrying only those are left out.
+    """
+    annotated = {}
+    for page_num in (range(len(doc)) if page_numbers is None else page_numbers):
+        xrefs = annotation_state.page_annotation_xrefs(doc, page_num)
+        if not xrefs:
+            continue
+        if not read_subtypes:
+            annotated[page_num] = []
+            continue
+        subtypes = [doc.xref_get_key(xref, "Subtype")[1].lstrip('/') for xref in xrefs]
+        subtypes = [subtype for subtype in subtypes if subtype in EXTRACTED_ANNOT_SUBTYPES]
+        if subtypes:
+            annotated[page_num] = subtypes
+    return annotated
+
+def _prescan_pages(doc, page_numbers, read_subtypes) -> List[int]:
+    """Restrict page_numbers to annotated pages and report what was skipped"""
+    scan_start = time.perf_counter()
+    annotated = scan_annotated_pages(doc, read_subtypes, page_numbers)
+    scan_seconds = time.perf_counter() - scan_start
+
+    selected = [page_num for page_num in page_numbers if page_num in annotated]
+    skipped = [page_num for page_num in page_numbers if page_num not in annotated]
+    metrics.inc('pages_scanned_total', len(page_numbers))
+    metrics.inc('pages_skipped_total', len(skipped))
+    if skipped:
+        logger.info(f"Pre-scan: {len(selected)} of {len(page_numbers)} pages annotated, "
+                    f"{len(skipped)} skipped (scan {scan_seconds * 1000:.1f} ms)")
+    if read_subtypes and selected:
+        counts = {}
+        for page_num in selected:
+            for subtype in annotated[page_num]:
+                counts[subtype] = counts.get(subtype, 0) + 1
+        logger.info(f"Pre-scan annotation types: "
+                    f"{', '.join(f'{name}: {count}' for name, count in sorted(counts.items()))}")
+    return selected
+
+def chunk_page_numbers(page_numbers, chunk_size) -> List[List[int]]:
+    """Split an ascending page list into contiguous runs of at most chunk_size pages"""
+    page_numbers = list(page_numbers)
+    chunk_size = max(1, chunk_size)
+    return [page_numbers[i:i + chunk_size] for i in range(0, len(page_numbers), chunk_size)]
+
+def _init_page_worker(worker_config):
+    """Process-pool initializer: install the parent's configuration"""
+    global config, colors_for_summaries, text_cleaner
+    config = worker_config
+    text_cleaner = None
+    colors_for_summaries = summary_colors(config)
+
+def _process_page_range(task) -> Tuple[List[Annotation], set, Dict]:
+    """Open the PDF in this worker and process one chunk of pages in order.
+
+    Also returns this chunk's metrics snapshot for the parent to merge.
+    """
+    pdf_path, page_numbers, start_page = task
+    metrics.registry.reset()
+    annotations = []
+    highlight_colors = set()
+    # Each worker has its own Document handle; PyMuPDF objects never cross processes
+    with open_document(pdf_path) as document:
+        doc = document.doc
+        for page_num in page_numbers:
+            try:
+                page = doc.load_page(page_num)
+            except Exception as e:
+                logger.error(f"Could not load page {page_num}: {e}")
+                continue
+            page_annotations, page_colors = process_single_page((page_num, page, start_page))
+            annotations.extend(page_annotations)
+            highlight_colors.update(page_colors)
+    return annotations, highlight_colors, metrics.registry.snapshot()
+
+def _extract_pages_in_processes(pdf_path, page_numbers, start_page, max_workers, chunk_size, deliver,
+                                page_pool=None):
+    """Fan contiguous page chunks out to worker processes; results are delivered in page order"""
+    chunks = chunk_page_numbers(page_numbers, chunk_size)
+    if page_pool is not None:
+        # Watch mode's warm pool stays open after this document
+        pool = contextlib.nullcontext(page_pool)
+        workers = max_workers
+    else:
+        workers = max(1, min(max_workers, len(chunks)))
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker, initargs=(config,))
+    logger.info(f"Processing {len(chunks)} page chunks with {workers} worker processes")
+    with pool as executor:
+        # map() yields in submission order, so the merge keeps annotations in page order
+        tasks = [(pdf_path, chunk, start_page) for chunk in chunks]
+        for chunk, (annotations, highlight_colors, worker_metrics) in zip(
+                chunks, executor.map(_process_page_range, tasks)):
+            metrics.registry.merge(worker_metrics)
+            deliver((annotations, highlight_colors), len(chunk))
+
+def _extract_pages_in_threads(doc, page_numbers, start_page, max_workers, deliver):
+    """Process pages of an already opened document with a thread pool"""
     # Prepare data for concurrent processing
     page_data = []
-    for page_num in range(total_pages):
+    for page_num in page_numbers:
         try:
             page = doc.load_page(page_num)
             page_data.append((page_num, page, start_page))
         except Exception as e:
-            print(f"[ERROR] Could not load page {page_num}: {e}")
-    
-    # Process pages concurrently
-    all_annotations = []
-    all_highlight_colors = set()
-    
-    max_workers = config.get('processing', {}).get('max_workers', 4)
+            logger.error(f"Could not load page {page_num}: {e}")
     
+    delivered = 0
     try:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            print(f"[INFO] Processing pages with {max_workers} workers")
-            results = list(executor.map(process_single_page, page_data))
-            
-            # Combine results
-            for annotations, highlight_colors in results:
-                all_annotations.extend(annotations)
-                all_highlight_colors.update(highlight_colors)
+            logger.info(f"Processing pages with {max_workers} workers")
+            for result in executor.map(process_single_page, page_data):
+                deliver(result, 1)
+                delivered += 1
                 
     except Exception as e:
-        print(f"[ERROR] Concurrent processing failed: {e}")
-        # Fallback to sequential processing
-        print("[INFO] Falling back to sequential processing")
-        for page_data_item in page_data:
+        logger.error(f"Concurrent processing failed: {e}")
+        # Fallback to sequential processing for the pages not delivered yet
+        logger.warning("Falling back to sequential processing")
+        for page_data_item in page_data[delivered:]:
             try:
-                annotations, highlight_colors = process_single_page(page_data_item)
-                all_annotations.extend(annotations)
-                all_highlight_colors.update(highlight_colors)
+                deliver(process_single_page(page_data_item), 1)
             except Exception as e:
-                print(f"[ERROR] Failed to process page {page_data_item[0]}: {e}")
-    
-    if doc:
-        doc.close()
-    
-    print(f"[INFO] Total annotations extracted: {len(all_annotations)}")
-    return all_annotations, all_highlight_colors
+                logger.error(f"Failed to process page {page_data_item[0]}: {e}")
+
+def extract_annotations(pdf_path, start_page, page_numbers=None, on_annotations=None, page_pool=None):
+    """Extract annotations from all pages, or only from the 0-based page_numbers given.
+
+    pdf_path is a path or an open DocumentSession, whose document is reused.
+
+    on_annotations, if given, is called with each page's (or page chunk's)
+    annotations in page order as soon as they are available.
 
-async def summarize_single_text(text, index):
-    global api_cache
+    Unless processing.annotation_prescan is off, pages are first filtered by
+    their /Annots entries so that pages without annotations are never loaded.
+    processing.engine selects a thread pool over one shared document
+    ("thread") or worker processes that each open the PDF themselves and take
+    contiguous chunks of processing.chunk_size pages ("process"), from
+    page_pool if given, else from a pool started for this document. PDFs
+    without a file (read from stdin) always use threads.
+    """
+    with metrics.stage('extract'), open_document(pdf_path) as document:
+        return _extract_annotations(document, start_page, page_numbers, on_annotations, page_pool)
+
+def _extract_annotations(document: DocumentSession, start_page, page_numbers, on_annotations, page_pool):
+    logger.info(f"Starting annotation extraction from: {document.name}")
+    logger.info(f"Using start page number: {start_page}")
     
-    print(f"[INFO] Starting summarization for text #{index + 1} (length: {len(text)} chars)")
+    try:
+        doc = document.doc
+    except Exception as e:
+        logger.error(f"Could not open PDF file {document.name}: {e}")
+        return [], set()
+
+    total_pages = len(doc)
+    logger.info(f"PDF has {total_pages} pages")
     
-    # Check cache first
-    text_hash = get_text_hash(text)
-    if text_hash in api_cache:
-        print(f"[INFO] Using cached summary for text #{index + 1}")
-        return api_cache[text_hash]
+    if page_numbers is None:
+        page_numbers = range(total_pages)
+    else:
+        logger.info(f"Extracting {len(page_numbers)} of {total_pages} pages")
+
+    processing = config.get('processing', {})
+    if processing.get('annotation_prescan', True):
+        try:
+            page_numbers = _prescan_pages(doc, page_numbers, processing.get('prescan_subtypes', True))
+        except Exception as e:
+            logger.warning(f"Annotation pre-scan failed ({e}), processing every page")
+    max_workers = processing.get('max_workers', 4)
+    results = []
+    pages_done = 0
+
+    def deliver(result, page_count):
+        nonlocal pages_done
+        results.append(result)
+        pages_done += page_count
+        if on_annotations is not None:
+            on_annotations(result[0])
+
+    if processing.get('engine', 'thread') == 'process' and len(page_numbers) and document.path is None:
+        logger.info("The process engine needs a PDF file; processing pages read from stdin with threads")
+    elif processing.get('engine', 'thread') == 'process' and len(page_numbers):
+        try:
+            _extract_pages_in_processes(document.path, page_numbers, start_page, max_workers,
+                                        processing.get('chunk_size', 100), deliver, page_pool)
+        except Exception as e:
+            logger.warning(f"Process-based extraction failed ({e}), falling back to threads")
+    remaining_pages = list(page_numbers)[pages_done:]
+    if remaining_pages:
+        _extract_pages_in_threads(doc, remaining_pages, start_page, max_workers, deliver)
+
+    # Combine results
+    all_annotations = []
+    all_highlight_colors = set()
+    for annotations, highlight_colors in results:
+        all_annotations.extend(annotations)
+        all_highlight_colors.update(highlight_colors)
     
+    logger.info(f"Total annotations extracted: {len(all_annotations)}")
+    return all_annotations, all_highlight_colors
+
+class SummaryUnavailable(Exception):
+    """A request failed for good; the message is the placeholder summary to use"""
+
+def summary_settings() -> Tuple[str, str]:
+    """(model, prompt template) used for summaries and their cache keys.
+
+    For the extractive backend these are its name and its settings, so the
+    cache, and the incremental state, keep both backends' summaries apart.
+    """
+    if summarizer_backend() == 'extractive':
+        return EXTRACTIVE_MODEL, get_extractive_summarizer().settings
+    return (config.get('api', {}).get('model', 'gpt-4'),
+            config.get('prompts', {}).get('summarization',
+                'Please, explain the following to me in bullet points. Make sure to keep scientific references if they are present in the text!'))
+
+async def read_completion_stream(stream, on_delta: Callable[[str], None], request_start: float):
+    """(text, usage) of a streamed chat completion, calling on_delta with the text so far per chunk"""
+    parts = []
+    usage = None
+    async for chunk in stream:
+        if getattr(chunk, 'usage', None) is not None:
+            usage = chunk.usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            if not parts:
+                metrics.observe('api_first_token_seconds', time.perf_counter() - request_start)
+            parts.append(delta)
+            on_delta("".join(parts))
+    return "".join(parts), usage
+
+async def request_completion(content, label, session: SummarizationSession,
+                             on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """Send one chat completion with retries; raises SummaryUnavailable when out of retries.
+
+    With on_delta, the answer is streamed and on_delta is called with the
+    text received so far after every chunk (and with "" when a retry starts over).
+    """
     max_retries = config.get('api', {}).get('max_retries', 3)
-    retry_delay = config.get('api', {}).get('retry_delay', 1.0)
     model = config.get('api', {}).get('model', 'gpt-4')
-    prompt_template = config.get('prompts', {}).get('summarization', 
-        'Please, explain the following to me in bullet points. Make sure to keep scientific references if they are present in the text!')
-    
+
+    controller = session.controller
+    estimated_tokens = estimate_tokens(content) + EXPECTED_COMPLETION_TOKENS
+
     for attempt in range(max_retries):
+        if on_delta is not None and attempt > 0:
+            on_delta("")
         try:
-            # Rate limiting
-            rate_limit_check()
-            
-            response = openai.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"{prompt_template}\n\n{text}",
-                    }
-                ]
-            )
-            summary = response.choices[0].message.content
-            
-            # Cache the result
-            api_cache[text_hash] = summary
-            
-            print(f"[SUCCESS] Completed summarization for text #{index + 1}")
-            return summary
+            if session.first_request_at is None:
+                session.first_request_at = time.perf_counter()
+            # Wait for a slot under the adaptive limit and the API's budgets,
+            # then for a token of the configured rate limit
+            async with controller.slot(estimated_tokens) as slot:
+                await session.limiter.acquire()
+                request_start = time.perf_counter()
+                outcome = "error"
+                try:
+                    messages = [
+                        {
+                            "role": "user",
+                            "content": content,
+                        }
+                    ]
+                    if on_delta is None:
+                        raw_response = await session.client.chat.completions.with_raw_response.create(
+                            model=model,
+                            messages=messages
+                        )
+                        response = raw_response.parse()
+                        text, usage = response.choices[0].message.content, getattr(response, 'usage', None)
+                    else:
+                        raw_response = await session.client.chat.completions.with_raw_response.create(
+                            model=model,
+                            messages=messages,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        )
+                        text, usage = await read_completion_stream(raw_response.parse(), on_delta, request_start)
+                    outcome = "ok"
+                finally:
+                    session.last_response_at = time.perf_counter()
+                    request_seconds = session.last_response_at - request_start
+                    session.request_seconds += request_seconds
+                    session.api_calls += 1
+                    metrics.observe('api_request_seconds', request_seconds, outcome=outcome)
+                slot.succeeded(raw_response.headers, usage.total_tokens if usage is not None else None)
+            return text
             
         except openai.RateLimitError as e:
-            wait_time = retry_delay * (2 ** attempt)
-            print(f"[WARNING] Rate limit hit for text #{index + 1}, attempt {attempt + 1}/{max_retries}, waiting {wait_time}s: {e}")
+            wait_time = controller.backoff(attempt, controller.on_rate_limited(e.response.headers))
+            logger.warning(f"Rate limit hit for {label}, attempt {attempt + 1}/{max_retries}, "
+                           f"waiting {wait_time:.2f}s: {e}")
             if attempt < max_retries - 1:
+                metrics.inc('api_retries_total', reason="rate_limit")
                 await asyncio.sleep(wait_time)
             else:
-                print(f"[ERROR] Max retries exceeded for text #{index + 1} due to rate limiting")
-                return "Summary not available due to rate limiting"
+                logger.error(f"Max retries exceeded for {label} due to rate limiting")
+                raise SummaryUnavailable("Summary not available due to rate limiting")
                 
         except openai.APIError as e:
-            wait_time = retry_delay * (2 ** attempt)
-            print(f"[WARNING] API error for text #{index + 1}, attempt {attempt + 1}/{max_retries}: {e}")
+            response = getattr(e, 'response', None)
+            retry_after = parse_retry_after(response.headers) if response is not None and controller.follow_headers else None
+            wait_time = controller.backoff(attempt, retry_after)
+            logger.warning(f"API error for {label}, attempt {attempt + 1}/{max_retries}: {e}")
             if attempt < max_retries - 1:
+                metrics.inc('api_retries_total', reason="api_error")
                 await asyncio.sleep(wait_time)
             else:
-                print(f"[ERROR] Max retries exceeded for text #{index + 1} due to API errors")
-                return f"Summary not available due to API error: {str(e)}"
+                logger.error(f"Max retries exceeded for {label} due to API errors")
+                raise SummaryUnavailable(f"Summary not available due to API error: {str(e)}")
                 
         except Exception as e:
-            print(f"[ERROR] Unexpected error for text #{index + 1}, attempt {attempt + 1}/{max_retries}: {str(e)}")
+            logger.error(f"Unexpected error for {label}, attempt {attempt + 1}/{max_retries}: {str(e)}")
             if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
+                metrics.inc('api_retries_total', reason="unexpected")
+                await asyncio.sleep(controller.backoff(attempt))
             else:
-                return f"Summary not available due to unexpected error: {str(e)}"
+                raise SummaryUnavailable(f"Summary not available due to unexpected error: {str(e)}")
     
-    return "Summary not available"
-
-async def summarize_annotations(texts):
-    print(f"\n[INFO] Starting concurrent summarization of {len(texts)} texts")
-    # Create tasks for each text
-    tasks = []
-    for i, text in enumerate(texts):
-        tasks.append(asyncio.create_task(summarize_single_text(text, i)))
+    raise SummaryUnavailable("Summary not available")
+
+async def summarize_uncached(text, index, cache_key, session: SummarizationSession) -> str:
+    """Summarize one text with its own request and cache the result"""
+    _, prompt_template = summary_settings()
+    on_delta = functools.partial(session.on_partial, index) if session.on_partial is not None else None
+    try:
+        summary = await request_completion(f"{prompt_template}\n\n{text}", f"text #{index + 1}", session, on_delta)
+    except SummaryUnavailable as e:
+        return str(e)
+    get_summary_cache().put(cache_key, summary)
+    logger.debug("Completed summarization for text #%d", index + 1)
+    return summary
+
+async def summarize_single_text(text, index, session: SummarizationSession):
+    logger.debug("Starting summarization for text #%d (length: %d chars)", index + 1, len(text))
     
-    print("[INFO] Waiting for all summarizations to complete...")
-    # Wait for all tasks to complete
-    summaries = await asyncio.gather(*tasks)
-    print("[INFO] All summarizations completed")
+    model, prompt_template = summary_settings()
+    
+    # Check cache first
+    cache = get_summary_cache()
+    cache_key = make_cache_key(model, prompt_template, text)
+    cached_summary = cache.get(cache_key)
+    if cached_summary is not None:
+        metrics.inc('cache_hits_total')
+        logger.debug("Using cached summary for text #%d", index + 1)
+        return cached_summary
+    metrics.inc('cache_misses_total')
+
+    # The cache is only filled once a response arrives, so an identical text
+    # that is already being summarized shares that request instead.
+    in_flight = session.in_flight.get(cache_key)
+    if in_flight is not None:
+        session.coalesced += 1
+        metrics.inc('api_calls_saved_total', reason="in_flight")
+        logger.debug("Text #%d is already being summarized, sharing that request", index + 1)
+        return await asyncio.shield(in_flight)
+
+    if session.near_duplicates is not None:
+        match = session.near_duplicates.match_or_add(text, cache_key)
+        if match is not None:
+            summary = await reuse_near_duplicate(match, index, cache_key, session)
+            if summary is not None:
+                return summary
+
+    future = asyncio.get_running_loop().create_future()
+    session.in_flight[cache_key] = future
+    try:
+        if session.batcher is not None:
+            summary = await session.batcher.submit(text, index, cache_key)
+        else:
+            summary = await summarize_uncached(text, index, cache_key, session)
+        future.set_result(summary)
+        return summary
+    finally:
+        del session.in_flight[cache_key]
+        if not future.done():
+            future.cancel()
+
+async def reuse_near_duplicate(match, index, cache_key, session: SummarizationSession) -> Optional[str]:
+    """Summary of a highly similar text from this session, or None if it has none.
+
+    The summary is also cached under this text's own key.
+    """
+    shared_key, similarity = match
+    in_flight = session.in_flight.get(shared_key)
+    cache = get_summary_cache()
+    summary = await asyncio.shield(in_flight) if in_flight is not None else cache.get(shared_key, count=False)
+    if summary is None or is_summary_failure(summary):
+        return None
+    cache.put(cache_key, summary)
+    session.near_duplicate_hits += 1
+    metrics.inc('api_calls_saved_total', reason="near_duplicate")
+    logger.debug("Text #%d reuses the summary of a near-duplicate (similarity %.2f)", index + 1, similarity)
+    return summary
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def build_batch_prompt(prompt_template: str, texts: List[str]) -> str:
+    """One prompt carrying several texts, each introduced by a numbered marker"""
+    parts = [prompt_template, BATCH_INSTRUCTIONS.format(count=len(texts))]
+    for item_id, text in enumerate(texts, 1):
+        parts.append(f"{BATCH_TEXT_MARKER} {item_id}\n{text}")
+    return "\n\n".join(parts)
+
+def parse_batch_response(content: str, count: int) -> Dict[int, str]:
+    """Split a batched answer into {item id: summary}; ids without a usable section are left out"""
+    summaries = {}
+    seen = set()
+    matches = list(BATCH_SUMMARY_PATTERN.finditer(content or ""))
+    for position, match in enumerate(matches):
+        item_id = int(match.group(1))
+        end = matches[position + 1].start() if position + 1 < len(matches) else len(content)
+        summary = content[match.end():end].strip()
+        # A repeated id makes the answer ambiguous for that id
+        if item_id in seen:
+            summaries.pop(item_id, None)
+        elif 1 <= item_id <= count and summary:
+            summaries[item_id] = summary
+        seen.add(item_id)
+    return summaries
+
+class SummaryBatcher:
+    """Packs the highlights submitted within a short window into shared requests.
+
+    A batch is sent once adding the next text would exceed
+    api.batching.max_tokens (prompt template included), once it holds
+    max_items texts, or linger_ms after its first text arrived. Summaries
+    missing from a batched answer are requested one by one instead.
+    """
+
+    def __init__(self, session: SummarizationSession, batching_config: Dict):
+        self.session = session
+        self.max_tokens = batching_config.get('max_tokens', 2000)
+        self.max_items = max(1, batching_config.get('max_items', 10))
+        self.linger = batching_config.get('linger_ms', 50) / 1000
+        _, prompt_template = summary_settings()
+        self.base_tokens = estimate_tokens(prompt_template + BATCH_INSTRUCTIONS)
+        self.pending = []  # (text, index, cache_key, future)
+        self.pending_tokens = 0
+        self.flush_handle = None
+        self.tasks = set()
+        self.batches = 0
+        self.batched_texts = 0
+        self.fallbacks = 0
+
+    async def submit(self, text, index, cache_key) -> str:
+        tokens = estimate_tokens(text) + BATCH_MARKER_TOKENS
+        if self.base_tokens + tokens > self.max_tokens:
+            # Too long to share a request with anything else
+            return await summarize_uncached(text, index, cache_key, self.session)
+        if self.pending and self.base_tokens + self.pending_tokens + tokens > self.max_tokens:
+            self.flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((text, index, cache_key, future))
+        self.pending_tokens += tokens
+        if len(self.pending) >= self.max_items:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.linger, self.flush)
+        return await future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        items, self.pending, self.pending_tokens = self.pending, [], 0
+        task = asyncio.create_task(self._send(items))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def close(self):
+        """Send whatever is still pending and wait for all batches to finish"""
+        self.flush()
+        while self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    async def _send(self, items):
+        try:
+            if len(items) == 1:
+                text, index, cache_key, future = items[0]
+                future.set_result(await summarize_uncached(text, index, cache_key, self.session))
+                return
+
+            _, prompt_template = summary_settings()
+            label = f"batch of {len(items)} texts (#{items[0][1] + 1}...)"
+            try:
+                content = await request_completion(
+                    build_batch_prompt(prompt_template, [item[0] for item in items]), label, self.session)
+            except SummaryUnavailable as e:
+                for *_, future in items:
+                    future.set_result(str(e))
+                return
+            self.batches += 1
+            metrics.inc('api_batches_total')
+
+            summaries = parse_batch_response(content, len(items))
+            cache = get_summary_cache()
+            missing = []
+            for item_id, (text, index, cache_key, future) in enumerate(items, 1):
+                summary = summaries.get(item_id)
+                if summary is None:
+                    missing.append((text, index, cache_key, future))
+                    continue
+                cache.put(cache_key, summary)
+                future.set_result(summary)
+            self.batched_texts += len(items) - len(missing)
+            metrics.inc('api_batched_texts_total', len(items) - len(missing))
+
+            if missing:
+                self.fallbacks += len(missing)
+                metrics.inc('api_batch_fallbacks_total', len(missing))
+                logger.warning(f"Could not split {len(missing)} of {len(items)} summaries from {label}, "
+                               f"requesting them individually")
+                results = await asyncio.gather(*(summarize_uncached(text, index, cache_key, self.session)
+                                                 for text, index, cache_key, _ in missing))
+                for (*_, future), summary in zip(missing, results):
+                    future.set_result(summary)
+        except Exception as e:
+            logger.error(f"Batched summarization failed: {e}")
+            for *_, future in items:
+                if not future.done():
+                    future.set_result(f"Summary not available due to unexpected error: {str(e)}")
+
+def get_extractive_summarizer() -> ExtractiveSummarizer:
+    extractive_config = (config.get('summarizer') or {}).get('extractive', {})
+    return ExtractiveSummarizer(extractive_config.get('max_sentences', 3), extractive_config.get('min_words', 4))
+
+class ExtractiveBatcher:
+    """Summarizes texts locally, all texts submitted in one event loop iteration at once.
+
+    It takes SummaryBatcher's place in the session, so caching and
+    deduplication work as for the API. summarize_annotations() submits a
+    document's highlights together, so they are scored in one vectorized pass.
+    """
+
+    def __init__(self):
+        self.summarizer = get_extractive_summarizer()
+        self.pending = []  # (text, cache_key, future)
+        self.batches = 0
+        self.texts = 0
+        self.seconds = 0.0
+
+    async def submit(self, text, index, cache_key) -> str:
+        future = asyncio.get_running_loop().create_future()
+        if not self.pending:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.pending.append((text, cache_key, future))
+        return await future
+
+    def flush(self):
+        items, self.pending = self.pending, []
+        if not items:
+            return
+        started = time.perf_counter()
+        try:
+            summaries = self.summarizer.summarize([text for text, _, _ in items])
+        except Exception as e:
+            logger.error(f"Extractive summarization failed: {e}")
+            summaries = [f"Summary not available due to unexpected error: {str(e)}"] * len(items)
+        else:
+            cache = get_summary_cache()
+            for (_, cache_key, _), summary in zip(items, summaries):
+                cache.put(cache_key, summary)
+        elapsed = time.perf_counter() - started
+        self.batches += 1
+        self.texts += len(items)
+        self.seconds += elapsed
+        metrics.observe('extractive_batch_seconds', elapsed)
+        metrics.inc('extractive_summaries_total', len(items))
+        for (*_, future), summary in zip(items, summaries):
+            if not future.done():
+                future.set_result(summary)
+
+    async def close(self):
+        self.flush()
+
+def summarization_session(resources: Optional[SharedResources] = None):
+    """Session for the configured summarizer backend (an async context manager)"""
+    resources = resources or SharedResources()
+    if resources.bulk_results is not None:
+        return bulk_summarization_session(resources.bulk_results)
+    if summarizer_backend() == 'extractive':
+        return extractive_summarization_session()
+    return openai_summarization_session(resources)
+
+@contextlib.asynccontextmanager
+async def extractive_summarization_session():
+    """Local summaries: no client, key or rate limits"""
+    session = SummarizationSession(batcher=ExtractiveBatcher())
+    try:
+        yield session
+    finally:
+        await session.batcher.close()
+    batcher = session.batcher
+    if batcher.texts:
+        logger.info(f"Extractive summaries: {batcher.texts} texts in {batcher.batches} batches, "
+                    f"{batcher.seconds * 1000:.1f} ms")
+
+class BulkResultsBatcher:
+    """Answers from a bulk job's results instead of the API (see bulk_jobs.bulk_ingest).
+
+    Texts that are neither cached nor in the results get a placeholder, so
+    their pages are retried by the next run or the next bulk job.
+    """
+
+    def __init__(self, results: Dict[str, str]):
+        self.results = results
+        self.missing = 0
+
+    async def submit(self, text, index, cache_key) -> str:
+        summary = self.results.get(cache_key)
+        if summary is None:
+            self.missing += 1
+            metrics.inc('bulk_results_missing_total')
+            return BULK_PENDING_SUMMARY
+        get_summary_cache().put(cache_key, summary)
+        return summary
+
+    async def close(self):
+        pass
+
+@contextlib.asynccontextmanager
+async def bulk_summarization_session(results: Dict[str, str]):
+    """Summaries from a bulk job's results: no client, key or rate limits"""
+    session = SummarizationSession(batcher=BulkResultsBatcher(results))
+    yield session
+    if session.batcher.missing:
+        logger.warning(f"{session.batcher.missing} texts have no summary in the bulk job's results")
+
+@contextlib.asynccontextmanager
+async def openai_summarization_session(resources: SharedResources):
+    """Open an async client, concurrency cap and rate limiter for a batch of requests"""
+    get_api_key()  # fail before anything is set up when there is no key
+    api_config = config.get('api', {})
+    max_concurrency = api_config.get('max_concurrency', 8)
+    limiter = TokenBucket(api_config.get('rate_limit_per_minute', 50),
+                          api_config.get('rate_limit_burst', max_concurrency),
+                          shared=resources.rate_state)
+    adaptive_config = api_config.get('adaptive', {})
+    adaptive = adaptive_config.get('enabled', True)
+    controller = AdaptiveRateController(
+        max_concurrency,
+        min_concurrency=adaptive_config.get('min_concurrency', 1),
+        initial_concurrency=adaptive_config.get('initial_concurrency') if adaptive else None,
+        increase=adaptive_config.get('increase', 1.0) if adaptive else 0.0,
+        decrease=adaptive_config.get('decrease', 0.5) if adaptive else 1.0,
+        retry_delay=api_config.get('retry_delay', 1.0),
+        max_retry_delay=adaptive_config.get('max_retry_delay', 60.0),
+        jitter=adaptive_config.get('jitter', 0.5) if adaptive else 0.0,
+        follow_headers=adaptive)
+    logger.info(f"Up to {max_concurrency} requests in flight"
+                f"{' (adaptive, starting at %d)' % controller.limit if adaptive else ''}, "
+                f"{api_config.get('rate_limit_per_minute', 50)} requests per minute")
+
+    async with contextlib.AsyncExitStack() as stack:
+        # The async client's connection pool is bound to the running loop, so it
+        # lives as long as this session unless watch mode keeps one for its loop.
+        if resources.reuse_api_client:
+            if resources.api_client is None:
+                resources.api_client = new_api_client()
+            client = resources.api_client
+        else:
+            client = await stack.enter_async_context(new_api_client())
+        session = SummarizationSession(client, limiter, controller)
+        batching_config = api_config.get('batching', {})
+        if batching_config.get('enabled', False):
+            session.batcher = SummaryBatcher(session, batching_config)
+        dedup_config = api_config.get('near_duplicates', {})
+        if dedup_config.get('enabled', False):
+            session.near_duplicates = NearDuplicateIndex(dedup_config.get('threshold', 0.9),
+                                                         dedup_config.get('shingle_size', 5),
+                                                         dedup_config.get('num_perm', 64))
+        try:
+            yield session
+        finally:
+            if session.batcher is not None:
+                await session.batcher.close()
+
+    if session.api_calls:
+        # From the first request to the last response: extraction running
+        # before or alongside the requests is not summarization time, waiting
+        # for the rate limit is (and blocked_seconds falls within this window)
+        elapsed = session.last_response_at - session.first_request_at
+        floor = limiter.floor_seconds(session.api_calls)
+        if floor >= session.request_seconds:
+            # The rate limit sets the pace, serial or not: a speedup over the
+            # summed latencies would compare against a run the limit forbids
+            pace = f"paced by the rate limit: floor {floor:.2f}s at {limiter.rate * 60:g}/min"
+        else:
+            speedup = session.request_seconds / elapsed if elapsed > 0 else 1.0
+            pace = f"speedup: {speedup:.1f}x"
+        logger.info(f"Summarization wall time: {elapsed:.2f}s for {session.api_calls} API calls "
+                    f"(serial estimate: {session.request_seconds:.2f}s, {pace}, "
+                    f"blocked on the rate limit: {limiter.blocked_seconds:.2f}s)")
+    if controller.rate_limited or controller.total_wait:
+        logger.info(f"Rate control: {controller.rate_limited} rate-limited responses, "
+                    f"{controller.total_wait:.2f}s waiting for budgets or slots, concurrency limit "
+                    f"{int(controller.limit)} (lowest {int(controller.min_limit_seen)})")
+    batcher = session.batcher
+    if batcher is not None and batcher.batches:
+        logger.info(f"Batching: {batcher.batched_texts} texts summarized in {batcher.batches} batched requests "
+                    f"(saved {batcher.batched_texts - batcher.batches} requests, "
+                    f"{batcher.fallbacks} fell back to single requests)")
+    if session.coalesced or session.near_duplicate_hits:
+        logger.info(f"Deduplication saved {session.coalesced + session.near_duplicate_hits} requests "
+                    f"({session.coalesced} identical texts already in flight, "
+                    f"{session.near_duplicate_hits} near-duplicates)")
+
+async def summarize_annotations(texts, resources: Optional[SharedResources] = None):
+    logger.info(f"Starting concurrent summarization of {len(texts)} texts")
+    if not texts:
+        return []
+
+    async with summarization_session(resources) as session:
+        # Create tasks for each text
+        tasks = []
+        for i, text in enumerate(texts):
+            tasks.append(asyncio.create_task(summarize_single_text(text, i, session)))
+
+        logger.debug("Waiting for all summarizations to complete...")
+        # Wait for all tasks to complete
+        summaries = await asyncio.gather(*tasks)
+
+    logger.info("All summarizations completed")
     return summaries
 
+async def summarize_progressively(entries, writer: ProgressiveMarkdownWriter,
+                                  resources: Optional[SharedResources] = None) -> List[str]:
+    """summarize_annotations() with every summary shown in writer while it arrives.
+
+    entries are (annotation, summary) pairs in document order; summarized
+    highlights whose summary is None are summarized, everything else is
+    written as is. The whole document is on disk before the first request
+    is sent, single requests stream their answers into their place, and
+    writer is flushed every writer.interval seconds while anything changed.
+    Returns the new summaries in order.
+    """
+    slots, texts = [], []
+    for annot, summary in entries:
+        if summary is None and needs_summary(annot):
+            slots.append(writer.pending(annot))
+            texts.append(annot.text)
+        else:
+            writer.write(annot, summary)
+    writer.flush()
+    logger.info(f"Progressive output written with {len(texts)} summaries pending")
+    if not texts:
+        return []
+
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(writer.interval)
+            writer.flush()
+
+    def finished(index, task):
+        if not task.cancelled() and task.exception() is None:
+            writer.update(slots[index], task.result(), final=True)
+
+    async with summarization_session(resources) as session:
+        session.on_partial = lambda index, text: writer.update(slots[index], text)
+        tasks = []
+        for i, text in enumerate(texts):
+            task = asyncio.create_task(summarize_single_text(text, i, session))
+            task.add_done_callback(functools.partial(finished, i))
+            tasks.append(task)
+        flusher = asyncio.create_task(flush_periodically())
+        try:
+            summaries = await asyncio.gather(*tasks)
+        finally:
+            flusher.cancel()
+    writer.flush()
+    logger.info(f"All summarizations completed ({writer.flushes} progressive writes)")
+    return summaries
+
+def needs_summary(annot: Annotation) -> bool:
+    """Plain highlights in one of colors.summary_colors are summarized"""
+    return annot.type == HIGHLIGHT and annot.color in colors_for_summaries
+
 def format_annotations_to_markdown(annotations, summaries):
-    print("\n[INFO] Starting markdown formatting")
-    md_content = "# Annotations\n\n"
-    summary_idx = 0
-    formatted_items = 0
+    logger.info("Starting markdown formatting")
+    # Summaries line up with the annotations for which needs_summary() is true
+    summary_iter = iter(summaries)
+    summary_count = 0
+    parts = [MARKDOWN_HEADER]
     
     for annot in annotations:
-        color_info = f" (Color: {annot['color']})" if 'color' in annot else ""
-        if annot['color'] in colors_for_summaries:  # Check if color is in the list
-            if summary_idx < len(summaries):
-                md_content += f"- **Highlight on Page {annot['page']} (Summarized)**\n"
-                md_content += f"{summaries[summary_idx]}\n\n"
-                summary_idx += 1
-            else:
-                # If for some reason a summary wasn't generated but the color is for summary
-                md_content += f"> {annot['content']} (p. {annot['page']})\n\n"
-        else:
-            if annot['type'] == "Highlight":
-                md_content += f"> {annot['content']} (p. {annot['page']})\n\n"
-            elif annot['type'] == "Highlight Comment":
-                # Assume the format is "Highlighted Text: ...\nComment: ..."
-                lines = annot['content'].splitlines()
-                highlighted = comment = ""
-                for line in lines:
-                    if line.startswith("Highlighted Text:"):
-                        highlighted = line.replace("Highlighted Text:", "").strip()
-                    elif line.startswith("Comment:"):
-                        comment = line.replace("Comment:", "").strip()
-                
-                md_content += f"- {comment}\n\n"
-                md_content += f"> {highlighted} (p. {annot['page']})\n\n"
-            elif annot['type'] == "Note":
-                md_content += f"- **Note on Page {annot['page']}**\n"
-                md_content += f"- {annot['content']}\n\n"
-            elif annot['type'] == "FreeText Comment": # FreeText comments
-                md_content += f"- **Comment on Page {annot['page']}**\n"
-                md_content += f"- {annot['content']}\n\n"
-        formatted_items += 1
+        summary = next(summary_iter, None) if needs_summary(annot) else None
+        if summary is not None:
+            summary_count += 1
+        parts.append(format_annotation_markdown(annot, summary))
     
-    print(f"[INFO] Formatted {formatted_items} annotations with {summary_idx} summaries")
-    return md_content 
+    logger.info(f"Formatted {len(annotations)} annotations with {summary_count} summaries")
+    return "".join(parts)
 
-def _preserve_important_patterns(text):
-    """Extract and temporarily replace important patterns to preserve them"""
-    preservations = {}
-    placeholder_counter = 0
-    
-    # Preserve emails
-    for match in EMAIL_PATTERN.finditer(text):
-        placeholder = f"__PRESERVE_EMAIL_{placeholder_counter}__"
-        preservations[placeholder] = match.group()
-        text = text.replace(match.group(), placeholder)
-        placeholder_counter += 1
-    
-    # Preserve version numbers
-    for match in VERSION_PATTERN.finditer(text):
-        placeholder = f"__PRESERVE_VERSION_{placeholder_counter}__"
-        preservations[placeholder] = match.group()
-        text = text.replace(match.group(), placeholder)
-        placeholder_counter += 1
-    
-    # Preserve file extensions
-    for match in FILE_EXTENSION_PATTERN.finditer(text):
-        placeholder = f"__PRESERVE_FILE_{placeholder_counter}__"
-        preservations[placeholder] = match.group()
-        text = text.replace(match.group(), placeholder)
-        placeholder_counter += 1
-    
-    return text, preservations
+def document_writers(pdf_path, export_formats, title, sha256=None):
+    """Writers for the output.exports files and, with index.enabled, the library index"""
+    yield from open_export_writers(pdf_path, export_formats)
+    index = get_annotation_index()
+    if index is not None:
+        yield index.writer(pdf_path, title, sha256)
 
-def _restore_important_patterns(text, preservations):
-    """Restore the preserved patterns"""
-    for placeholder, original in preservations.items():
-        text = text.replace(placeholder, original)
-    return text
+def export_annotations(annotations, summaries, writers):
+    """Feed every annotation with its summary to the writers in one pass"""
+    summary_iter = iter(summaries)
+    with contextlib.ExitStack() as stack:
+        writers = [stack.enter_context(writer) for writer in writers]
+        for annot in annotations:
+            summary = next(summary_iter, None) if needs_summary(annot) else None
+            for writer in writers:
+                writer.write(annot, summary)
+    for writer in writers:
+        logger.info(f"Exported {writer.rows} annotations to: {writer.path}")
 
-def _is_common_abbreviation(text_part):
-    """Check if a spaced text could be a common abbreviation"""
-    # Remove spaces and check if it's in our abbreviation list
-    cleaned = text_part.replace(' ', '').lower()
-    return cleaned in COMMON_ABBREVIATIONS
+def get_text_cleaner() -> TextCleaner:
+    """Return the process-wide TextCleaner, configured from config.yaml on first use"""
+    global text_cleaner
+    if text_cleaner is None:
+        text_cleaner = TextCleaner(
+            memo_size=config.get('processing', {}).get('clean_memo_size', 4096),
+            verbose=logging.getLogger("pdfextractor.text_cleaner").isEnabledFor(logging.DEBUG))
+    return text_cleaner
 
 def clean_text(text):
     """Optimized text cleaning with better preservation of legitimate content"""
-    if not text:
-        return ""
-    
-    original_text = text
-    original_length = len(text)
-    
-    try:
-        # Step 1: Preserve important patterns (emails, versions, files)
-        text, preservations = _preserve_important_patterns(text)
-        
-        # Step 2: Normalize whitespace (tabs, newlines -> single space)
-        text = WHITESPACE_PATTERN.sub(' ', text)
-        
-        # Step 3: Smart line-break hyphen handling
-        # Conservative approach: only join obvious line breaks
-        def smart_line_break_hyphen_join(match):
-            word1, word2 = match.groups()
-            
-            # Always keep very short words (x-ray, a-b, etc.)
-            if len(word1) <= 2 or len(word2) <= 2:
-                return f"{word1}-{word2}"
-            
-            # Join if second part starts with lowercase (clear continuation)
-            if word2[0].islower():
-                return word1 + word2
-            
-            # Join only very obvious prefix patterns that rarely occur as compounds
-            obvious_prefixes = {'pre', 'anti', 'auto', 'semi', 'inter', 'intra', 'super', 'sub'}
-            if word1.lower() in obvious_prefixes:
-                return word1 + word2
-                
-            # Join clear suffix patterns (broken word endings)
-            clear_suffixes = {'ing', 'ed', 'tion', 'sion', 'ment', 'ness', 'able', 'ible'}
-            if any(word2.lower().startswith(suffix) for suffix in clear_suffixes):
-                return word1 + word2
-            
-            # Join very long combinations (definitely broken words)
-            if len(word1) + len(word2) > 15:  # Raised threshold
-                return word1 + word2
-            
-            # Default: preserve hyphen (safer for compound words)
-            return f"{word1}-{word2}"
-        
-        text = LINE_BREAK_HYPHEN_PATTERN.sub(smart_line_break_hyphen_join, text)
-        
-        # Step 4: Smart OCR noise removal with abbreviation preservation
-        # First, preserve known abbreviations before applying OCR removal
-        spaced_abbrevs = {}
-        abbrev_counter = 0
-        
-        # Look for spaced patterns that might be abbreviations
-        spaced_pattern = re.compile(r'\b([A-Z])\s+([A-Z])\s+([A-Z])(?:\s+[A-Z])*\b')
-        for match in spaced_pattern.finditer(text):
-            candidate = match.group(0)
-            if _is_common_abbreviation(candidate):
-                placeholder = f"__ABBREV_{abbrev_counter}__"
-                spaced_abbrevs[placeholder] = candidate.replace(' ', '')  # Remove spaces
-                text = text.replace(candidate, placeholder)
-                abbrev_counter += 1
-        
-        # Now apply OCR noise removal
-        text = OCR_NOISE_PATTERN.sub(' ', text)
-        
-        # Restore abbreviations
-        for placeholder, abbrev in spaced_abbrevs.items():
-            text = text.replace(placeholder, abbrev)
-        
-        # Step 5: Remove obvious single character noise more conservatively
-        # Only remove when there are multiple consecutive single chars
-        text = SINGLE_CHAR_NOISE_PATTERN.sub(' ', text)
-        
-        # Step 6: Smart punctuation spacing - only where needed
-        text = SMART_PUNCT_PATTERN.sub(r'\1 \2', text)
-        
-        # Step 7: Remove isolated special characters (but not in preserved patterns)
-        text = ISOLATED_SPECIAL_PATTERN.sub(' ', text)
-        
-        # Step 8: Final whitespace cleanup
-        text = EXTRA_SPACES_PATTERN.sub(' ', text).strip()
-        
-        # Step 9: Restore preserved patterns
-        text = _restore_important_patterns(text, preservations)
-        
-        final_length = len(text)
-        
-        # Enhanced validation and logging
-        reduction_ratio = final_length / original_length if original_length > 0 else 1
-        
-        if reduction_ratio < 0.3 and original_length > 50:
-            print(f"[WARNING] Aggressive text reduction: {original_length} -> {final_length} chars (ratio: {reduction_ratio:.2f})")
-            print(f"[WARNING] Original excerpt: '{original_text[:100]}...'")
-            print(f"[WARNING] Cleaned excerpt: '{text[:100]}...'")
-            # Could optionally return original text or apply gentler cleaning
-        elif original_length > 20:
-            print(f"[DEBUG] Text cleaned: {original_length} -> {final_length} chars (ratio: {reduction_ratio:.2f})")
-        
-        return text
-        
-    except Exception as e:
-        print(f"[ERROR] Text cleaning failed: {e}")
-        print(f"[ERROR] Problematic text: '{original_text[:100]}...'")
-        return original_text  # Return original text if cleaning fails
+    return get_text_cleaner().clean(text)
 
-def extract_and_format_metadata(pdf_path):
-    """
-    Extracts the title from a PDF file and formats it as "TITLE: {Title of Paper}".
-    """
-    logging.info(f"\nExtracting title from: {pdf_path}")
+def extract_pdf_title(pdf_path) -> str:
+    """Title from the PDF metadata ("" if there is none); pdf_path may be a DocumentSession"""
+    name = pdf_path.name if isinstance(pdf_path, DocumentSession) else pdf_path
+    logger.info(f"Extracting title from: {name}")
     title = ""
     try:
-        doc = fitz.open(pdf_path)
-        raw_metadata = doc.metadata
-        doc.close()
+        with open_document(pdf_path) as document:
+            raw_metadata = document.metadata
 
         if raw_metadata and 'title' in raw_metadata and raw_metadata['title']:
             title = raw_metadata['title'].strip()
 
     except fitz.FileDataError as e:
-        logging.error(f"Could not open PDF for title extraction {pdf_path}: {e}")
+        logger.error(f"Could not open PDF for title extraction {name}: {e}")
     except Exception as e:
-        logging.error(f"An error occurred during title extraction from {pdf_path}: {e}")
+        logger.error(f"An error occurred during title extraction from {name}: {e}")
     
     if title:
-        logging.info(f"Title extracted: {title}")
+        logger.info(f"Title extracted: {title}")
+    else:
+        logger.warning(f"No title found or extracted for {name}.")
+    return title
+
+def format_metadata(title) -> str:
+    """Front matter block "TITLE: {Title of Paper}" for the markdown ("" without a title)"""
+    if title:
         yaml_block = "---\n"
         yaml_block += yaml.dump({"TITLE": title}, allow_unicode=True, default_flow_style=False, sort_keys=False)
         yaml_block += "---\n\n"
         return yaml_block
+    return ""
+
+async def extract_and_summarize(pdf_path, start_page, page_numbers=None,
+                                resources: Optional[SharedResources] = None):
+    """Extract annotations and summarize them in one overlapped pipeline.
+
+    Extraction runs in a worker thread and hands each finished page to the
+    event loop; summary-colored highlights go straight into an asyncio queue
+    that summarization workers consume while later pages are still being
+    scanned. Returns (annotations, summaries) with summaries in document order.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    summaries = []  # filled by index, so order never depends on completion order
+    timings = {'first_request': None, 'last_summary': None}
+
+    def enqueue(texts):
+        # Runs on the event loop thread
+        for text in texts:
+            queue.put_nowait((len(summaries), text))
+            summaries.append(None)
+
+    def on_annotations(page_annotations):
+        # Runs on the extraction thread
+        texts = [annot.text for annot in page_annotations if needs_summary(annot)]
+        if texts:
+            loop.call_soon_threadsafe(enqueue, texts)
+
+    async with contextlib.AsyncExitStack() as stack:
+        session = None
+        session_lock = asyncio.Lock()
+
+        async def get_session():
+            # The API client is only opened once there is something to summarize
+            nonlocal session
+            async with session_lock:
+                if session is None:
+                    session = await stack.enter_async_context(summarization_session(resources))
+            return session
+
+        async def summarize_worker():
+            while True:
+                index, text = await queue.get()
+                if index is None:
+                    return
+                if timings['first_request'] is None:
+                    timings['first_request'] = time.perf_counter()
+                summaries[index] = await summarize_single_text(text, index, await get_session())
+                timings['last_summary'] = time.perf_counter()
+
+        api_config = config.get('api', {})
+        worker_count = api_config.get('max_concurrency', 8)
+        if api_config.get('batching', {}).get('enabled', False):
+            # Each worker waits on one text, so enough of them to fill every batch
+            worker_count *= max(1, api_config['batching'].get('max_items', 10))
+        workers = [asyncio.create_task(summarize_worker()) for _ in range(worker_count)]
+        started = time.perf_counter()
+        try:
+            annotations, _ = await loop.run_in_executor(
+                None, functools.partial(extract_annotations, pdf_path, start_page, page_numbers, on_annotations,
+                                        resources.page_pool if resources else None))
+            # Page callbacks were scheduled before the executor future resolved,
+            # so every highlight is queued by now.
+            extraction_done = time.perf_counter()
+            logger.info(f"Found {len(summaries)} texts to summarize")
+        finally:
+            for _ in workers:
+                queue.put_nowait((None, None))
+            await asyncio.gather(*workers)
+        finished = time.perf_counter()
+
+    if summaries:
+        extraction_seconds = extraction_done - started
+        summary_seconds = timings['last_summary'] - timings['first_request']
+        logger.info(f"Pipeline: extraction {extraction_seconds:.2f}s, summarization {summary_seconds:.2f}s, "
+                    f"end-to-end {finished - started:.2f}s (sequential: {extraction_seconds + summary_seconds:.2f}s)")
+    return annotations, summaries
+
+def iter_annotations(pdf_path, start_page, clean=True):
+    """Yield annotations in page order, loading one page at a time.
+
+    Only the current page is alive at any moment, so memory stays flat no
+    matter how many pages the document has. clean=False leaves highlight
+    texts uncleaned (see process_single_page).
+    """
+    with open_document(pdf_path) as document:
+        doc = document.doc
+        page_numbers = range(len(doc))
+        if config.get('processing', {}).get('annotation_prescan', True):
+            page_numbers = _prescan_pages(doc, page_numbers,
+                                          config.get('processing', {}).get('prescan_subtypes', True))
+        for page_num in page_numbers:
+            try:
+                page = doc.load_page(page_num)
+            except Exception as e:
+                logger.error(f"Could not load page {page_num}: {e}")
+                continue
+            annotations, _ = process_single_page((page_num, page, start_page), clean)
+            del page
+            yield from annotations
+
+async def stream_document(pdf_path, start_page, output_file, metadata_yaml, extra_writers=(),
+                          resources: Optional[SharedResources] = None):
+    """Extract and write markdown (and extra_writers) incrementally with bounded memory.
+
+    Annotations queue up in document order and are flushed to the writers as
+    soon as everything before them is ready; summarized highlights hold their
+    place until their summary arrives. The number of outstanding summaries is
+    capped, which bounds the queue.
+    """
+    max_pending = max(1, config.get('processing', {}).get('stream_max_pending',
+                                                          4 * config.get('api', {}).get('max_concurrency', 8)))
+    buffer_size = config.get('processing', {}).get('stream_buffer_kb', 64) * 1024
+    pending = collections.deque()  # (annotation, summary task or None)
+    pending_summaries = 0
+    stats = {'annotations': 0, 'summaries': 0, 'highlight_colors': set()}
+
+    def flush_ready(writers):
+        nonlocal pending_summaries
+        while pending:
+            annot, task = pending[0]
+            if task is not None and not task.done():
+                break
+            pending.popleft()
+            summary = None
+            if task is not None:
+                summary = task.result()
+                pending_summaries -= 1
+            for writer in writers:
+                writer.write(annot, summary)
+
+    async with contextlib.AsyncExitStack() as stack:
+        name = pdf_path.name if isinstance(pdf_path, DocumentSession) else pdf_path
+        writers = [stack.enter_context(MarkdownWriter(output_file, os.path.basename(name), metadata_yaml,
+                                                      buffer_size))]
+        writers.extend(stack.enter_context(writer) for writer in extra_writers)
+        session = None
+        for annot in iter_annotations(pdf_path, start_page):
+            stats['annotations'] += 1
+            if annot.is_highlight:
+                stats['highlight_colors'].add(annot.color)
+
+            task = None
+            if needs_summary(annot):
+                if session is None:
+                    session = await stack.enter_async_context(summarization_session(resources))
+                task = asyncio.create_task(summarize_single_text(annot.text, stats['summaries'], session))
+                stats['summaries'] += 1
+                pending_summaries += 1
+            pending.append((annot, task))
+
+            # Let in-flight requests make progress, and wait for the oldest one
+            # when too many summaries are outstanding.
+            await asyncio.sleep(0)
+            flush_ready(writers)
+            while pending_summaries >= max_pending:
+                await pending[0][1]  # after a flush the head is always an unfinished summary
+                flush_ready(writers)
+
+        while pending:
+            if pending[0][1] is not None:
+                await pending[0][1]
+            flush_ready(writers)
+
+    logger.info(f"Streamed {stats['annotations']} annotations with {stats['summaries']} summaries")
+    return stats
+
+def is_summary_failure(summary: str) -> bool:
+    return summary.startswith("Summary not available")
+
+async def process_document(pdf_path, start_page, incremental=None, resources: Optional[SharedResources] = None):
+    """Extract, summarize and export the annotations of one PDF.
+
+    In incremental mode (processing.incremental) a sidecar state file lets
+    unchanged documents be skipped and only changed pages be re-extracted.
+    In streaming mode (processing.streaming) markdown is written as pages are
+    processed instead. In progressive mode (processing.progressive) it is
+    written right after extraction, with summaries filling in as they arrive.
+    pdf_path is a path or a DocumentSession; either way the PDF is opened
+    once for metadata, fingerprints and extraction. PDFs without a file
+    (read from stdin) are written next to their name and never incremental.
+    resources carries what the calling mode keeps open across documents.
+    Returns a dict of run statistics; errors propagate to the caller.
+    """
+    with open_document(pdf_path) as document:
+        return await _process_document(document, start_page, incremental, resources or SharedResources())
+
+async def _process_document(document: DocumentSession, start_page, incremental, resources: SharedResources):
+    started = time.perf_counter()
+    pdf_path = document.path or document.name
+    if incremental is None:
+        incremental = config.get('processing', {}).get('incremental', True)
+    if document.path is None:
+        incremental = False  # no file to keep a sidecar state for
+    output_file = os.path.splitext(pdf_path)[0] + " (annotations).md"
+    export_formats = config.get('output', {}).get('exports', [])
+
+    if config.get('processing', {}).get('streaming', False):
+        # The incremental state holds every annotation in memory, which is what
+        # streaming avoids; streamed documents are always processed in full.
+        title = extract_pdf_title(document)
+        with metrics.stage('stream'):
+            stats = await stream_document(document, start_page, output_file, format_metadata(title),
+                                          document_writers(pdf_path, export_formats, title), resources)
+        logger.info(f"Annotations exported to: {output_file}")
+        metrics.inc('documents_total', status="streamed")
+        return dict(stats, output_file=output_file, exports=[export_path(pdf_path, fmt) for fmt in export_formats],
+                    skipped=False)
+    state_path = annotation_state.state_path_for(pdf_path)
+    if summarizer_backend() == 'extractive':
+        model, prompt = summary_settings()
+    else:
+        model = config.get('api', {}).get('model', 'gpt-4')
+        prompt = config.get('prompts', {}).get('summarization', '')
+    options = annotation_state.options_fingerprint(
+        start_page=start_page,
+        summary_colors=colors_for_summaries,
+        model=model,
+        prompt=prompt,
+        **extraction_options(),
+    )
+
+    state = annotation_state.load_state(state_path) if incremental else None
+    if state and state.get('options') != options:
+        logger.info("Settings changed since the last run, re-extracting all pages")
+        state = None
+    file_fingerprint = document.fingerprint(state and state.get('file'))
+
+    if (state and state.get('file', {}).get('sha256') == file_fingerprint['sha256']
+            and all(page['fingerprint'] for page in state['pages'].values())
+            and os.path.exists(output_file)
+            and all(os.path.exists(export_path(pdf_path, fmt)) for fmt in export_formats)):
+        logger.info(f"Unchanged since the last run, skipping: {pdf_path}")
+        metrics.inc('documents_total', status="unchanged")
+        stored_pages = state['pages'].values()
+        index = get_annotation_index()
+        if index is not None and index.indexed_sha256(pdf_path) != file_fingerprint['sha256']:
+            # Indexing was enabled after the last run, or the index was rebuilt
+            with metrics.stage('index'):
+                export_annotations([annot for page in stored_pages for annot in page['annotations']],
+                                   [summary for page in stored_pages for summary in page['summaries']],
+                                   [index.writer(pdf_path, extract_pdf_title(document), file_fingerprint['sha256'])])
+        return {
+            'output_file': output_file,
+            'exports': [export_path(pdf_path, fmt) for fmt in export_formats],
+            'annotations': sum(len(page['annotations']) for page in stored_pages),
+            'summaries': sum(len(page['summaries']) for page in stored_pages),
+            'highlight_colors': {c for page in stored_pages for c in page['highlight_colors']},
+            'skipped': True,
+        }
+
+    title = extract_pdf_title(document)
+    metadata_yaml = format_metadata(title)
+
+    # Decide which pages need work by comparing per-page annotation fingerprints
+    with metrics.stage('fingerprint'):
+        page_fingerprints = annotation_state.page_annotation_fingerprints(document.doc)
+    stored_pages = state['pages'] if state else {}
+    changed_pages = [page_num for page_num, fingerprint in enumerate(page_fingerprints)
+                     if fingerprint and stored_pages.get(str(page_num), {}).get('fingerprint') != fingerprint]
+    if state:
+        logger.info(f"Incremental run: {len(changed_pages)} of {len(page_fingerprints)} pages changed")
+
+    progressive_writer = None
+    if not changed_pages:
+        annotations, summaries = [], []
+    elif config.get('processing', {}).get('progressive', False):
+        # Extract first, so the whole document can be written before any summary
+        annotations, _ = extract_annotations(document, start_page, changed_pages, page_pool=resources.page_pool)
+        fresh_entries = collections.defaultdict(list)
+        for annot in annotations:
+            fresh_entries[annot.page - start_page].append((annot, None))
+        entries = []
+        changed = set(changed_pages)
+        for page_num, fingerprint in enumerate(page_fingerprints):
+            if not fingerprint:
+                continue
+            if page_num in changed:
+                entries.extend(fresh_entries[page_num])
+            else:
+                page = stored_pages[str(page_num)]
+                summary_iter = iter(page['summaries'])
+                entries.extend((annot, next(summary_iter) if needs_summary(annot) else None)
+                               for annot in page['annotations'])
+        progressive_writer = ProgressiveMarkdownWriter(
+            output_file, os.path.basename(pdf_path), metadata_yaml,
+            config.get('processing', {}).get('progressive_interval', 0.25))
+        with metrics.stage('summarize'), progressive_writer:
+            summaries = await summarize_progressively(entries, progressive_writer, resources)
+    elif (config.get('processing', {}).get('overlap_summaries', True)
+          and summarizer_backend() != 'extractive'):
+        # Local summaries take milliseconds, so overlapping them with extraction
+        # gains nothing; summarizing all highlights together scores them in one pass
+        # Extraction runs on a worker thread inside this stage; its own 'extract'
+        # stage is timed, but only this one is profiled
+        with metrics.stage('extract_and_summarize'):
+            annotations, summaries = await extract_and_summarize(document, start_page, changed_pages, resources)
     else:
-        logging.warning(f"No title found or extracted for {pdf_path}.")
-        return ""
+        annotations, _ = extract_annotations(document, start_page, changed_pages, page_pool=resources.page_pool)
+        highlight_texts = [annot.text for annot in annotations if needs_summary(annot)]
+        logger.info(f"Found {len(highlight_texts)} texts to summarize")
+        
+        with metrics.stage('summarize'):
+            summaries = await summarize_annotations(highlight_texts, resources)
+
+    # Regroup the fresh results by page, then merge them with the reused pages
+    fresh_pages = {page_num: {'annotations': [], 'summaries': [], 'highlight_colors': []}
+                   for page_num in changed_pages}
+    summary_iter = iter(summaries)
+    for annot in annotations:
+        page = fresh_pages[annot.page - start_page]
+        page['annotations'].append(annot)
+        if needs_summary(annot):
+            page['summaries'].append(next(summary_iter))
+        if annot.is_highlight and annot.color not in page['highlight_colors']:
+            page['highlight_colors'].append(annot.color)
+
+    pages = {}
+    for page_num, fingerprint in enumerate(page_fingerprints):
+        if not fingerprint:
+            continue
+        page = fresh_pages.get(page_num) or stored_pages[str(page_num)]
+        # Pages whose summaries failed are not fingerprinted, so the next run retries them
+        failed = any(is_summary_failure(summary) for summary in page['summaries'])
+        pages[str(page_num)] = dict(page, fingerprint=None if failed else fingerprint)
 
-async def main(pdf_path, start_page):
-    print("\n[INFO] Starting PDF annotation extraction and summarization")
-    print(f"[INFO] Processing file: {pdf_path}")
-    print(f"[INFO] Using start page number: {start_page}")
+    all_annotations = [annot for page in pages.values() for annot in page['annotations']]
+    all_summaries = [summary for page in pages.values() for summary in page['summaries']]
+    used_highlight_colors = {c for page in pages.values() for c in page['highlight_colors']}
     
+    if progressive_writer is None:
+        with metrics.stage('format'):
+            annotations_markdown = format_annotations_to_markdown(all_annotations, all_summaries)
+
+        final_markdown_content = metadata_yaml + annotations_markdown
+
+        with metrics.stage('write'), open(output_file, "w", encoding="utf-8") as f:
+            f.write(final_markdown_content)
+    # Progressive output is complete once its last summary is in: it holds the
+    # same annotations, in the same order, as the merged pages
+    complete_seconds = time.perf_counter() - started
+    first_byte_seconds = (progressive_writer.first_flush_at - started if progressive_writer is not None
+                          else complete_seconds)
+    metrics.observe('output_first_byte_seconds', first_byte_seconds)
+    metrics.observe('output_complete_seconds', complete_seconds)
+    
+    logger.info(f"Annotations exported to: {output_file}")
+    if export_formats or get_annotation_index() is not None:
+        with metrics.stage('export'):
+            export_annotations(all_annotations, all_summaries,
+                               document_writers(pdf_path, export_formats, title, file_fingerprint['sha256']))
+    if incremental:
+        annotation_state.save_state(state_path, {
+            'options': options,
+            'file': file_fingerprint,
+            'pages': pages,
+        })
+    metrics.inc('documents_total', status="processed")
+    return {
+        'output_file': output_file,
+        'exports': [export_path(pdf_path, fmt) for fmt in export_formats],
+        'annotations': len(all_annotations),
+        'summaries': len(all_summaries),
+        'highlight_colors': used_highlight_colors,
+        'skipped': False,
+        'first_byte_seconds': first_byte_seconds,
+        'complete_seconds': complete_seconds,
+    }
+
+def start_profiling(subdirectory=None):
+    """Enable per-stage cProfile/tracemalloc if metrics.profile_dir is set (--profile)"""
+    profile_dir = config.get('metrics', {}).get('profile_dir')
+    if profile_dir:
+        profile_dir = os.path.expanduser(profile_dir)
+        metrics.enable_profiling(os.path.join(profile_dir, subdirectory) if subdirectory else profile_dir)
+
+def export_run_metrics():
+    """Write this run's metrics to metrics.export_path and any profiling reports.
+
+    The export path may contain strftime fields, e.g. "metrics/run-%Y%m%d-%H%M%S.prom",
+    to keep one file per run.
+    """
+    metrics_config = config.get('metrics', {})
+    export_path = metrics_config.get('export_path')
+    if export_path:
+        export_path = time.strftime(os.path.expanduser(export_path))
+        try:
+            metrics.registry.export(export_path)
+            logger.info(f"Metrics written to {export_path}")
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {export_path}: {e}")
+    for path in metrics.write_profiles():
+        logger.debug(f"Profile written: {path}")
+    if metrics.profiler is not None:
+        logger.info(f"Profiling reports written to {metrics.profiler.directory}")
+
+def document_io_line(input_mode=None) -> str:
+    """Run report line for PDF opens and input bytes (document_session metrics)"""
+    opens = int(metrics.registry.counter_value('document_opens_total'))
+    read_bytes = metrics.registry.counter_value('document_input_bytes_total')
+    return (f"Document I/O: {opens} PDF open{'s' if opens != 1 else ''}, {read_bytes / 1e6:.2f} MB read "
+            f"(input: {input_mode or document_input()})")
+
+async def main(pdf_path, start_page, overrides=None, document_name=None):
+    """Process one PDF; pdf_path "-" reads it from stdin, named document_name"""
     # Load configuration and setup
     try:
-        load_config()
+        load_config(overrides)
     except Exception as e:
-        print(f"[ERROR] Configuration failed: {e}")
+        logger.error(f"Configuration failed: {e}")
         sys.exit(1)
+
+    logger.info("Starting PDF annotation extraction and summarization")
+    logger.info(f"Processing file: {pdf_path}")
+    logger.info(f"Using start page number: {start_page}")
+    start_profiling()
     
-    if not os.path.isfile(pdf_path):
-        print(f"[ERROR] File not found: {pdf_path}")
+    if pdf_path == '-':
+        # PDF bytes from a pipe: kept in memory, no temporary file
+        pdf_path = DocumentSession.from_stream(sys.stdin.buffer, document_name or "stdin.pdf")
+        if not pdf_path.data:
+            logger.error("No PDF data on stdin")
+            sys.exit(1)
+    elif not os.path.isfile(pdf_path):
+        logger.error(f"File not found: {pdf_path}")
         sys.exit(1)
 
-    used_highlight_colors = set()
     try:
-        metadata_yaml = extract_and_format_metadata(pdf_path)
-        annotations, used_highlight_colors = extract_annotations(pdf_path, start_page)
-        highlight_texts = [annot['content'] for annot in annotations if annot['color'] in colors_for_summaries and annot['type'] == "Highlight"]
-        print(f"\nFound {len(highlight_texts)} texts to summarize") 
-        
-        summaries = await summarize_annotations(highlight_texts) 
-        
-        annotations_markdown = format_annotations_to_markdown(annotations, summaries)
-        
-        final_markdown_content = metadata_yaml + annotations_markdown
-        
-        output_file = os.path.splitext(pdf_path)[0] + " (annotations).md"
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(final_markdown_content)
-        
-        print(f"\nAnnotations exported to: {output_file}")
-        print(f"[INFO] API cache hits: {len([k for k in api_cache.keys()])} cached responses")
+        result = await process_document(pdf_path, start_page)
+        if summary_cache is not None:  # not opened when nothing was summarized
+            logger.info(summary_cache.stats_line())
+        logger.info(document_io_line(pdf_path.input_mode if isinstance(pdf_path, DocumentSession) else None))
+        if 'first_byte_seconds' in result:
+            logger.info(f"Output: first byte after {result['first_byte_seconds']:.2f}s, "
+                        f"complete after {result['complete_seconds']:.2f}s")
         
+        used_highlight_colors = result['highlight_colors']
         if used_highlight_colors:
-            print(f"[INFO] All unique highlight colors used: {', '.join(sorted(list(used_highlight_colors)))}")
+            logger.info(f"All unique highlight colors used: {', '.join(sorted(list(used_highlight_colors)))}")
         else:
-            print("[INFO] No highlight colors were found.")
+            logger.info("No highlight colors were found.")
         
     except ValueError as ve:
-        print(f"Configuration Error: {str(ve)}")
+        logger.error(f"Configuration Error: {str(ve)}")
         sys.exit(1)
     except Exception as e:
-        print(f"An error occurred during processing: {str(e)}")
+        logger.error(f"An error occurred during processing: {str(e)}")
         sys.exit(1)
+    finally:
+        close_summary_cache()
+        close_annotation_index()
+        export_run_metrics()
+
+# ---------------------------------------------------------------------------
+# Library search
+# ---------------------------------------------------------------------------
+
+def open_library_index() -> AnnotationIndex:
+    """Open the configured index for querying, whether or not index.enabled is set"""
+    path = os.path.expanduser(config.get('index', {}).get('path', DEFAULT_INDEX_PATH))
+    if not os.path.exists(path):
+        logger.error(f"No library index at {path}; process PDFs with --index (or index.enabled) first")
+        sys.exit(1)
+    return AnnotationIndex(path)
+
+def search_library(query, limit=20, color=None, annotation_type=None, overrides=None) -> int:
+    """Print the best-ranked annotations for query from the library index; returns the hit count"""
+    load_config(overrides)
+    index = open_library_index()
+    try:
+        started = time.perf_counter()
+        hits = index.search(query, limit=limit, color=color, annotation_type=annotation_type)
+        elapsed = time.perf_counter() - started
+        documents, annotations = index.counts()
+    finally:
+        index.close()
+    for rank, hit in enumerate(hits, 1):
+        title = f"{hit.title} — " if hit.title else ""
+        print(f"{rank}. {title}{hit.path}, p. {hit.page} ({hit.type}, {hit.color})")
+        print(f"   {hit.snippet}")
+    logger.info(f"{len(hits)} hits in {elapsed * 1000:.1f} ms "
+                f"({annotations} annotations from {documents} documents indexed)")
+    return len(hits)
+
+def prune_library_index(overrides=None) -> int:
+    """Remove documents whose PDF no longer exists from the library index"""
+    load_config(overrides)
+    index = open_library_index()
+    try:
+        removed = index.remove_missing()
+    finally:
+        index.close()
+    logger.info(f"Removed {removed} missing documents from the library index")
+    return removed
 
 if __name__ == "__main__":
+    # The mode drivers (batch_mode, bulk_jobs, watch_mode) import this script as
+    # extract_annotations; give them this module rather than a second copy with
+    # its own config and caches
+    sys.modules.setdefault('extract_annotations', sys.modules[__name__])
+
     parser = argparse.ArgumentParser(description='Extract and summarize PDF annotations')
-    parser.add_argument('pdf_path', help='Path to the PDF file')
+    parser.add_argument('pdf_path', nargs='*',
+                        help='Path to the PDF file, or - to read it from stdin '
+                             '(with --batch: PDF files, directories or glob patterns)')
     parser.add_argument('--start-page', type=int, default=1, 
                       help='Starting page number (default: 1)')
+    parser.add_argument('--name', metavar='FILENAME',
+                        help='File name of a PDF read from stdin; outputs are written next to it (default: stdin.pdf)')
+    parser.add_argument('--input', choices=INPUT_MODES,
+                        help='How PDF files are read (default: processing.document_input, file)')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the incremental state file and re-extract every page')
+    parser.add_argument('--no-summaries', action='store_true',
+                        help='Extract annotations only: no summaries, no API key or network access needed')
+    parser.add_argument('--summarizer', choices=SUMMARIZER_BACKENDS,
+                        help='Summarizer backend (default: summarizer.backend); extractive needs no network access')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write markdown while pages are processed, with bounded memory')
+    parser.add_argument('--progressive', action='store_true',
+                        help='Write markdown right after extraction and fill in summaries as they stream in')
+    parser.add_argument('--export', metavar='FORMATS',
+                        help='Also export the annotations as jsonl, csv and/or sqlite (comma-separated)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='Write run metrics to PATH (Prometheus text for *.prom, JSON otherwise)')
+    parser.add_argument('--profile', metavar='DIR',
+                        help='Write cProfile and tracemalloc reports for each stage to DIR')
+    batch_group = parser.add_argument_group('batch mode')
+    batch_group.add_argument('--batch', action='store_true',
+                             help='Process many PDFs in a process pool with a shared API budget')
+    batch_group.add_argument('--file-list', help='Text file listing one PDF path per line')
+    batch_group.add_argument('--manifest', help='YAML file mapping PDF paths to start pages')
+    batch_group.add_argument('--journal', help='Progress journal (JSONL); completed PDFs are skipped on re-run')
+    batch_group.add_argument('--workers', type=int,
+                             help='Number of worker processes (default: processing.batch_workers or CPU count)')
+    batch_group.add_argument('--corpus', action='store_true',
+                             help='Throughput mode for many CPU-bound PDFs: clean the highlight texts of all '
+                                  'documents in a process pool, in large batches')
+    batch_group.add_argument('--text-batch-size', type=int,
+                             help='With --corpus: texts per worker task (default: processing.corpus_batch_size)')
+    bulk_group = parser.add_argument_group('bulk mode')
+    bulk_group.add_argument('--bulk', choices=['prepare', 'submit', 'poll', 'ingest'],
+                            help='Summarize through batch-job files: prepare requests (from PDF paths, '
+                                 '--file-list or --manifest), submit them, poll for results, ingest and render')
+    bulk_group.add_argument('--job', metavar='DIR', help='Bulk job directory')
+    bulk_group.add_argument('--results', metavar='FILE',
+                            help='With --bulk ingest: results file to load (default: the job\'s results.jsonl)')
+    bulk_group.add_argument('--wait', action='store_true',
+                            help='With --bulk poll: keep polling until the batch is done')
+    watch_group = parser.add_argument_group('watch mode')
+    watch_group.add_argument('--watch', action='store_true',
+                             help='Stay resident and process PDFs below the given directories whenever they change')
+    watch_group.add_argument('--submit', action='store_true',
+                             help='Hand the given PDFs to a running --watch instance')
+    watch_group.add_argument('--socket', help='Socket of the --watch instance (default: watch.socket)')
+    index_group = parser.add_argument_group('library index')
+    index_group.add_argument('--index', action='store_true',
+                             help='Add the processed PDFs to the full-text library index (same as index.enabled)')
+    index_group.add_argument('--search', metavar='QUERY',
+                             help='Search the annotations of all indexed PDFs (FTS5 syntax or plain words)')
+    index_group.add_argument('--limit', type=int, default=20, help='Maximum number of search hits (default: 20)')
+    index_group.add_argument('--color', help='Only return annotations in this color, e.g. "#ffd400"')
+    index_group.add_argument('--type', dest='annotation_type',
+                             choices=[HIGHLIGHT, HIGHLIGHT_COMMENT, NOTE, FREETEXT_COMMENT],
+                             help='Only return annotations of this type')
+    index_group.add_argument('--prune-index', action='store_true',
+                             help='Remove PDFs that no longer exist from the library index')
     
     args = parser.parse_args()
+
+    overrides = {'processing': {}}
+    if args.full:
+        overrides['processing']['incremental'] = False
+    if args.stream:
+        overrides['processing']['streaming'] = True
+    if args.progressive:
+        overrides['processing']['progressive'] = True
+    if args.no_summaries:
+        overrides['processing']['summaries'] = False
+    if args.input:
+        overrides['processing']['document_input'] = args.input
+    if args.summarizer:
+        overrides['summarizer'] = {'backend': args.summarizer}
+    if args.metrics or args.profile:
+        overrides['metrics'] = {}
+        if args.metrics:
+            overrides['metrics']['export_path'] = args.metrics
+        if args.profile:
+            overrides['metrics']['profile_dir'] = args.profile
+    if args.export:
+        overrides['output'] = {'exports': args.export.split(',')}
+    if args.socket:
+        overrides['watch'] = {'socket': args.socket}
+    if args.index:
+        overrides['index'] = {'enabled': True}
     
-    print("[INFO] Starting annotation extraction script")
-    asyncio.run(main(args.pdf_path, args.start_page))
-    print("[INFO] Script execution completed")
\ No newline at end of file
+    if args.search is not None or args.prune_index:
+        if args.prune_index:
+            prune_library_index(overrides)
+        if args.search is not None:
+            search_library(args.search, args.limit, args.color, args.annotation_type, overrides)
+    elif args.bulk:
+        from bulk_jobs import bulk_ingest, bulk_poll, bulk_prepare, bulk_submit
+        if not args.job:
+            parser.error('--bulk needs --job DIR')
+        if args.bulk == 'prepare':
+            if not args.pdf_path and not args.file_list and not args.manifest:
+                parser.error('--bulk prepare needs at least one path, directory, glob, --file-list or --manifest')
+            bulk_prepare(args.job, args.pdf_path, file_list=args.file_list,
+                         manifest=args.manifest, start_page=args.start_page, overrides=overrides)
+        elif args.bulk == 'submit':
+            asyncio.run(bulk_submit(args.job, overrides))
+        elif args.bulk == 'poll':
+            asyncio.run(bulk_poll(args.job, args.wait, overrides))
+        else:
+            asyncio.run(bulk_ingest(args.job, args.results, overrides))
+        export_run_metrics()
+    elif args.watch:
+        from watch_mode import watch
+        asyncio.run(watch(args.pdf_path, args.start_page, overrides))
+    elif args.submit:
+        from watch_mode import submit_to_instance
+        if not args.pdf_path:
+            parser.error('--submit needs at least one PDF path')
+        if not submit_to_instance(args.pdf_path, args.start_page, args.full, overrides):
+            sys.exit(1)
+    elif args.corpus:
+        from batch_mode import run_corpus
+        if not args.pdf_path and not args.file_list:
+            parser.error('--corpus needs at least one path, directory, glob or --file-list')
+        run_corpus(args.pdf_path, file_list=args.file_list, manifest=args.manifest, workers=args.workers,
+                   batch_size=args.text_batch_size, start_page=args.start_page, overrides=overrides)
+    elif args.batch:
+        from batch_mode import run_batch
+        if not args.pdf_path and not args.file_list:
+            parser.error('--batch needs at least one path, directory, glob or --file-list')
+        run_batch(args.pdf_path, file_list=args.file_list, manifest=args.manifest,
+                  journal=args.journal, workers=args.workers, start_page=args.start_page,
+                  overrides=overrides)
+    else:
+        if len(args.pdf_path) != 1:
+            parser.error('exactly one PDF path is required (use --batch for several)')
+        asyncio.run(main(args.pdf_path[0], args.start_page, overrides, args.name))
+    logger.info("Script execution completed")
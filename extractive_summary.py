@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Local extractive summaries: the most central sentences of each text.
+
+No model and no network: every text is split into sentences, and the
+sentences of all texts in a batch go into one sparse TF-IDF matrix, held
+as parallel (sentence, term, weight) arrays. Document frequencies are
+counted per text, so a text is only ever compared with its own sentences
+and its summary does not depend on what else was in the batch (which
+keeps summaries cacheable per text). A sentence scores its summed cosine
+similarity to the other sentences of its text, the degree centrality that
+TextRank/LexRank iterate on. For the whole batch that is a handful of
+bincounts over the arrays. The best sentences of each text are returned
+as bullet points, in their original order.
+"""
+
+import re
+from typing import List
+
+import numpy as np
+
+# Identifies the summarizer in cache keys and state fingerprints; bump it
+# when the output for the same text and settings changes
+EXTRACTIVE_MODEL = "extractive-tfidf-v1"
+
+# A sentence ends at ., ! or ? (plus closing quotes or brackets) followed by
+# whitespace and something that can start a sentence
+SENTENCE_BOUNDARY = re.compile(r'([.!?]+["\'”’)\]]*)\s+(?=["\'“‘(\[]?[A-Z0-9])')
+# Words before a period that do not end a sentence ("et al.", "Fig. 3", initials)
+NON_TERMINAL_WORDS = frozenset({
+    'al.', 'e.g.', 'i.e.', 'cf.', 'vs.', 'fig.', 'figs.', 'eq.', 'eqs.', 'ref.', 'refs.', 'sec.',
+    'tab.', 'no.', 'nos.', 'vol.', 'pp.', 'p.', 'ch.', 'approx.', 'dr.', 'prof.', 'mr.', 'mrs.', 'ms.',
+    'st.', 'resp.', 'ca.', 'viz.',
+})
+INITIAL = re.compile(r'^\(?[A-Z]\.$')
+WORD = re.compile(r'\w\w+')
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers him his how however i if in into is it its itself just may me might more most must my no
+nor not now of off on once only or other our ours out over own same she should so some such than that the
+their theirs them then there these they this those through thus to too under until up upon very was we
+were what when where which while who whom why will with within without would you your
+""".split())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of text; abbreviations, initials and citations like "et al." do not end one"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        end = match.end(1)
+        word = text[max(text.rfind(' ', start, end) + 1, start):end]
+        if word.lower() in NON_TERMINAL_WORDS or INITIAL.match(word):
+            continue
+        sentences.append(text[start:end].strip())
+        start = match.end()
+    rest = text[start:].strip()
+    if rest:
+        sentences.append(rest)
+    return [sentence for sentence in sentences if sentence]
+
+
+class ExtractiveSummarizer:
+    """Picks up to max_sentences central sentences per text, for a whole batch of texts at once"""
+
+    def __init__(self, max_sentences: int = 3, min_words: int = 4):
+        self.max_sentences = max(1, max_sentences)
+        self.min_words = min_words
+
+    @property
+    def settings(self) -> str:
+        """Everything besides the text that shapes a summary (part of the cache key)"""
+        return f"max_sentences={self.max_sentences};min_words={self.min_words}"
+
+    def summarize(self, texts: List[str]) -> List[str]:
+        """One bullet-point summary per text"""
+        sentences, owners, entry_sentences, entry_terms = [], [], [], []
+        vocabulary = {}
+        for text_id, text in enumerate(texts):
+            for sentence in split_sentences(text):
+                sentence_id = len(sentences)
+                sentences.append(sentence)
+                owners.append(text_id)
+                terms = [vocabulary.setdefault(word, len(vocabulary))
+                         for word in WORD.findall(sentence.lower()) if word not in STOPWORDS]
+                entry_terms.extend(terms)
+                entry_sentences.extend([sentence_id] * len(terms))
+        if not sentences:
+            return [text.strip() for text in texts]
+
+        owners = np.array(owners, dtype=np.int64)
+        scores = self._centrality(owners, np.array(entry_sentences, dtype=np.int64),
+                                  np.array(entry_terms, dtype=np.int64), len(vocabulary))
+        selected = self._select(owners, scores, sentences)
+
+        bullets = [[] for _ in texts]
+        for sentence_id in selected:
+            bullets[owners[sentence_id]].append(f"- {sentences[sentence_id]}")
+        return ["\n".join(lines) if lines else text.strip() for lines, text in zip(bullets, texts)]
+
+    @staticmethod
+    def _centrality(owners, entry_sentences, entry_terms, vocabulary_size) -> np.ndarray:
+        """Summed cosine similarity of each sentence to the other sentences of its text"""
+        sentence_count = len(owners)
+        if not len(entry_sentences):
+            return np.zeros(sentence_count)
+        # Term frequencies: one entry per (sentence, term)
+        keys, term_counts = np.unique(entry_sentences * vocabulary_size + entry_terms, return_counts=True)
+        sentence_ids = keys // vocabulary_size
+        # Document frequencies within each text: sentences of the text containing the term
+        text_terms = owners[sentence_ids] * vocabulary_size + keys % vocabulary_size
+        _, group, document_counts = np.unique(text_terms, return_inverse=True, return_counts=True)
+        group = group.ravel()
+        text_sentences = np.bincount(owners)[owners[sentence_ids]]
+        idf = np.log((1 + text_sentences) / (1 + document_counts[group])) + 1
+        weights = (1 + np.log(term_counts)) * idf
+        norms = np.sqrt(np.bincount(sentence_ids, weights * weights, minlength=sentence_count))
+        weights /= norms[sentence_ids]
+        # Dot product with the sum of the text's sentence vectors, minus the sentence itself
+        text_sums = np.bincount(group, weights)
+        similarity = np.bincount(sentence_ids, weights * text_sums[group], minlength=sentence_count)
+        return similarity - np.bincount(sentence_ids, weights * weights, minlength=sentence_count)
+
+    def _select(self, owners, scores, sentences) -> np.ndarray:
+        """Ids of the best max_sentences sentences per text, in document order"""
+        word_counts = np.array([len(sentence.split()) for sentence in sentences])
+        # Fragments only win when a text has nothing longer
+        scores = np.where(word_counts < self.min_words, scores - scores.max() - 1, scores)
+        positions = np.arange(len(owners))
+        order = np.lexsort((positions, -scores, owners))  # by text, best first, earlier first on ties
+        first = np.searchsorted(owners[order], owners[order], side='left')
+        rank = positions - first
+        return np.sort(order[rank < self.max_sentences])
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Run metrics and opt-in profiling.
+
+Counters, gauges and histograms are kept in a process-wide registry that is
+cheap enough to update on hot paths. At the end of a run the registry can be
+written as JSON or in the Prometheus text exposition format (for the
+node_exporter textfile collector). Worker processes send their registry's
+snapshot() back to the parent, which merge()s it.
+
+stage(name) times a pipeline stage into the ``stage_seconds`` histogram.
+After enable_profiling(directory) it also runs cProfile and tracemalloc
+for each stage; write_profiles() then saves one .prof and one memory
+report per stage.
+"""
+
+import bisect
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional, Tuple
+
+METRIC_PREFIX = "pdfextractor_"
+
+# Upper bounds of the histogram buckets (+Inf is implicit)
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# Lines per stage in the tracemalloc report
+MEMORY_REPORT_LINES = 25
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms, keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.gauges: Dict[Tuple[str, Tuple], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Record the current value of something that goes up and down"""
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self.counters.get((name, _label_key(labels)), 0)
+
+    def gauge_value(self, name: str, **labels) -> Optional[float]:
+        return self.gauges.get((name, _label_key(labels)))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """Picklable copy of all values, for sending from worker processes"""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, list(labels), list(h.buckets), list(h.counts), h.sum, h.count]
+                               for (name, labels), h in self.histograms.items()],
+            }
+
+    def merge(self, snapshot: Optional[Dict]):
+        """Add a snapshot() taken elsewhere into this registry"""
+        if not snapshot:
+            return
+        with self._lock:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                self.counters[key] = self.counters.get(key, 0) + value
+            # Gauges are point-in-time values: the latest snapshot wins
+            for name, labels, value in snapshot.get('gauges', []):
+                self.gauges[(name, tuple(tuple(label) for label in labels))] = value
+            for name, labels, buckets, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(buckets)
+                if list(histogram.buckets) != list(buckets):
+                    continue
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    def derived(self) -> Dict[str, float]:
+        """Ratios computed from the counters"""
+        hits = self.counter_value('cache_hits_total')
+        lookups = hits + self.counter_value('cache_misses_total')
+        return {'cache_hit_ratio': hits / lookups if lookups else 0.0}
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            gauges = [{'name': name, 'labels': dict(labels), 'value': value}
+                      for (name, labels), value in sorted(self.gauges.items())]
+            histograms = []
+            for (name, labels), h in sorted(self.histograms.items()):
+                histograms.append({
+                    'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.sum,
+                    'mean': h.sum / h.count if h.count else 0.0,
+                    'buckets': {str(bound): count for bound, count in zip(h.buckets + ('+Inf',), h.counts)},
+                })
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms, 'derived': self.derived()}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        seen_types = set()
+
+        def type_line(name, kind):
+            if name not in seen_types:
+                seen_types.add(name)
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+        def format_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                type_line(name, 'counter')
+                lines.append(f"{METRIC_PREFIX}{name}{format_labels(labels)} {value:g}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                type_line(name, 'gauge')
+                lines.append(f"{METRIC_PREFIX}{name}{format_labels(labels)} {value:g}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                type_line(name, 'histogram')
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"{METRIC_PREFIX}{name}_bucket{format_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{METRIC_PREFIX}{name}_sum{format_labels(labels)} {h.sum:g}")
+                lines.append(f"{METRIC_PREFIX}{name}_count{format_labels(labels)} {h.count}")
+        for name, value in self.derived().items():
+            type_line(name, 'gauge')
+            lines.append(f"{METRIC_PREFIX}{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Write the registry to path: Prometheus text for *.prom, JSON otherwise"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2)
+        # Atomic, so a textfile collector never reads half a file
+        os.replace(tmp_path, path)
+
+
+registry = MetricsRegistry()
+inc = registry.inc
+set_gauge = registry.set_gauge
+observe = registry.observe
+timer = registry.timer
+
+
+class StageProfiler:
+    """Accumulates cProfile and tracemalloc results per pipeline stage"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.memory: Dict[str, Dict[str, list]] = {}  # stage -> line -> [size diff, count diff]
+        self.peaks: Dict[str, int] = {}
+        self._active = None  # cProfile allows one active profiler per thread
+        self._lock = threading.Lock()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def profile(self, name: str):
+        with self._lock:
+            if self._active is not None:
+                nested = True
+            else:
+                nested = False
+                self._active = name
+        if nested:
+            yield
+            return
+
+        profiler = self.profiles.setdefault(name, cProfile.Profile())
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            after = tracemalloc.take_snapshot()
+            self.peaks[name] = max(self.peaks.get(name, 0), tracemalloc.get_traced_memory()[1])
+            totals = self.memory.setdefault(name, {})
+            for stat in after.compare_to(before, 'lineno'):
+                if stat.size_diff or stat.count_diff:
+                    entry = totals.setdefault(str(stat.traceback[0]), [0, 0])
+                    entry[0] += stat.size_diff
+                    entry[1] += stat.count_diff
+            with self._lock:
+                self._active = None
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        written = []
+        for name, profiler in self.profiles.items():
+            prof_path = os.path.join(self.directory, f"{name}.prof")
+            profiler.dump_stats(prof_path)
+            with open(os.path.join(self.directory, f"{name}.txt"), 'w', encoding='utf-8') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+            written.append(prof_path)
+
+        for name, lines in self.memory.items():
+            top = sorted(lines.items(), key=lambda item: abs(item[1][0]), reverse=True)[:MEMORY_REPORT_LINES]
+            memory_path = os.path.join(self.directory, f"{name}.memory.txt")
+            with open(memory_path, 'w', encoding='utf-8') as f:
+                f.write(f"Stage '{name}': peak traced memory {self.peaks.get(name, 0) / 1024:.1f} KiB\n")
+                f.write("Net allocation change by source line (summed over all runs of the stage):\n")
+                for line, (size_diff, count_diff) in top:
+                    f.write(f"{size_diff / 1024:+10.1f} KiB {count_diff:+8d} blocks  {line}\n")
+            written.append(memory_path)
+        return written
+
+
+profiler: Optional[StageProfiler] = None
+
+
+def enable_profiling(directory: str):
+    global profiler
+    profiler = StageProfiler(directory)
+
+
+def write_profiles():
+    """Write the profiling reports, if profiling is enabled; returns the files written"""
+    return profiler.write() if profiler else []
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time a pipeline stage, and profile it when profiling is enabled"""
+    started = time.perf_counter()
+    try:
+        if profiler is None:
+            yield
+        else:
+            with profiler.profile(name):
+                yield
+    finally:
+        registry.observe('stage_seconds', time.perf_counter() - started, stage=name)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Adaptive request pacing driven by the API's rate-limit responses.
+
+AdaptiveRateController sits in front of every API request:
+
+- It caps the requests in flight. The cap grows by about one per round of
+  successful requests and is cut multiplicatively on a 429 (AIMD, as in
+  TCP congestion control), so it settles just below what the quota allows.
+- It tracks the request and token budgets the API reports in its
+  x-ratelimit-* headers, and holds requests back while a budget is
+  exhausted until it resets. Token estimates are corrected by how far
+  past estimates were off.
+- It pauses all requests for the Retry-After the API asks for.
+- It computes jittered retry delays, so retries do not arrive in lockstep.
+
+Its state is published as metrics gauges after every change.
+"""
+
+import asyncio
+import collections
+import email.utils
+import random
+import re
+import time
+from typing import Mapping, Optional
+
+import metrics
+
+# Durations in rate-limit headers look like "1s", "6m0s", "20ms" or "1h2m3.5s"
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+# A 429 cuts the concurrency limit at most once per this many seconds, so a
+# burst of 429s from requests that were already in flight counts as one signal
+DECREASE_COOLDOWN = 1.0
+
+# Weight of each response in the running ratio of used to estimated tokens,
+# which scales the tokens reserved for the next requests
+TOKEN_RATIO_WEIGHT = 0.2
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from "6m0s"-style durations or plain numbers; None if unparseable"""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds to wait from retry-after-ms or Retry-After (seconds or an HTTP date)"""
+    if not headers:
+        return None
+    milliseconds = headers.get('retry-after-ms')
+    if milliseconds is not None:
+        try:
+            return max(0.0, float(milliseconds) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return seconds
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class Budget:
+    """One quota the API reports (requests or tokens): what is left, and when it refills"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limit: Optional[float] = None
+        self.remaining: Optional[float] = None  # None: unknown, nothing to enforce
+        self.reset_at = 0.0  # time.monotonic() at which remaining refills
+
+    def update(self, headers: Mapping[str, str], now: float):
+        """Take limit, remaining and reset from x-ratelimit-*-{name} headers, where present"""
+        limit = _number(headers.get(f'x-ratelimit-limit-{self.name}'))
+        remaining = _number(headers.get(f'x-ratelimit-remaining-{self.name}'))
+        reset = parse_duration(headers.get(f'x-ratelimit-reset-{self.name}'))
+        if limit is not None:
+            self.limit = limit
+        if remaining is not None and reset is not None:
+            if self.remaining is not None and now < self.reset_at and now + reset <= self.reset_at + 1.0:
+                # Same window: the header was computed when the request arrived,
+                # before requests sent since, which our own balance already counts
+                remaining = min(remaining, self.remaining)
+            self.remaining = remaining
+            self.reset_at = now + reset
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount fits into the budget (0 if it fits or nothing is known)"""
+        if self.remaining is None or now >= self.reset_at or self.remaining >= amount:
+            return 0.0
+        if self.limit is not None and amount > self.limit:
+            return 0.0  # would never fit; let the API decide
+        return self.reset_at - now
+
+    def take(self, amount: float, now: float):
+        if self.remaining is not None:
+            if now >= self.reset_at:
+                self.remaining = None  # refilled; the next response reports the new balance
+            else:
+                self.remaining -= amount
+
+    def give_back(self, amount: float, now: float):
+        """Correct an estimate once the actual use is known"""
+        if self.remaining is not None and now < self.reset_at:
+            self.remaining += amount
+
+
+class AdaptiveRateController:
+    """AIMD concurrency limit plus header-driven request/token budgets and Retry-After pauses"""
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1, initial_concurrency: Optional[int] = None,
+                 increase: float = 1.0, decrease: float = 0.5, retry_delay: float = 1.0,
+                 max_retry_delay: float = 60.0, jitter: float = 0.5, follow_headers: bool = True):
+        self.max_limit = float(max(1, max_concurrency))
+        self.min_limit = float(min(max(1, min_concurrency), self.max_limit))
+        self.limit = float(min(max(initial_concurrency or max_concurrency, self.min_limit), self.max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.jitter = jitter
+        self.follow_headers = follow_headers  # False: ignore rate-limit headers and Retry-After
+        self.in_flight = 0
+        self.requests = Budget('requests')
+        self.tokens = Budget('tokens')
+        self.paused_until = 0.0
+        self.last_decrease = float('-inf')
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.min_limit_seen = self.limit
+        self.token_ratio = 1.0  # used / estimated tokens, averaged over recent responses
+        self._waiters = collections.deque()  # futures of requests waiting for a free slot
+        self._random = random.Random()
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge('api_concurrency_limit', self.limit)
+        metrics.set_gauge('api_in_flight', self.in_flight)
+        for budget in (self.requests, self.tokens):
+            if budget.remaining is not None:
+                metrics.set_gauge('api_budget_remaining', budget.remaining, budget=budget.name)
+
+    def _wake(self):
+        """Let the longest-waiting request re-check for a free slot"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():  # cancelled waiters are done
+                waiter.set_result(None)
+                return
+
+    async def acquire(self, estimated_tokens: float = 0.0) -> float:
+        """Wait for a slot and for both budgets; returns the tokens reserved"""
+        started = time.monotonic()
+        reserved = estimated_tokens * self.token_ratio
+        reason = None
+        while True:
+            now = time.monotonic()
+            waits = {'retry_after': self.paused_until - now,
+                     'request_budget': self.requests.wait_time(1, now),
+                     'token_budget': self.tokens.wait_time(reserved, now)}
+            reason_now, wait = max(waits.items(), key=lambda item: item[1])
+            if wait > 0:
+                reason = reason or reason_now
+                await asyncio.sleep(wait)
+                continue
+            if self.in_flight < int(self.limit):
+                break
+            reason = reason or 'concurrency'
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass the slot on
+                raise
+        self.in_flight += 1
+        self.requests.take(1, now)
+        self.tokens.take(reserved, now)
+        if reason:
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            metrics.observe('api_throttle_wait_seconds', waited, reason=reason)
+        self._publish()
+        return reserved
+
+    def release(self):
+        self.in_flight -= 1
+        self._publish()
+        self._wake()
+
+    def on_success(self, headers: Optional[Mapping[str, str]], estimated_tokens: float = 0.0,
+                   reserved_tokens: float = 0.0, used_tokens: Optional[float] = None):
+        """Learn from a successful response and raise the limit additively"""
+        now = time.monotonic()
+        if used_tokens is not None:
+            self.tokens.give_back(reserved_tokens - used_tokens, now)
+            if estimated_tokens > 0:
+                self.token_ratio += TOKEN_RATIO_WEIGHT * (used_tokens / estimated_tokens - self.token_ratio)
+        if headers and self.follow_headers:
+            self.requests.update(headers, now)
+            self.tokens.update(headers, now)
+        # About +increase per round of `limit` successful requests
+        previous = int(self.limit)
+        self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+        if int(self.limit) > previous:
+            self._wake()
+        self._publish()
+
+    def on_rate_limited(self, headers: Optional[Mapping[str, str]]) -> Optional[float]:
+        """Learn from a 429: pause for Retry-After and cut the limit; returns Retry-After seconds"""
+        now = time.monotonic()
+        self.rate_limited += 1
+        if not self.follow_headers:
+            headers = None
+        if headers:
+            self.requests.update(headers, now)
+            self.tokens.update(headers, now)
+        retry_after = parse_retry_after(headers)
+        if retry_after is not None:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self.last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+            self.min_limit_seen = min(self.min_limit_seen, self.limit)
+            self.last_decrease = now
+            metrics.inc('api_concurrency_decreases_total')
+        self._publish()
+        return retry_after
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Jittered delay before retry number attempt + 1.
+
+        With a Retry-After, waits that long plus up to `jitter` of it on top.
+        Otherwise takes up to `jitter` off the exponential delay (jitter 1 is
+        "full jitter", anywhere between 0 and the exponential delay).
+        """
+        if retry_after is not None:
+            return retry_after * (1 + self.jitter * self._random.random())
+        ceiling = min(self.max_retry_delay, self.retry_delay * (2 ** attempt))
+        return ceiling * (1 - self.jitter * self._random.random())
+
+    def slot(self, estimated_tokens: float = 0.0):
+        """async with controller.slot(tokens) as slot: ... holds one in-flight slot"""
+        return _Slot(self, estimated_tokens)
+
+
+class _Slot:
+    def __init__(self, controller: AdaptiveRateController, estimated_tokens: float):
+        self.controller = controller
+        self.estimated_tokens = estimated_tokens
+        self.reserved_tokens = 0.0
+
+    async def __aenter__(self):
+        self.reserved_tokens = await self.controller.acquire(self.estimated_tokens)
+        return self
+
+    def succeeded(self, headers: Optional[Mapping[str, str]], used_tokens: Optional[float] = None):
+        self.controller.on_success(headers, self.estimated_tokens, self.reserved_tokens, used_tokens)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.controller.release()
@@ -31,6 +31,8 @@ PAGE_NUMBER=""
 LOG_LEVEL="INFO"
 INPUT_FILE=""
 LOG_FILE=""
+NO_SUMMARIES=""
+PROGRESSIVE=""
 
 # Logging infrastructure
 setup_logging() {
@@ -110,15 +112,12 @@ check_environment() {
             if grep -q "openai_api_key:" "$SCRIPT_DIR/config.yaml" && ! grep -q "#.*openai_api_key:" "$SCRIPT_DIR/config.yaml"; then
                 log "INFO" "API key found in config.yaml"
             else
-                log "ERROR" "OPENAI_API_KEY not found in environment or config.yaml"
-                echo "[INFO] Please either:" >&2
-                echo "  1. Set environment variable: export OPENAI_API_KEY='your-key-here'" >&2
-                echo "  2. Add to config.yaml: api.openai_api_key: 'your-key-here'" >&2
-                return 1
+                # Only needed when a highlight has to be summarized; the Python
+                # script reports it then
+                log "WARNING" "OPENAI_API_KEY not found in environment or config.yaml, summaries will fail"
             fi
         else
-            log "ERROR" "No config.yaml found and OPENAI_API_KEY not set"
-            return 1
+            log "WARNING" "No config.yaml found and OPENAI_API_KEY not set, summaries will fail"
         fi
     else
         # Basic API key format validation if set in environment
@@ -231,11 +230,15 @@ ARGUMENTS:
 
 OPTIONS:
     -v, --verbose   Enable verbose output (DEBUG level)
+    -n, --no-summaries
+                    Extract annotations only (no API key needed)
+    -p, --progressive
+                    Write the markdown at once and fill in summaries as they arrive
     -h, --help      Show this help message
     --version       Show version information
 
 ENVIRONMENT VARIABLES:
-    OPENAI_API_KEY  Required: Your OpenAI API key
+    OPENAI_API_KEY  Your OpenAI API key (required for summaries)
 
 EXAMPLES:
     $0 document.pdf
@@ -255,6 +258,14 @@ parse_arguments() {
                 LOG_LEVEL="DEBUG"
                 shift
                 ;;
+            -n|--no-summaries)
+                NO_SUMMARIES="1"
+                shift
+                ;;
+            -p|--progressive)
+                PROGRESSIVE="1"
+                shift
+                ;;
             -h|--help)
                 show_help
                 exit 0
@@ -327,6 +338,12 @@ main() {
     if [[ -n "$PAGE_NUMBER" && "$PAGE_NUMBER" != "1" ]]; then
         python_args+=("--start-page" "$PAGE_NUMBER")
     fi
+    if [[ -n "$NO_SUMMARIES" ]]; then
+        python_args+=("--no-summaries")
+    fi
+    if [[ -n "$PROGRESSIVE" ]]; then
+        python_args+=("--progressive")
+    fi
     
     # Execute Python script
     log "INFO" "Executing Python script with arguments: ${python_args[*]}"
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Persistent on-disk cache for AI summaries.
+
+Summaries are stored in a SQLite database so they survive between runs and can
+be shared by several processes working on the same library at once. Entries
+are keyed on the model, the prompt template and the highlighted text, so a
+change to any of them produces a fresh summary instead of a stale one.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("pdfextractor.cache")
+
+CACHE_FILENAME = "summaries.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key      TEXT PRIMARY KEY,
+    summary  TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries(accessed);
+"""
+
+# Run the (comparatively expensive) size check only every N writes
+EVICTION_CHECK_INTERVAL = 50
+
+
+def make_cache_key(model: str, prompt_template: str, text: str) -> str:
+    """Build a cache key covering everything that influences a summary"""
+    digest = hashlib.sha256()
+    for part in (model, prompt_template, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")  # unit separator keeps ("ab", "c") != ("a", "bc")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """SQLite-backed summary cache with TTL and size-bounded LRU eviction.
+
+    Pass ``directory=None`` for a private in-memory cache that lasts as long
+    as the process (used when caching is disabled in config.yaml).
+    """
+
+    def __init__(self, directory: Optional[str], max_size_mb: float = 100, ttl_days: float = 90):
+        if directory:
+            directory = os.path.expanduser(directory)
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, CACHE_FILENAME)
+        else:
+            self.path = ":memory:"
+        self.max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else 0
+        self.ttl_seconds = ttl_days * 86400 if ttl_days else 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.evictions = 0
+        self._writes_since_check = 0
+        self._lock = threading.Lock()
+
+        # Autocommit mode plus WAL lets several processes read while one writes;
+        # the timeout makes writers wait for each other instead of failing.
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        if self.path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, key: str, count: bool = True) -> Optional[str]:
+        """Return the cached summary for key, or None on a miss.
+
+        count=False leaves hits, misses and bytes read untouched, for lookups
+        that are not a text's own cache check (e.g. reusing a near-duplicate).
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT summary, created FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                    self.conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    self.evictions += 1
+                    row = None
+                if row:
+                    self.conn.execute("UPDATE summaries SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Summary cache read failed: {e}")
+            row = None
+
+        if not count:
+            return row[0] if row else None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_read += len(row[0].encode("utf-8"))
+        return row[0]
+
+    def put(self, key: str, summary: str):
+        """Store a summary, evicting old entries when the cache grows too large"""
+        size = len(summary.encode("utf-8"))
+        now = time.time()
+        try:
+            with self._lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO summaries (key, summary, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, summary, size, now, now))
+                self._writes_since_check += 1
+                check_due = self._writes_since_check >= EVICTION_CHECK_INTERVAL
+        except sqlite3.Error as e:
+            logger.warning(f"Summary cache write failed: {e}")
+            return
+        self.bytes_written += size
+        if check_due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max size"""
+        now = time.time()
+        try:
+            with self._lock:
+                self._writes_since_check = 0
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if self.ttl_seconds:
+                        cursor = self.conn.execute(
+                            "DELETE FROM summaries WHERE created < ?", (now - self.ttl_seconds,))
+                        self.evictions += max(cursor.rowcount, 0)
+
+                    if self.max_bytes:
+                        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+                        excess = total - self.max_bytes
+                        if excess > 0:
+                            victims = []
+                            for key, size in self.conn.execute(
+                                    "SELECT key, size FROM summaries ORDER BY accessed ASC"):
+                                victims.append((key,))
+                                excess -= size
+                                if excess <= 0:
+                                    break
+                            self.conn.executemany("DELETE FROM summaries WHERE key = ?", victims)
+                            self.evictions += len(victims)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning(f"Summary cache eviction failed: {e}")
+
+    def entry_stats(self):
+        """Return (entry count, total stored bytes)"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+
+    def stats_line(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        entries, stored = self.entry_stats()
+        return (f"Summary cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate), "
+                f"{self.bytes_read} bytes read, {self.bytes_written} bytes written, "
+                f"{self.evictions} evicted; {entries} entries / {stored} bytes stored")
+
+    def close(self):
+        if self._writes_since_check:
+            self.evict()
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Near-duplicate detection for highlight texts.
+
+Overlapping or re-highlighted passages produce texts that differ only in
+whitespace, case, punctuation or cleaning artefacts. NearDuplicateIndex
+finds such a text among the ones already seen: first by a hash of the
+normalized text, then by MinHash signatures over character shingles.
+Signatures are bucketed into LSH bands, so a lookup only compares against
+candidates sharing a band, and every candidate is confirmed by the exact
+Jaccard similarity of the two shingle sets before it counts as a match.
+"""
+
+import hashlib
+import re
+import zlib
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+# Signature rows per LSH band; with 64 permutations that is 16 bands, which
+# makes pairs above ~0.6 similarity near-certain candidates.
+LSH_ROWS_PER_BAND = 4
+
+
+def normalize_for_dedup(text: str) -> str:
+    """Lowercase letters and digits only.
+
+    Whitespace and punctuation are dropped entirely, so "power-house",
+    "power house" and "powerhouse" normalize alike.
+    """
+    return NON_WORD_PATTERN.sub('', text.lower())
+
+
+def shingle_hashes(normalized: str, shingle_size: int) -> FrozenSet[int]:
+    """32-bit hashes of the character shingles of a normalized text"""
+    data = normalized.encode('utf-8')
+    if len(data) < shingle_size:
+        return frozenset()
+    return frozenset(zlib.crc32(data[i:i + shingle_size]) for i in range(len(data) - shingle_size + 1))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class NearDuplicateIndex:
+    """Maps texts to the key of a highly similar text added earlier.
+
+    threshold is the shingle Jaccard similarity a pair needs; texts shorter
+    than one shingle only match on their normalized form.
+    """
+
+    def __init__(self, threshold: float = 0.9, shingle_size: int = 5, num_perm: int = 64, seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = max(1, shingle_size)
+        self.num_perm = max(LSH_ROWS_PER_BAND, num_perm - num_perm % LSH_ROWS_PER_BAND)
+        # Multiply-shift hashing: ((a * x + b) mod 2**64) >> 32 with odd a
+        rng = np.random.default_rng(seed)
+        self.mult = rng.integers(1, 2 ** 63, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self.offset = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64)
+        self.exact: Dict[str, str] = {}  # normalized text digest -> key
+        self.bands: List[Dict[bytes, List[int]]] = [{} for _ in range(self.num_perm // LSH_ROWS_PER_BAND)]
+        self.entries: List[Tuple[str, FrozenSet[int]]] = []  # (key, shingles)
+
+    def signature(self, shingles: FrozenSet[int]) -> np.ndarray:
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        with np.errstate(over='ignore'):
+            hashed = (np.outer(values, self.mult) + self.offset) >> np.uint64(32)
+        return hashed.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = signature.reshape(-1, LSH_ROWS_PER_BAND)
+        return [row.tobytes() for row in rows]
+
+    def _prepare(self, text: str) -> Tuple[str, FrozenSet[int]]:
+        normalized = normalize_for_dedup(text)
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        return digest, shingle_hashes(normalized, self.shingle_size)
+
+    def _find(self, digest, shingles, band_keys) -> Optional[Tuple[str, float]]:
+        key = self.exact.get(digest)
+        if key is not None:
+            return key, 1.0
+        candidates = set()
+        for band, band_key in zip(self.bands, band_keys):
+            candidates.update(band.get(band_key, ()))
+        best = None
+        for entry in candidates:
+            entry_key, entry_shingles = self.entries[entry]
+            similarity = jaccard(shingles, entry_shingles)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (entry_key, similarity)
+        return best
+
+    def _add(self, key, digest, shingles, band_keys):
+        self.exact.setdefault(digest, key)
+        if not shingles:
+            return
+        entry = len(self.entries)
+        self.entries.append((key, shingles))
+        for band, band_key in zip(self.bands, band_keys):
+            band.setdefault(band_key, []).append(entry)
+
+    def find(self, text: str) -> Optional[Tuple[str, float]]:
+        """(key, similarity) of the most similar indexed text at or above the threshold"""
+        digest, shingles = self._prepare(text)
+        return self._find(digest, shingles, self._band_keys(self.signature(shingles)) if shingles else [])
+
+    def add(self, text: str, key: str):
+        digest, shingles = self._prepare(text)
+        self._add(key, digest, shingles, self._band_keys(self.signature(shingles)) if shingles else [])
+
+    def match_or_add(self, text: str, key: str) -> Optional[Tuple[str, float]]:
+        """find(text); when nothing matches, add text under key and return None"""
+        digest, shingles = self._prepare(text)
+        band_keys = self._band_keys(self.signature(shingles)) if shingles else []
+        match = self._find(digest, shingles, band_keys)
+        if match is None:
+            self._add(key, digest, shingles, band_keys)
+        return match
+
+    def __len__(self):
+        return len(self.entries)
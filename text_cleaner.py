@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Reusable, precompiled text cleaning for extracted highlight text.
+
+TextCleaner compiles every pattern and lookup table once, protects emails,
+version numbers and file names in a single combined-regex pass, and can
+memoize results for texts that repeat across highlights and documents.
+"""
+
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger("pdfextractor.text_cleaner")
+
+# Part of the incremental state's options: bump it whenever a change here
+# cleans some text differently, so stored texts are extracted again
+CLEANER_VERSION = 1
+
+# Pre-compiled regex patterns for text cleaning (performance optimization)
+WHITESPACE_PATTERN = re.compile(r'[\n\t\r]+')
+# Improved pattern for line-break hyphens (hyphen + whitespace + continuation)
+LINE_BREAK_HYPHEN_PATTERN = re.compile(r'(\w+)-\s+(\w+)')
+# More selective OCR noise removal - only remove 4+ consecutive consonants
+OCR_NOISE_PATTERN = re.compile(r'\b(?:[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\s+){4,}\b')
+# Smart punctuation spacing - only after letters, preserve emails/versions
+SMART_PUNCT_PATTERN = re.compile(r'([.,;?!])([a-zA-Z])')
+ISOLATED_SPECIAL_PATTERN = re.compile(r'\s[^\w\s]\s')
+# More conservative single character removal - only remove obvious noise
+SINGLE_CHAR_NOISE_PATTERN = re.compile(r'\s+[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\s+(?=\s*[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\s+)')
+EXTRA_SPACES_PATTERN = re.compile(r'\s+')
+# Spaced capitals that might be an abbreviation ("U S A")
+SPACED_ABBREV_PATTERN = re.compile(r'\b([A-Z])\s+([A-Z])\s+([A-Z])(?:\s+[A-Z])*\b')
+
+# Patterns to preserve important content
+EMAIL_PATTERN = re.compile(r'\b[\w.-]+@[\w.-]+\.\w+\b')
+VERSION_PATTERN = re.compile(r'\b\d+\.\d+(?:\.\d+)*\b')
+FILE_EXTENSION_PATTERN = re.compile(r'\b\w+\.\w{2,4}\b')
+# All three in one alternation, in priority order, so protection is one scan.
+# Every branch needs a '.', and emails an '@', so texts without them skip
+# the scan or the email branch entirely.
+PRESERVE_PATTERN = re.compile('|'.join(f'(?P<{name}>{pattern.pattern})' for name, pattern in (
+    ('EMAIL', EMAIL_PATTERN), ('VERSION', VERSION_PATTERN), ('FILE', FILE_EXTENSION_PATTERN))))
+PRESERVE_NO_EMAIL_PATTERN = re.compile('|'.join(f'(?P<{name}>{pattern.pattern})' for name, pattern in (
+    ('VERSION', VERSION_PATTERN), ('FILE', FILE_EXTENSION_PATTERN))))
+PRESERVE_PLACEHOLDER_PATTERN = re.compile(r'__PRESERVE_(?:EMAIL|VERSION|FILE)_(\d+)__')
+ABBREV_PLACEHOLDER_PATTERN = re.compile(r'__ABBREV_(\d+)__')
+
+# Common abbreviations to preserve (case insensitive)
+COMMON_ABBREVIATIONS = frozenset({
+    'pdf', 'usa', 'ceo', 'dna', 'rna', 'cpu', 'gpu', 'api', 'url', 'http', 'https',
+    'ftp', 'ssh', 'tcp', 'udp', 'ip', 'ui', 'ux', 'ai', 'ml', 'nlp', 'ocr',
+    'eu', 'uk', 'us', 'ca', 'au', 'de', 'fr', 'it', 'es', 'jp', 'cn'
+})
+
+# Very obvious prefix patterns that rarely occur as compounds
+HYPHEN_JOIN_PREFIXES = frozenset({'pre', 'anti', 'auto', 'semi', 'inter', 'intra', 'super', 'sub'})
+# Clear suffix patterns (broken word endings)
+HYPHEN_JOIN_SUFFIXES = ('ing', 'ed', 'tion', 'sion', 'ment', 'ness', 'able', 'ible')
+
+
+def _join_line_break_hyphen(match) -> str:
+    """Decide whether 'word1- word2' is a broken word or a real compound"""
+    word1, word2 = match.groups()
+
+    # Always keep very short words (x-ray, a-b, etc.)
+    if len(word1) <= 2 or len(word2) <= 2:
+        return f"{word1}-{word2}"
+
+    # Join if second part starts with lowercase (clear continuation)
+    if word2[0].islower():
+        return word1 + word2
+
+    if word1.lower() in HYPHEN_JOIN_PREFIXES:
+        return word1 + word2
+
+    if word2.lower().startswith(HYPHEN_JOIN_SUFFIXES):
+        return word1 + word2
+
+    # Join very long combinations (definitely broken words)
+    if len(word1) + len(word2) > 15:
+        return word1 + word2
+
+    # Default: preserve hyphen (safer for compound words)
+    return f"{word1}-{word2}"
+
+
+class TextCleaner:
+    """Clean highlighted PDF text: whitespace, broken hyphens, OCR noise, punctuation.
+
+    memo_size > 0 keeps an LRU memo of that many cleaned texts.
+    """
+
+    def __init__(self, memo_size: int = 0, verbose: bool = False):
+        self.memo_size = memo_size
+        self.verbose = verbose
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        self.memo_hits = 0
+
+    def clean(self, text: str) -> str:
+        """Clean one text, consulting the memo first when enabled"""
+        if not text:
+            return ""
+        if not self.memo_size:
+            return self._clean(text)
+
+        cleaned = self._memo.get(text)
+        if cleaned is not None:
+            self._memo.move_to_end(text)
+            self.memo_hits += 1
+            return cleaned
+        cleaned = self._clean(text)
+        self._memo[text] = cleaned
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return cleaned
+
+    def clean_many(self, texts: Iterable[str]) -> List[str]:
+        """Clean a batch of texts; duplicates within the batch are cleaned once"""
+        batch: Dict[str, str] = {}
+        results = []
+        for text in texts:
+            cleaned = batch.get(text)
+            if cleaned is None:
+                cleaned = batch[text] = self.clean(text)
+            results.append(cleaned)
+        return results
+
+    __call__ = clean
+
+    def _clean(self, text: str) -> str:
+        original_text = text
+        original_length = len(text)
+
+        try:
+            # Step 1: Preserve important patterns (emails, versions, files)
+            preserved: List[str] = []
+
+            def protect(match):
+                preserved.append(match.group())
+                return f"__PRESERVE_{match.lastgroup}_{len(preserved) - 1}__"
+
+            if '.' in text:
+                text = (PRESERVE_PATTERN if '@' in text else PRESERVE_NO_EMAIL_PATTERN).sub(protect, text)
+
+            # Step 2: Normalize whitespace (tabs, newlines -> single space)
+            text = WHITESPACE_PATTERN.sub(' ', text)
+
+            # Step 3: Smart line-break hyphen handling
+            text = LINE_BREAK_HYPHEN_PATTERN.sub(_join_line_break_hyphen, text)
+
+            # Step 4: Smart OCR noise removal with abbreviation preservation
+            abbreviations: List[str] = []
+
+            def protect_abbreviation(match):
+                candidate = match.group(0).replace(' ', '')
+                if candidate.lower() not in COMMON_ABBREVIATIONS:
+                    return match.group(0)
+                abbreviations.append(candidate)  # restored without the spaces
+                return f"__ABBREV_{len(abbreviations) - 1}__"
+
+            text = SPACED_ABBREV_PATTERN.sub(protect_abbreviation, text)
+            text = OCR_NOISE_PATTERN.sub(' ', text)
+            if abbreviations:
+                text = ABBREV_PLACEHOLDER_PATTERN.sub(lambda m: abbreviations[int(m.group(1))], text)
+
+            # Step 5: Remove obvious single character noise more conservatively
+            text = SINGLE_CHAR_NOISE_PATTERN.sub(' ', text)
+
+            # Step 6: Smart punctuation spacing - only where needed
+            text = SMART_PUNCT_PATTERN.sub(r'\1 \2', text)
+
+            # Step 7: Remove isolated special characters (but not in preserved patterns)
+            text = ISOLATED_SPECIAL_PATTERN.sub(' ', text)
+
+            # Step 8: Final whitespace cleanup
+            text = EXTRA_SPACES_PATTERN.sub(' ', text).strip()
+
+            # Step 9: Restore preserved patterns in one pass
+            if preserved:
+                text = PRESERVE_PLACEHOLDER_PATTERN.sub(lambda m: preserved[int(m.group(1))], text)
+
+            final_length = len(text)
+            reduction_ratio = final_length / original_length if original_length > 0 else 1
+
+            if reduction_ratio < 0.3 and original_length > 50:
+                logger.warning(f"Aggressive text reduction: {original_length} -> {final_length} chars (ratio: {reduction_ratio:.2f})")
+                logger.warning(f"Original excerpt: '{original_text[:100]}...'")
+                logger.warning(f"Cleaned excerpt: '{text[:100]}...'")
+            elif self.verbose and original_length > 20:
+                logger.debug("Text cleaned: %d -> %d chars (ratio: %.2f)", original_length, final_length, reduction_ratio)
+
+            return text
+
+        except Exception as e:
+            logger.error(f"Text cleaning failed: {e}")
+            logger.error(f"Problematic text: '{original_text[:100]}...'")
+            return original_text  # Return original text if cleaning fails
+
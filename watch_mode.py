@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Building blocks for the resident watch mode.
+
+PdfPoller finds PDFs below a set of directories that are new or were
+modified, and reports each one only after it has stayed unchanged for a
+debounce interval, so a save in progress is never picked up half-written.
+Polling needs nothing beyond the standard library and behaves the same on
+every platform and on network shares.
+
+start_job_server() accepts one-off jobs on a Unix domain socket using a
+line-based JSON protocol (one request line, one reply line per
+connection), and submit_job() is the matching client.
+
+watch() runs the service (--watch) on top of them, and
+submit_to_instance() hands PDFs to it (--submit).
+"""
+
+import asyncio
+import collections
+import contextlib
+import json
+import logging
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import extract_annotations as ea
+import metrics
+
+logger = logging.getLogger("pdfextractor.watch")
+
+# Requests and replies are single JSON lines; paths and errors stay far below this
+MAX_MESSAGE_BYTES = 1024 * 1024
+
+DEFAULT_WATCH_SOCKET = "~/.cache/pdfextractor/watch.sock"
+
+
+def is_watched_pdf(name: str) -> bool:
+    """PDFs, minus hidden files and editor/lock temporaries"""
+    return name.lower().endswith('.pdf') and not name.startswith(('.', '~$'))
+
+
+class PdfPoller:
+    """Reports PDFs whose (mtime, size) changed and then stayed stable for `debounce` seconds"""
+
+    def __init__(self, directories: Iterable[str], debounce: float = 0.5, recursive: bool = True):
+        self.directories = [os.path.abspath(os.path.expanduser(d)) for d in directories]
+        self.debounce = debounce
+        self.recursive = recursive
+        self.known: Dict[str, Tuple[int, int]] = {}  # path -> signature last reported (or ignored)
+        self.settling: Dict[str, Tuple[Tuple[int, int], float]] = {}  # path -> (signature, stable since)
+
+    def _walk(self):
+        for directory in self.directories:
+            if self.recursive:
+                walker = os.walk(directory)
+            else:
+                walker = [(directory, [], os.listdir(directory))] if os.path.isdir(directory) else []
+            for root, dirs, files in walker:
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                for name in files:
+                    if is_watched_pdf(name):
+                        yield os.path.join(root, name)
+
+    def _signatures(self) -> Dict[str, Tuple[Tuple[int, int], float]]:
+        signatures = {}
+        for path in self._walk():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # removed between listing and stat
+            signatures[path] = ((st.st_mtime_ns, st.st_size), st.st_mtime)
+        return signatures
+
+    def prime(self, report_existing: bool):
+        """Take the initial inventory; existing PDFs are reported by the next scan() only if asked"""
+        if not report_existing:
+            self.known = {path: signature for path, (signature, _) in self._signatures().items()}
+
+    def scan(self) -> List[Tuple[str, float]]:
+        """One polling pass; returns (path, modification time) of the PDFs ready to be processed"""
+        now = time.time()
+        current = self._signatures()
+        ready = []
+        for path, (signature, mtime) in current.items():
+            if self.known.get(path) == signature:
+                self.settling.pop(path, None)
+                continue
+            settling = self.settling.get(path)
+            if settling is None or settling[0] != signature:
+                # The last modification time is when the file became stable, unless
+                # it lies in the future (clock skew on network shares)
+                settling = self.settling[path] = (signature, min(mtime, now))
+            if now - settling[1] >= self.debounce:
+                ready.append((path, mtime))
+                self.known[path] = signature
+                del self.settling[path]
+        for path in set(self.known).difference(current):
+            del self.known[path]
+        for path in set(self.settling).difference(current):
+            del self.settling[path]
+        return ready
+
+
+RequestHandler = Callable[[Dict], Awaitable[Dict]]
+
+
+async def start_job_server(socket_path: str, handle_request: RequestHandler):
+    """Serve handle_request on a Unix domain socket readable only by the current user"""
+    if not hasattr(asyncio, 'start_unix_server'):
+        raise OSError("Unix domain sockets are not available on this platform")
+    socket_path = os.path.expanduser(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    if os.path.exists(socket_path):
+        if _socket_is_live(socket_path):
+            raise RuntimeError(f"Another instance is already listening on {socket_path}")
+        os.unlink(socket_path)  # left behind by an instance that did not shut down cleanly
+
+    async def on_connection(reader, writer):
+        try:
+            line = await reader.readline()
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                reply = {'status': 'error', 'error': f"Invalid request: {e}"}
+            else:
+                reply = await handle_request(request)
+            writer.write(json.dumps(reply).encode('utf-8') + b"\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # the client went away; the job itself still completes
+        except Exception as e:
+            logger.error(f"Job request failed: {e}")
+        finally:
+            writer.close()
+
+    old_umask = os.umask(0o077)
+    try:
+        server = await asyncio.start_unix_server(on_connection, path=socket_path, limit=MAX_MESSAGE_BYTES)
+    finally:
+        os.umask(old_umask)
+    return server
+
+
+def _socket_is_live(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+
+def submit_job(socket_path: str, request: Dict, timeout: Optional[float] = None) -> Dict:
+    """Send one request to a running instance and wait for its reply.
+
+    Raises ConnectionError when no instance is listening on socket_path.
+    """
+    socket_path = os.path.expanduser(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ConnectionError(f"No running instance at {socket_path}") from e
+        sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        with sock.makefile('rb') as reply_file:
+            line = reply_file.readline(MAX_MESSAGE_BYTES)
+    if not line:
+        raise ConnectionError(f"The instance at {socket_path} closed the connection without replying")
+    return json.loads(line)
+
+
+# ---------------------------------------------------------------------------
+# Watch mode: one resident process with warm caches, fed by a directory
+# poller and by --submit clients
+# ---------------------------------------------------------------------------
+
+def _warm_page_worker(delay):
+    """No-op task that keeps a pool worker busy briefly, so every worker gets started"""
+    time.sleep(delay)
+
+
+class WatchService:
+    """Job queue, per-PDF serialization and bookkeeping for watch mode"""
+
+    def __init__(self, directories, start_page, watch_config, resources: "ea.SharedResources"):
+        self.start_page = start_page
+        self.resources = resources  # the API client and page pool every job shares
+        self.poll_interval = watch_config.get('poll_interval', 0.25)
+        self.initial_scan = watch_config.get('initial_scan', True)
+        self.poller = (PdfPoller(directories, watch_config.get('debounce', 0.5), watch_config.get('recursive', True))
+                       if directories else None)
+        self.queue = asyncio.Queue()
+        self.queued = set()  # paths the poller queued that no worker has picked up yet
+        self.path_locks = collections.defaultdict(asyncio.Lock)
+        self.counts = {'done': 0, 'failed': 0}
+        self.started = time.time()
+        self.stopping = asyncio.Event()
+
+    async def handle_request(self, request: Dict) -> Dict:
+        """Answer one socket request: process a PDF, report status, or stop"""
+        command = request.get('command', 'process')
+        if command == 'status':
+            return {'status': 'ok', 'pid': os.getpid(), 'uptime_seconds': round(time.time() - self.started, 1),
+                    'queued': self.queue.qsize(), 'watching': self.poller.directories if self.poller else [],
+                    **self.counts}
+        if command == 'stop':
+            self.stopping.set()
+            return {'status': 'ok'}
+        if command != 'process':
+            return {'status': 'error', 'error': f"Unknown command: {command}"}
+
+        path = os.path.abspath(os.path.expanduser(str(request.get('path', ''))))
+        if not os.path.isfile(path):
+            return {'status': 'failed', 'path': path, 'error': f"File not found: {path}"}
+        try:
+            start_page = int(request.get('start_page', self.start_page))
+        except (TypeError, ValueError):
+            return {'status': 'error', 'error': f"Invalid start page: {request.get('start_page')}"}
+        incremental = False if request.get('full') else None
+        reply = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((path, start_page, incremental, 'socket', None, reply))
+        return await reply
+
+    async def poll(self):
+        loop = asyncio.get_running_loop()
+        # Directory scans stat every PDF; keep them off the event loop
+        await loop.run_in_executor(None, self.poller.prime, self.initial_scan)
+        while True:
+            try:
+                ready = await loop.run_in_executor(None, self.poller.scan)
+            except OSError as e:
+                logger.warning(f"Watch: directory scan failed: {e}")
+                ready = []
+            for path, modified in ready:
+                if path not in self.queued:
+                    logger.debug("Watch: %s changed", path)
+                    self.queued.add(path)
+                    self.queue.put_nowait((path, self.start_page, None, 'watch', modified, None))
+            await asyncio.sleep(self.poll_interval)
+
+    async def worker(self):
+        while True:
+            path, start_page, incremental, source, modified, reply = await self.queue.get()
+            if source == 'watch':
+                # From here on, a new save queues the PDF again
+                self.queued.discard(path)
+            async with self.path_locks[path]:
+                result = await self.run_job(path, start_page, incremental, source, modified)
+            if reply is not None and not reply.done():
+                reply.set_result(result)
+
+    async def run_job(self, path, start_page, incremental, source, modified) -> Dict:
+        started = time.perf_counter()
+        try:
+            result = await ea.process_document(path, start_page, incremental, self.resources)
+        except Exception as e:
+            logger.error(f"Watch: processing failed for {path}: {e}")
+            self.counts['failed'] += 1
+            metrics.inc('watch_jobs_total', source=source, status="failed")
+            return {'status': 'failed', 'path': path, 'error': str(e)}
+        seconds = time.perf_counter() - started
+        self.counts['done'] += 1
+        metrics.inc('watch_jobs_total', source=source, status="done")
+        metrics.observe('watch_job_seconds', seconds)
+        if modified is not None and not result['skipped']:
+            # From the save that triggered the job to the exported markdown
+            metrics.observe('watch_save_to_export_seconds', time.time() - modified)
+        logger.info(f"Watch: {'unchanged' if result['skipped'] else 'exported'} {result['output_file']} "
+                    f"in {seconds:.2f}s")
+        ea.export_run_metrics()
+        return {'status': 'done', 'path': path, 'output_file': result['output_file'], 'exports': result['exports'],
+                'annotations': result['annotations'], 'summaries': result['summaries'],
+                'skipped': result['skipped'], 'seconds': round(seconds, 3)}
+
+
+async def watch(directories, start_page=1, overrides=None):
+    """Stay resident and process PDFs below directories whenever they change.
+
+    Imports, configuration, the summary cache, the text cleaner memo, the API
+    client and (for processing.engine "process") the page worker pool stay
+    warm between documents. Jobs submitted with --submit are queued too.
+    Runs until interrupted or stopped with a "stop" request.
+    """
+    ea.load_config(overrides)
+    if ea.document_input() == 'mmap':
+        # Watched PDFs are opened right after an editor saves them; one rewritten
+        # while it is mapped would kill the whole service with SIGBUS
+        logger.info("Watch: reading PDFs with processing.document_input \"file\" instead of mmap")
+        ea.config.setdefault('processing', {})['document_input'] = 'file'
+    watch_config = ea.config.get('watch', {})
+    processing = ea.config.get('processing', {})
+    # The API client is opened by the first job that needs one; it is bound to this loop
+    resources = ea.SharedResources(reuse_api_client=True)
+    service = WatchService(directories, start_page, watch_config, resources)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, service.stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # not available on this platform; Ctrl+C still ends asyncio.run()
+
+    socket_path = watch_config.get('socket', DEFAULT_WATCH_SOCKET)
+    server = None
+    tasks = []
+    ea.get_summary_cache()
+    ea.get_text_cleaner()
+    try:
+        if socket_path:
+            try:
+                server = await start_job_server(socket_path, service.handle_request)
+                logger.info(f"Watch: accepting jobs on {os.path.expanduser(socket_path)}")
+            except RuntimeError as e:
+                logger.error(f"Watch: {e}")
+                return
+            except OSError as e:
+                logger.warning(f"Watch: could not listen on {socket_path} ({e}), --submit will not work")
+        if processing.get('engine', 'thread') == 'process':
+            workers = processing.get('max_workers', 4)
+            page_pool = ProcessPoolExecutor(max_workers=workers, initializer=ea._init_page_worker,
+                                            initargs=(ea.config,))
+            resources.page_pool = page_pool
+            await loop.run_in_executor(None, lambda: list(page_pool.map(_warm_page_worker, [0.1] * workers)))
+
+        tasks = [asyncio.create_task(service.worker()) for _ in range(max(1, watch_config.get('max_parallel', 2)))]
+        if service.poller is not None:
+            tasks.append(asyncio.create_task(service.poll()))
+            logger.info(f"Watch: watching {', '.join(service.poller.directories)} "
+                        f"(every {service.poll_interval}s, debounce {service.poller.debounce}s)")
+        await service.stopping.wait()
+        logger.info("Watch: stopping")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+            with contextlib.suppress(OSError):
+                os.unlink(os.path.expanduser(socket_path))
+        if resources.api_client is not None:
+            await resources.api_client.close()
+        if resources.page_pool is not None:
+            resources.page_pool.shutdown()
+        logger.info(f"Watch: {service.counts['done']} documents processed, {service.counts['failed']} failed")
+        logger.info(ea.get_summary_cache().stats_line())
+        ea.close_summary_cache()
+        ea.close_annotation_index()
+        ea.export_run_metrics()
+
+
+def submit_to_instance(pdf_paths, start_page=1, full=False, overrides=None) -> bool:
+    """Hand PDFs to a running watch-mode instance; returns whether all succeeded"""
+    ea.load_config(overrides)
+    socket_path = ea.config.get('watch', {}).get('socket', DEFAULT_WATCH_SOCKET)
+    succeeded = True
+    for pdf_path in pdf_paths:
+        request = {'command': 'process', 'path': os.path.abspath(pdf_path), 'start_page': start_page, 'full': full}
+        try:
+            reply = submit_job(socket_path, request)
+        except ConnectionError as e:
+            logger.error(f"{e}; start one with --watch")
+            return False
+        if reply.get('status') == 'done':
+            logger.info(f"Annotations exported to: {reply['output_file']} "
+                        f"({reply['annotations']} annotations, {reply['seconds']:.2f}s in the running instance)")
+        else:
+            logger.error(f"Processing failed for {pdf_path}: {reply.get('error')}")
+            succeeded = False
+    return succeeded